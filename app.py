@@ -1,6 +1,28 @@
 # app.py 
+import os
 #IMPORT gradio_interface
 from src.gradio_interface import demo
+from src.img_gen import pregenerate
+from src.logging_setup import configure_logging
+from src.metrics import METRICS_PORT, start_metrics_server
+from src.warmer import warmer, WARMER_ENABLED
+from src.workers import supervisor, WORKERS
 
-# Launch the Gradio app
+configure_logging()
+
+# Prometheus metrics on a separate port (e.g. CTB_METRICS_PORT=9100)
+if METRICS_PORT:
+    start_metrics_server(METRICS_PORT)
+
+if WORKERS:
+    # Generations run in worker processes sharing the on-disk job queue and cache;
+    # the warm pool lives in process memory, so it only serves in-process generation
+    supervisor.start()
+elif WARMER_ENABLED:
+    # Pre-generate images for popular combinations while the app is idle
+    warmer.start(pregenerate)
+
+# Launch the Gradio app; per-model limits and fairness are handled by
+# src/scheduler.py, Gradio's queue only caps the total number of pending events
+demo.queue(max_size=int(os.getenv("CTB_GRADIO_QUEUE_SIZE", "512")))
 demo.launch()
@@ -0,0 +1,275 @@
+# bench_generate.py
+"""
+Latency/throughput benchmark for the generation path.
+
+Drives `src.img_gen.generate` (or a running Gradio app through its HTTP
+API) against the local stand-in inference server. Two load shapes are
+supported:
+    closed loop - a fixed number of concurrent clients, each sending its
+                  next request when the previous one finishes
+    open loop   - Poisson arrivals at a fixed rate, whatever the latency
+
+Reports p50/p95/p99 latency, throughput, error rate and a per-stage
+breakdown (upstream inference vs everything else), stored as JSON so
+runs from different commits can be compared.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_generate --concurrency 1 4 16 --rates 2 8 --output bench.json
+    python -m benchmarks.bench_generate --compare bench_main.json --output bench.json
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.stand_in_server import start_server, StandInConfig  # noqa: E402
+
+
+def percentile(samples, q):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(q / 100.0 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def describe(samples):
+    return {
+        "p50": percentile(samples, 50),
+        "p95": percentile(samples, 95),
+        "p99": percentile(samples, 99),
+        "mean": sum(samples) / len(samples) if samples else None,
+    }
+
+
+class _StageTimer:
+    """Wraps the active backend so upstream inference time is recorded per request."""
+
+    def __init__(self, backend):
+        self._local = threading.local()
+        original = backend.text_to_image
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self._local.inference = time.perf_counter() - start
+
+        backend.text_to_image = timed
+
+    def reset(self):
+        self._local.inference = 0.0
+
+    def inference(self):
+        return getattr(self._local, "inference", 0.0)
+
+
+def make_core_call(args):
+    """Build a request function that calls src.img_gen.generate in-process."""
+    from src.backends import get_backend
+    from src.img_gen import generate
+    from src.logging_setup import configure_logging
+    from src.prompt_registry import registry, TEAMS
+
+    # Measure the request path with logging set up as in the app
+    configure_logging()
+    timer = _StageTimer(get_backend())
+    prompt_aliases, model_aliases = registry.prompt_aliases(), registry.model_aliases()
+
+    def call(rng):
+        timer.reset()
+        start = time.perf_counter()
+        result, message = generate(rng.choice(prompt_aliases), rng.choice(TEAMS), rng.choice(model_aliases), "", args.height, args.width, args.steps, 2.0, args.seed)
+        total = time.perf_counter() - start
+        ok = result is not None and not message.startswith(("ERROR", "An error"))
+        return ok, total, {"inference": timer.inference(), "other": total - timer.inference()}
+
+    return call
+
+
+def make_gradio_call(args):
+    """Build a request function that goes through a running Gradio app's HTTP API."""
+    from gradio_client import Client
+    from src.prompt_registry import registry, TEAMS
+
+    prompt_aliases, model_aliases = registry.prompt_aliases(), registry.model_aliases()
+    local = threading.local()
+
+    def call(rng):
+        # gradio_client is not thread-safe; one client per worker thread
+        if not hasattr(local, "client"):
+            local.client = Client(args.gradio_url, verbose=False)
+        start = time.perf_counter()
+        try:
+            *_, message = local.client.predict(rng.choice(prompt_aliases), rng.choice(TEAMS), rng.choice(model_aliases), "", api_name=args.api_name)
+            ok = not str(message).startswith(("ERROR", "An error", "Server is busy"))
+        except Exception:
+            ok = False
+        return ok, time.perf_counter() - start, {}
+
+    return call
+
+
+def summarize(mode, level, results, elapsed):
+    latencies = [r[1] for r in results]
+    errors = sum(1 for r in results if not r[0])
+    stages = {}
+    for name in sorted({name for r in results for name in r[2]}):
+        stages[name] = describe([r[2][name] for r in results if name in r[2]])
+    return {
+        "mode": mode,
+        "level": level,
+        "requests": len(results),
+        "duration_s": elapsed,
+        "throughput_rps": len(results) / elapsed if elapsed else 0.0,
+        "error_rate": errors / len(results) if results else 0.0,
+        "latency_s": describe(latencies),
+        "stages_s": stages,
+    }
+
+
+def run_closed_loop(call, concurrency, requests, seed):
+    results = []
+    lock = threading.Lock()
+    remaining = [requests]
+
+    def client(index):
+        rng = random.Random(seed + index)
+        while True:
+            with lock:
+                if remaining[0] == 0:
+                    return
+                remaining[0] -= 1
+            outcome = call(rng)
+            with lock:
+                results.append(outcome)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(client, range(concurrency)))
+    return summarize("closed", concurrency, results, time.perf_counter() - start)
+
+
+def run_open_loop(call, rate, duration, seed, max_workers=256):
+    rng = random.Random(seed)
+    results = []
+    lock = threading.Lock()
+
+    def request(scheduled, request_seed):
+        outcome = call(random.Random(request_seed))
+        # Latency counts from the scheduled arrival, so client-side queueing is included
+        ok, _, stages = outcome
+        with lock:
+            results.append((ok, time.perf_counter() - scheduled, stages))
+
+    start = time.perf_counter()
+    next_arrival = start
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while next_arrival - start < duration:
+            delay = next_arrival - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(request, next_arrival, rng.random())
+            next_arrival += rng.expovariate(rate)
+    return summarize("open", rate, results, time.perf_counter() - start)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(baseline, current, threshold):
+    """Print p95/throughput deltas against a baseline; return True if p95 regressed beyond `threshold` percent."""
+    regressed = False
+    previous = {(s["mode"], s["level"]): s for s in baseline["scenarios"]}
+    for scenario in current["scenarios"]:
+        before = previous.get((scenario["mode"], scenario["level"]))
+        if not before or not before["latency_s"]["p95"]:
+            continue
+        change = (scenario["latency_s"]["p95"] - before["latency_s"]["p95"]) / before["latency_s"]["p95"] * 100
+        flag = ""
+        if change > threshold:
+            regressed = True
+            flag = "  <-- REGRESSION"
+        print(f"{scenario['mode']:>6} {scenario['level']:>6}: p95 {before['latency_s']['p95']:.3f}s -> {scenario['latency_s']['p95']:.3f}s ({change:+.1f}%), "
+              f"throughput {before['throughput_rps']:.2f} -> {scenario['throughput_rps']:.2f} rps{flag}")
+    return regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the generation path against the local stand-in server.")
+    parser.add_argument("--concurrency", type=int, nargs="*", default=[1, 4, 16], help="Closed-loop concurrency levels")
+    parser.add_argument("--requests", type=int, default=100, help="Requests per closed-loop level")
+    parser.add_argument("--rates", type=float, nargs="*", default=[], help="Open-loop arrival rates (requests/second)")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per open-loop rate")
+    parser.add_argument("--latency", default="lognormal:0.5,0.3", help="Stand-in latency distribution (see src/stand_in_server.py)")
+    parser.add_argument("--loading-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--height", type=int, default=360)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=-1, help="Request seed; -1 randomizes (bypasses the result cache)")
+    parser.add_argument("--gradio-url", help="Benchmark a running Gradio app instead of calling generate in-process")
+    parser.add_argument("--api-name", default="/generate")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--compare", help="Baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Allowed p95 regression in percent")
+    args = parser.parse_args(argv)
+    # Resolve file arguments before the benchmark switches to a scratch directory
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = os.path.abspath(args.compare) if args.compare else None
+
+    config = {k: v for k, v in vars(args).items() if k not in ("output", "compare")}
+    if args.gradio_url:
+        call = make_gradio_call(args)
+        server = None
+    else:
+        server, url = start_server(config=StandInConfig(args.latency, args.loading_rate, args.error_rate, seed=0))
+        # Route the HF backend to the stand-in and keep outputs out of the working tree
+        os.environ["CTB_INFERENCE_URL"] = url
+        os.environ.setdefault("CTB_BACKEND", "hf")
+        os.chdir(tempfile.mkdtemp(prefix="ctb-bench-"))
+        call = make_core_call(args)
+
+    report = {"commit": git_commit(), "timestamp": time.time(), "config": config, "scenarios": []}
+    try:
+        for level in args.concurrency:
+            scenario = run_closed_loop(call, level, args.requests, seed=level)
+            report["scenarios"].append(scenario)
+            print(f"closed c={level}: p50 {scenario['latency_s']['p50']:.3f}s p95 {scenario['latency_s']['p95']:.3f}s p99 {scenario['latency_s']['p99']:.3f}s "
+                  f"{scenario['throughput_rps']:.2f} rps, errors {scenario['error_rate']:.1%}")
+        for rate in args.rates:
+            scenario = run_open_loop(call, rate, args.duration, seed=int(rate * 1000))
+            report["scenarios"].append(scenario)
+            print(f"open r={rate}: p50 {scenario['latency_s']['p50']:.3f}s p95 {scenario['latency_s']['p95']:.3f}s p99 {scenario['latency_s']['p99']:.3f}s "
+                  f"{scenario['throughput_rps']:.2f} rps, errors {scenario['error_rate']:.1%}")
+    finally:
+        if server:
+            server.shutdown()
+
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if baseline:
+        with open(baseline, encoding="utf-8") as f:
+            if compare(json.load(f), report, args.threshold):
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
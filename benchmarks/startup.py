@@ -0,0 +1,107 @@
+# startup.py
+"""
+Startup benchmark: how long each entrypoint takes before it can serve.
+
+Measured targets (each in a fresh interpreter, repeated --runs times):
+    core   - headless `import src.img_gen` (no UI)
+    modal  - module-level import of ctb-modal.py (what Modal does on start)
+    app    - `python app.py` until the Gradio server answers its first HTTP request
+
+Usage (from the repository root):
+    python -m benchmarks.startup --runs 5 --output startup.json
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_TARGETS = {
+    "core": "import src.img_gen",
+    "modal": "import runpy; runpy.run_path('ctb-modal.py', run_name='ctb_modal')",
+}
+
+
+def time_import(statement):
+    """Seconds from interpreter spawn until `statement` has finished executing."""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", statement], cwd=ROOT, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "failed")
+    return elapsed
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_first_request(timeout=120.0):
+    """Seconds from `python app.py` spawn until the Gradio server answers HTTP."""
+    port = free_port()
+    env = dict(os.environ, GRADIO_SERVER_NAME="127.0.0.1", GRADIO_SERVER_PORT=str(port), GRADIO_ANALYTICS_ENABLED="False")
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "app.py"], cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    try:
+        while time.perf_counter() - start < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(process.stderr.read().decode(errors="replace").strip().splitlines()[-1])
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1):
+                    return time.perf_counter() - start
+            except (urllib.error.URLError, ConnectionError, socket.timeout):
+                time.sleep(0.05)
+        raise RuntimeError(f"no response within {timeout}s")
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def summarize(samples):
+    return {
+        "runs": len(samples),
+        "median_s": round(statistics.median(samples), 4),
+        "min_s": round(min(samples), 4),
+        "max_s": round(max(samples), 4),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure time-to-ready for each entrypoint.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--targets", nargs="*", default=["core", "modal", "app"])
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    results = {"python": sys.version.split()[0], "timestamp": time.time(), "targets": {}}
+    for target in args.targets:
+        try:
+            if target == "app":
+                samples = [time_first_request() for _ in range(args.runs)]
+            else:
+                samples = [time_import(IMPORT_TARGETS[target]) for _ in range(args.runs)]
+            results["targets"][target] = summarize(samples)
+        except Exception as e:
+            results["targets"][target] = {"error": str(e)}
+        print(f"{target}: {results['targets'][target]}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,4 @@
+# config/__init__.py
+# Re-export the shared settings so `from config import ...` and
+# `from config.config import ...` resolve to the same values
+from config.config import api_token, api_tokens, models, prompts
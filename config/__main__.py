@@ -0,0 +1,5 @@
+# config/__main__.py
+# Print configuration diagnostics: python -m config
+from config.config import diagnostics
+
+print(diagnostics())
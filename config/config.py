@@ -3,10 +3,21 @@ import os
 from config.prompts import prompts  # Import prompts from prompts.py
 from config.models import models
 
-# Retrieve the Hugging Face token
-api_token = os.getenv("HF_TOKEN")
+# Retrieve the Hugging Face token (HF_CTB_TOKEN is the legacy name used by the root-level app)
+api_token = os.getenv("HF_TOKEN") or os.getenv("HF_CTB_TOKEN")
+# Optional comma-separated pool of tokens sharing the load (src/token_pool.py); defaults to the single token
+api_tokens = [t.strip() for t in os.getenv("HF_TOKENS", "").split(",") if t.strip()] or ([api_token] if api_token else [])
 
-# Debugging: Print prompt and model options
-print("Prompt Options:", [p["alias"] for p in prompts])
-print("Model Options:", [m["alias"] for m in models])
 
+def diagnostics():
+    """
+    Describe the loaded configuration for debugging.
+
+    Run `python -m config` to print it; nothing is printed on import.
+    """
+    return "\n".join([
+        f"Hugging Face token: {'loaded' if api_token else 'MISSING (set HF_TOKEN)'}",
+        f"Hugging Face token pool: {len(api_tokens)} token(s)",
+        f"Prompt Options: {[p['alias'] for p in prompts]}",
+        f"Model Options: {[m['alias'] for m in models]}",
+    ])
@@ -1,7 +1,5 @@
 # modal_app.py
 import modal
-#IMPORT gradio_interface
-from src.gradio_interface import demo
 
 # Create a Modal app
 app = modal.App("ctb-image-generator")
@@ -17,8 +15,12 @@ image = modal.Image.debian_slim().pip_install(
 
 @app.local_entrypoint()
 def main():
+    # Import the UI only when the entrypoint actually runs
+    #IMPORT gradio_interface
+    from src.gradio_interface import demo
+
     with modal.enable_output():
         demo.launch()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
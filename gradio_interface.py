@@ -1,7 +1,7 @@
 # gradio_interface.py
 import gradio as gr
 from img_gen_logic import generate_image  # Direct import
-from config import prompts, models  # Direct import
+from src.prompt_registry import registry, TEAMS
 
 def generate(prompt_alias, team, model_alias, custom_prompt, height=360, width=640, num_inference_steps=20, guidance_scale=2.0, seed=-1):
     try:
@@ -16,9 +16,11 @@ with gr.Blocks() as demo:
     gr.Markdown("# CtB AI Image Generator")
     with gr.Row():
         # Set default values for dropdowns
-        prompt_dropdown = gr.Dropdown(choices=[p["alias"] for p in prompts], label="Select Prompt", value=prompts[0]["alias"])
-        team_dropdown = gr.Dropdown(choices=["Red", "Blue"], label="Select Team", value="Red")
-        model_dropdown = gr.Dropdown(choices=[m["alias"] for m in models], label="Select Model", value=models[0]["alias"])
+        prompt_aliases = registry.prompt_aliases()
+        model_aliases = registry.model_aliases()
+        prompt_dropdown = gr.Dropdown(choices=prompt_aliases, label="Select Prompt", value=prompt_aliases[0])
+        team_dropdown = gr.Dropdown(choices=TEAMS, label="Select Team", value=TEAMS[0])
+        model_dropdown = gr.Dropdown(choices=model_aliases, label="Select Model", value=model_aliases[0])
     with gr.Row():
         # Add a text box for custom user input (max 200 characters)
         custom_prompt_input = gr.Textbox(label="Custom Prompt (Optional)", placeholder="Enter additional details (max 200 chars)...", max_lines=1, max_length=200)
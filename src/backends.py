@@ -0,0 +1,245 @@
+# backends.py
+import asyncio
+import io
+import os
+import threading
+import time
+from config.config import api_token
+from src.client_pool import client_pool
+from src.logging_setup import get_logger
+from src.resilience import classify, retry_after, RATE_LIMITED
+from src.stand_in_server import gradient_row
+from src.token_pool import token_pool
+
+# Execution target for generations: "hf" (Inference API), "diffusers" (local CPU), "modal" (remote FluxWorker) or "fake"
+BACKEND = os.getenv("CTB_BACKEND", "hf")
+# Base URL of an alternative Inference API endpoint, e.g. the local stand-in (src/stand_in_server.py)
+INFERENCE_URL = os.getenv("CTB_INFERENCE_URL", "").rstrip("/")
+# Optional directory with local model snapshots for the diffusers backend (<dir>/<repo name>)
+DIFFUSERS_MODEL_DIR = os.getenv("CTB_DIFFUSERS_MODEL_DIR", "")
+# Deployed Modal app/class used by the modal backend (see src/img_gen_modal.py)
+MODAL_APP_NAME = os.getenv("CTB_MODAL_APP", "ctb-image-worker")
+MODAL_CLASS_NAME = os.getenv("CTB_MODAL_CLASS", "FluxWorker")
+# Repository id of the one model on the Modal worker's volume
+MODAL_MODEL = os.getenv("CTB_MODAL_MODEL", "black-forest-labs/FLUX.1-dev")
+# Artificial delay of the fake backend, in seconds
+FAKE_LATENCY = float(os.getenv("CTB_FAKE_LATENCY", "0"))
+
+logger = get_logger("backends")
+
+
+class Backend:
+    """
+    A place where images get rendered.
+
+    Every backend turns an already formatted prompt into a PIL image, so
+    caching, scheduling and storage in the generation core work the same
+    way on every deployment target. `token=None` lets the backend pick its
+    own credentials.
+    """
+
+    name = None
+
+    def text_to_image(self, model_name, prompt, width, height, num_inference_steps, guidance_scale, seed, token=None):
+        raise NotImplementedError
+
+    async def text_to_image_async(self, model_name, prompt, width, height, num_inference_steps, guidance_scale, seed, token=None):
+        # Blocking backends run in a worker thread so the event loop stays free
+        return await asyncio.to_thread(self.text_to_image, model_name, prompt, width, height, num_inference_steps, guidance_scale, seed, token)
+
+
+class HFInferenceBackend(Backend):
+    """
+    Hugging Face Inference API through the shared client pool (src/client_pool.py).
+
+    Without an explicit token each call is routed through the token pool
+    (src/token_pool.py), and tokens answered with a 429 are sidelined.
+    """
+
+    name = "hf"
+
+    def __init__(self, base_url=INFERENCE_URL, pool=token_pool):
+        self.base_url = base_url
+        self.pool = pool
+
+    def text_to_image(self, model_name, prompt, width, height, num_inference_steps, guidance_scale, seed, token=None):
+        pooled = token is None
+        if pooled:
+            token = self.pool.acquire()
+        try:
+            with client_pool.acquire(self._target(model_name), token=token) as client:
+                return client.text_to_image(
+                    prompt,
+                    guidance_scale=guidance_scale,
+                    num_inference_steps=num_inference_steps,
+                    width=width,
+                    height=height,
+                    seed=seed
+                )
+        except Exception as e:
+            if pooled:
+                self._report(token, e)
+            raise
+
+    async def text_to_image_async(self, model_name, prompt, width, height, num_inference_steps, guidance_scale, seed, token=None):
+        pooled = token is None
+        if pooled:
+            token = self.pool.acquire()
+        try:
+            async with client_pool.acquire_async(self._target(model_name), token=token) as client:
+                return await client.text_to_image(
+                    prompt,
+                    guidance_scale=guidance_scale,
+                    num_inference_steps=num_inference_steps,
+                    width=width,
+                    height=height,
+                    seed=seed
+                )
+        except Exception as e:
+            if pooled:
+                self._report(token, e)
+            raise
+
+    def _report(self, token, exc):
+        if classify(exc) == RATE_LIMITED:
+            self.pool.sideline(token, retry_after(exc))
+
+    def _target(self, model_name):
+        # A full URL makes the client post straight to that endpoint
+        return f"{self.base_url}/models/{model_name}" if self.base_url else model_name
+
+class DiffusersBackend(Backend):
+    """Local diffusers pipelines on CPU, loaded once per model and kept in memory."""
+
+    name = "diffusers"
+
+    def __init__(self, device="cpu"):
+        self.device = device
+        self._pipelines = {}
+        self._locks = {}
+        self._load_lock = threading.Lock()
+
+    def text_to_image(self, model_name, prompt, width, height, num_inference_steps, guidance_scale, seed, token=None):
+        import torch
+
+        pipe, lock = self._pipeline(model_name, token or api_token)
+        # Pipelines are not thread-safe; one generation per model at a time
+        with lock:
+            return pipe(
+                prompt,
+                guidance_scale=guidance_scale,
+                num_inference_steps=num_inference_steps,
+                width=width,
+                height=height,
+                generator=torch.Generator(self.device).manual_seed(seed)
+            ).images[0]
+
+    def _pipeline(self, model_name, token):
+        with self._load_lock:
+            if model_name not in self._pipelines:
+                import torch
+                from diffusers import AutoPipelineForText2Image
+
+                source = model_name
+                if DIFFUSERS_MODEL_DIR:
+                    source = os.path.join(DIFFUSERS_MODEL_DIR, model_name.split("/")[-1])
+                start = time.perf_counter()
+                pipe = AutoPipelineForText2Image.from_pretrained(source, torch_dtype=torch.float32, token=token)
+                pipe.to(self.device)
+                logger.info("Loaded pipeline", extra={"model": model_name, "device": self.device, "load_seconds": round(time.perf_counter() - start, 1)})
+                self._pipelines[model_name] = pipe
+                self._locks[model_name] = threading.Lock()
+            return self._pipelines[model_name], self._locks[model_name]
+
+
+class ModalBackend(Backend):
+    """
+    Remote rendering on the deployed Modal FluxWorker.
+
+    The worker serves the single model stored on its volume (MODAL_MODEL).
+    Requests for any other model are refused rather than silently rendered
+    with it, which would cache and index the image under the wrong model.
+    """
+
+    name = "modal"
+
+    def __init__(self, model=MODAL_MODEL):
+        self.model = model
+        self._worker = None
+
+    def text_to_image(self, model_name, prompt, width, height, num_inference_steps, guidance_scale, seed, token=None):
+        self._check_model(model_name)
+        result = self._get_worker().generate.remote(prompt, height, width, num_inference_steps, guidance_scale, seed)
+        return _decode(result["image"])
+
+    async def text_to_image_async(self, model_name, prompt, width, height, num_inference_steps, guidance_scale, seed, token=None):
+        self._check_model(model_name)
+        result = await self._get_worker().generate.remote.aio(prompt, height, width, num_inference_steps, guidance_scale, seed)
+        return _decode(result["image"])
+
+    def _check_model(self, model_name):
+        if model_name != self.model:
+            raise ValueError(f"The Modal worker only serves {self.model}, not {model_name}.")
+
+    def _get_worker(self):
+        if self._worker is None:
+            import modal
+            self._worker = modal.Cls.from_name(MODAL_APP_NAME, MODAL_CLASS_NAME)()
+        return self._worker
+
+
+class FakeBackend(Backend):
+    """Deterministic placeholder images derived from (model, prompt, seed); no network or GPU."""
+
+    name = "fake"
+
+    def text_to_image(self, model_name, prompt, width, height, num_inference_steps, guidance_scale, seed, token=None):
+        if FAKE_LATENCY:
+            time.sleep(FAKE_LATENCY)
+        return self._draw(model_name, prompt, width, height, seed)
+
+    async def text_to_image_async(self, model_name, prompt, width, height, num_inference_steps, guidance_scale, seed, token=None):
+        if FAKE_LATENCY:
+            await asyncio.sleep(FAKE_LATENCY)
+        return await asyncio.to_thread(self._draw, model_name, prompt, width, height, seed)
+
+    def _draw(self, model_name, prompt, width, height, seed):
+        from PIL import Image
+
+        # Same image as the stand-in server renders for the request
+        return Image.frombytes("RGB", (width, height), gradient_row(model_name, prompt, seed, width) * height)
+
+
+def _decode(data):
+    from PIL import Image
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    return image
+
+
+BACKENDS = {
+    "hf": HFInferenceBackend,
+    "diffusers": DiffusersBackend,
+    "modal": ModalBackend,
+    "fake": FakeBackend,
+}
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def get_backend(name=None):
+    """
+    Return the shared backend instance for `name` (default: CTB_BACKEND).
+
+    Raises:
+        ValueError: If the backend name is unknown.
+    """
+    name = name or BACKEND
+    with _instances_lock:
+        backend = _instances.get(name)
+        if backend is None:
+            if name not in BACKENDS:
+                raise ValueError(f"Unknown backend '{name}'. Choose one of: {', '.join(BACKENDS)}")
+            backend = _instances[name] = BACKENDS[name]()
+        return backend
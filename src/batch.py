@@ -0,0 +1,205 @@
+# batch.py
+"""
+Headless batch generation over the prompt x team x model x seed grid.
+
+Usage (from the repository root):
+    python -m src.batch --seeds 4 --workers 4 --manifest batch_manifest.jsonl
+
+Re-running with the same manifest resumes the run: jobs already recorded
+with status "ok" (or "duplicate") and the same render parameters are
+skipped.
+
+With --dedupe flag, outputs that are near-duplicates of an earlier output
+of the run (perceptual hash, see src/phash.py) are marked in the manifest;
+with --dedupe drop their files are also deleted.
+"""
+import argparse
+import io
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, ALL_COMPLETED, FIRST_COMPLETED
+from src.gallery_index import gallery_index, GALLERY_ENABLED
+from src.img_gen import generate_image, get_pack_store
+from src.logging_setup import configure_logging
+from src.phash import phash, BKTree, DEDUPE_DISTANCE
+from src.prompt_registry import registry, TEAMS
+
+# Manifest statuses of jobs that don't need to run again
+DONE_STATUSES = {"ok", "duplicate"}
+
+
+def job_key(job):
+    # Render parameters are part of the key, so a rerun at another size or step count is not skipped
+    return (
+        job["prompt_alias"], job["team"], job["model_alias"], int(job["seed"]),
+        int(job["height"]), int(job["width"]), int(job["num_inference_steps"]), float(job["guidance_scale"])
+    )
+
+
+def expand_grid(prompt_aliases, teams, model_aliases, seeds, height, width, num_inference_steps, guidance_scale):
+    """Lazily yield one job dict per grid combination."""
+    for prompt_alias, team, model_alias, seed in itertools.product(prompt_aliases, teams, model_aliases, seeds):
+        yield {
+            "prompt_alias": prompt_alias,
+            "team": team,
+            "model_alias": model_alias,
+            "seed": seed,
+            "height": height,
+            "width": width,
+            "num_inference_steps": num_inference_steps,
+            "guidance_scale": guidance_scale,
+        }
+
+
+def load_completed(manifest_path):
+    """Return the keys of jobs that already finished successfully in `manifest_path`."""
+    completed = set()
+    if not os.path.exists(manifest_path):
+        return completed
+    with open(manifest_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by a crash; the job will simply run again
+                continue
+            if record.get("status") in DONE_STATUSES:
+                completed.add(job_key(record))
+    return completed
+
+
+def load_hashes(manifest_path):
+    """Rebuild the near-duplicate index from the kept outputs recorded in `manifest_path`."""
+    tree = BKTree()
+    if not os.path.exists(manifest_path):
+        return tree
+    with open(manifest_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("status") == "ok" and record.get("phash"):
+                tree.add(int(record["phash"], 16), record["output"])
+    return tree
+
+
+def load_output(output):
+    """Open a generated image from a file path or a pack store id."""
+    from PIL import Image
+
+    if os.path.isfile(output):
+        with Image.open(output) as image:
+            return image.convert("RGB")
+    stored = get_pack_store().get(output)
+    if stored is None:
+        raise FileNotFoundError(f"No stored image {output}")
+    return Image.open(io.BytesIO(stored[1])).convert("RGB")
+
+
+def run_job(job, hash_output=False):
+    start = time.perf_counter()
+    try:
+        output, message = generate_image(job["prompt_alias"], job["team"], job["model_alias"], "", job["height"], job["width"], job["num_inference_steps"], job["guidance_scale"], job["seed"], return_image=False)
+    except Exception as e:
+        output, message = None, f"An error occurred: {e}"
+    record = dict(job, output=output, message=message, status="ok" if output else "error", latency=round(time.perf_counter() - start, 3))
+    if hash_output and output:
+        # Hashed on the worker thread; only the index lookup happens in order
+        try:
+            record["phash"] = f"{phash(load_output(output)):016x}"
+        except Exception as e:
+            record["phash_error"] = str(e)
+    return record
+
+
+def check_duplicate(record, tree, dedupe, distance):
+    """Mark (and with dedupe="drop", delete) a record whose output is a near-duplicate of an earlier one."""
+    if "phash" not in record:
+        return
+    value = int(record["phash"], 16)
+    match = tree.nearest(value, distance)
+    if match is None:
+        tree.add(value, record["output"])
+        return
+    record["duplicate_of"], record["distance"] = match[2], match[0]
+    if dedupe == "drop":
+        record["status"] = "duplicate"
+        # Cached results live in the result cache, not in this run's storage
+        if os.path.isfile(record["output"]) and not record["message"].endswith("(cached)"):
+            os.remove(record["output"])
+            # Keep the gallery from listing an image that no longer exists
+            if GALLERY_ENABLED:
+                gallery_index.remove(record["output"])
+
+
+def run_batch(jobs, manifest_path, workers=4, dedupe="off", dedupe_distance=DEDUPE_DISTANCE):
+    """
+    Run `jobs` with at most `workers` generations in flight, appending one
+    manifest record per finished job.
+
+    Returns:
+        dict: Counts of "ok", "error", "duplicate" and "skipped" jobs.
+    """
+    completed = load_completed(manifest_path)
+    tree = load_hashes(manifest_path) if dedupe != "off" else None
+    counts = {"ok": 0, "error": 0, "duplicate": 0, "skipped": 0}
+    pending = set()
+
+    with open(manifest_path, "a", encoding="utf-8") as manifest, ThreadPoolExecutor(max_workers=workers) as executor:
+        def drain(return_when):
+            nonlocal pending
+            done, pending = wait(pending, return_when=return_when)
+            for future in done:
+                record = future.result()
+                if tree is not None:
+                    check_duplicate(record, tree, dedupe, dedupe_distance)
+                counts[record["status"]] += 1
+                manifest.write(json.dumps(record) + "\n")
+                manifest.flush()
+                duplicate = f" (near-duplicate of {record['duplicate_of']})" if "duplicate_of" in record else ""
+                print(f"[{record['status']}] {record['latency']:.1f}s {record['prompt_alias']} / {record['team']} / {record['model_alias']} / seed {record['seed']}: {record['output'] or record['message']}{duplicate}")
+
+        for job in jobs:
+            if job_key(job) in completed:
+                counts["skipped"] += 1
+                continue
+            # Keep the grid lazy: never queue more than `workers` jobs ahead
+            if len(pending) >= workers:
+                drain(FIRST_COMPLETED)
+            pending.add(executor.submit(run_job, job, tree is not None))
+        if pending:
+            drain(ALL_COMPLETED)
+
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate the full prompt x team x model x seed grid.")
+    parser.add_argument("--prompts", nargs="*", default=registry.prompt_aliases(), help="Prompt aliases (default: all)")
+    parser.add_argument("--teams", nargs="*", default=TEAMS, help="Teams (default: Red Blue)")
+    parser.add_argument("--models", nargs="*", default=registry.model_aliases(), help="Model aliases (default: all)")
+    parser.add_argument("--seeds", type=int, default=1, help="Number of seeds per combination")
+    parser.add_argument("--seed-start", type=int, default=0, help="First seed of the range")
+    parser.add_argument("--height", type=int, default=360)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--guidance-scale", type=float, default=2.0)
+    parser.add_argument("--workers", type=int, default=4, help="Maximum concurrent generations")
+    parser.add_argument("--manifest", default="batch_manifest.jsonl", help="JSONL manifest to append to and resume from")
+    parser.add_argument("--dedupe", choices=["off", "flag", "drop"], default="off", help="Mark or delete near-duplicate outputs")
+    parser.add_argument("--dedupe-distance", type=int, default=DEDUPE_DISTANCE, help="Maximum perceptual hash distance of near-duplicates")
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    seeds = range(args.seed_start, args.seed_start + args.seeds)
+    jobs = expand_grid(args.prompts, args.teams, args.models, seeds, args.height, args.width, args.steps, args.guidance_scale)
+    counts = run_batch(jobs, args.manifest, workers=args.workers, dedupe=args.dedupe, dedupe_distance=args.dedupe_distance)
+    print(f"Done: {counts['ok']} ok, {counts['error']} failed, {counts['duplicate']} near-duplicates dropped, {counts['skipped']} skipped (already completed)")
+    return 0 if counts["error"] == 0 else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
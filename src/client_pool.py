@@ -0,0 +1,230 @@
+# client_pool.py
+import asyncio
+import os
+import threading
+import time
+
+# Maximum number of simultaneous connections (and in-flight calls) per model
+MAX_CONNECTIONS_PER_MODEL = int(os.getenv("CTB_MAX_CONNECTIONS_PER_MODEL", "4"))
+# Evict a client after this many consecutive failed calls
+MAX_CONSECUTIVE_FAILURES = int(os.getenv("CTB_CLIENT_MAX_FAILURES", "3"))
+# Evict a client that has been idle for longer than this (seconds)
+CLIENT_IDLE_TTL = float(os.getenv("CTB_CLIENT_IDLE_TTL", "600"))
+
+# Seconds between slot checks of an async call waiting for a busy model
+_SLOT_POLL_INTERVAL = 0.05
+
+
+def _configure_keep_alive(max_connections):
+    """
+    Size the HTTP connection pool used by huggingface_hub so keep-alive
+    connections are reused across requests instead of being reopened.
+
+    Older/newer huggingface_hub releases without `configure_http_backend`
+    keep their default session handling.
+    """
+    try:
+        import requests
+        from huggingface_hub import configure_http_backend
+    except ImportError:
+        return
+
+    def backend_factory():
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=max_connections, pool_maxsize=max_connections)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    configure_http_backend(backend_factory=backend_factory)
+
+
+class _PooledClient:
+    def __init__(self, client):
+        self.client = client
+        self.failures = 0
+        self.leases = 0
+        self.evicted = False
+        self.last_used = time.monotonic()
+
+
+class _Lease:
+    """Context manager that holds one of the model's connection slots while using a pooled client."""
+
+    def __init__(self, pool, key, entry, slots):
+        self._pool = pool
+        self._key = key
+        self._entry = entry
+        self._slots = slots
+
+    def __enter__(self):
+        self._slots.acquire()
+        return self._entry.client
+
+    def __exit__(self, exc_type, exc, tb):
+        self._slots.release()
+        self._pool._record_result(self._pool._entries, self._key, self._entry, ok=exc_type is None)
+        return False
+
+
+class _AsyncLease:
+    """
+    Async counterpart of _Lease. The slots are shared with the blocking
+    clients, so they are polled instead of waited on to keep the event loop free.
+    """
+
+    def __init__(self, pool, key, entry, slots):
+        self._pool = pool
+        self._key = key
+        self._entry = entry
+        self._slots = slots
+
+    async def __aenter__(self):
+        try:
+            while not self._slots.acquire(blocking=False):
+                await asyncio.sleep(_SLOT_POLL_INTERVAL)
+        except BaseException:
+            self._pool._return(self._entry)
+            raise
+        return self._entry.client
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._slots.release()
+        self._pool._record_result(self._pool._async_entries, self._key, self._entry, ok=exc_type is None)
+        self._pool._return(self._entry)
+        await self._pool._close_evicted()
+        return False
+
+
+class ClientPool:
+    """
+    Process-wide pool of InferenceClient and AsyncInferenceClient instances
+    keyed by (model name, token).
+
+    The concurrency limit is per model, shared by both kinds of clients, and
+    outlives them: a client evicted while calls are in flight is replaced
+    without resetting it. Evicted async clients are closed once their last
+    call has finished.
+
+    Args:
+        max_connections (int): Maximum concurrent calls per model.
+        max_failures (int): Consecutive failures before a client is evicted.
+        idle_ttl (float): Seconds of inactivity before a client is evicted.
+    """
+
+    def __init__(self, max_connections=MAX_CONNECTIONS_PER_MODEL, max_failures=MAX_CONSECUTIVE_FAILURES, idle_ttl=CLIENT_IDLE_TTL):
+        self.max_connections = max_connections
+        self.max_failures = max_failures
+        self.idle_ttl = idle_ttl
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._async_entries = {}
+        self._closing = []  # evicted async clients without calls in flight
+        self._slots = {}  # model name -> semaphore shared by all of the model's clients
+        self._keep_alive_configured = False
+
+    def acquire(self, model_name, token=None):
+        """
+        Return a lease on the pooled client for `model_name`.
+
+        Use the lease as a context manager; it blocks while the model already
+        has `max_connections` calls in flight and records the call outcome
+        for health-based eviction.
+        """
+        key = (model_name, token)
+        with self._lock:
+            self._evict_idle()
+            entry = self._entries.get(key)
+            if entry is None:
+                if not self._keep_alive_configured:
+                    _configure_keep_alive(self.max_connections)
+                    self._keep_alive_configured = True
+                # Imported on first use so importing the generation core stays cheap
+                from huggingface_hub import InferenceClient
+                entry = _PooledClient(InferenceClient(model_name, token=token))
+                self._entries[key] = entry
+            entry.last_used = time.monotonic()
+        return _Lease(self, key, entry, self._model_slots(model_name))
+
+    def acquire_async(self, model_name, token=None):
+        """
+        Return a lease on the pooled AsyncInferenceClient for `model_name`.
+
+        Use the lease with `async with`; it waits while the model already has
+        `max_connections` calls in flight (sync and async together).
+        """
+        key = (model_name, token)
+        with self._lock:
+            self._evict_idle()
+            entry = self._async_entries.get(key)
+            if entry is None:
+                from huggingface_hub import AsyncInferenceClient
+                entry = _PooledClient(AsyncInferenceClient(model_name, token=token))
+                self._async_entries[key] = entry
+            entry.leases += 1
+            entry.last_used = time.monotonic()
+        return _AsyncLease(self, key, entry, self._model_slots(model_name))
+
+    def evict(self, model_name, token=None):
+        """Drop the pooled clients for `model_name` so the next call builds fresh ones."""
+        with self._lock:
+            for entries in (self._entries, self._async_entries):
+                if (model_name, token) in entries:
+                    self._drop(entries, (model_name, token))
+
+    def clear(self):
+        with self._lock:
+            for entries in (self._entries, self._async_entries):
+                for key in list(entries):
+                    self._drop(entries, key)
+
+    def _model_slots(self, model_name):
+        with self._lock:
+            slots = self._slots.get(model_name)
+            if slots is None:
+                slots = self._slots[model_name] = threading.BoundedSemaphore(self.max_connections)
+            return slots
+
+    def _record_result(self, entries, key, entry, ok):
+        with self._lock:
+            entry.last_used = time.monotonic()
+            if ok:
+                entry.failures = 0
+                return
+            entry.failures += 1
+            # Evict unhealthy clients; in-flight leases keep their own reference
+            if entry.failures >= self.max_failures and entries.get(key) is entry:
+                self._drop(entries, key)
+
+    def _evict_idle(self):
+        now = time.monotonic()
+        for entries in (self._entries, self._async_entries):
+            for key, entry in list(entries.items()):
+                if now - entry.last_used > self.idle_ttl:
+                    self._drop(entries, key)
+
+    def _drop(self, entries, key):
+        entry = entries.pop(key)
+        entry.evicted = True
+        if entries is self._async_entries and not entry.leases:
+            self._closing.append(entry.client)
+
+    def _return(self, entry):
+        with self._lock:
+            entry.leases -= 1
+            if entry.evicted and not entry.leases:
+                self._closing.append(entry.client)
+
+    async def _close_evicted(self):
+        with self._lock:
+            clients, self._closing = self._closing, []
+        for client in clients:
+            try:
+                await client.close()
+            except Exception:
+                # The client is gone either way; a failed close only leaks its connections
+                pass
+
+
+# Shared pool used by every generation code path in the process
+client_pool = ClientPool()
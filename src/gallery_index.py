@@ -0,0 +1,168 @@
+# gallery_index.py
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+# Record every persisted image in the gallery index
+GALLERY_ENABLED = os.getenv("CTB_GALLERY", "1") == "1"
+GALLERY_DB = os.getenv("CTB_GALLERY_DB", "gallery.sqlite3")
+THUMBNAIL_DIR = os.getenv("CTB_THUMBNAIL_DIR", "thumbnails")
+# Longest edge of a thumbnail, in pixels
+THUMBNAIL_SIZE = int(os.getenv("CTB_THUMBNAIL_SIZE", "192"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    id INTEGER PRIMARY KEY,
+    created REAL NOT NULL,
+    prompt_alias TEXT NOT NULL,
+    team TEXT NOT NULL,
+    model_alias TEXT NOT NULL,
+    custom_prompt TEXT NOT NULL,
+    seed INTEGER NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    num_inference_steps INTEGER NOT NULL,
+    guidance_scale REAL NOT NULL,
+    latency_ms REAL,
+    storage TEXT NOT NULL,
+    location TEXT NOT NULL,
+    bytes INTEGER NOT NULL,
+    thumbnail TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS images_combo ON images (prompt_alias, team, model_alias, id);
+CREATE INDEX IF NOT EXISTS images_model ON images (model_alias, id);
+CREATE INDEX IF NOT EXISTS images_seed ON images (seed);
+CREATE INDEX IF NOT EXISTS images_location ON images (location);
+"""
+
+# Filters accepted by query/count, mapped to their columns
+_FILTERS = ("prompt_alias", "team", "model_alias", "seed")
+
+
+class GalleryIndex:
+    """
+    SQLite index of generated images with precomputed JPEG thumbnails.
+
+    Thumbnails are made from the in-memory image when it is recorded, so
+    browsing never decodes a full PNG. Each thread uses its own connection;
+    the database runs in WAL mode so the UI can read while images are added.
+
+    Args:
+        path (str): SQLite database file.
+        thumbnail_dir (str): Directory for thumbnail files.
+        thumbnail_size (int): Longest thumbnail edge in pixels.
+    """
+
+    def __init__(self, path=GALLERY_DB, thumbnail_dir=THUMBNAIL_DIR, thumbnail_size=THUMBNAIL_SIZE):
+        self.path = path
+        self.thumbnail_dir = thumbnail_dir
+        self.thumbnail_size = thumbnail_size
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            with self._init_lock:
+                if not self._initialized:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.executescript(_SCHEMA)
+                    self._initialized = True
+            conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def add(self, image, params, storage, location, size_bytes):
+        """
+        Index a persisted image and write its thumbnail.
+
+        Args:
+            image (PIL.Image.Image): The generated image.
+            params (dict): Generation parameters (see src.img_gen.build_params).
+            storage (str): "files" or "pack".
+            location (str): File path or pack image id.
+            size_bytes (int): Size of the stored PNG.
+
+        Returns:
+            int: Row id of the new entry.
+        """
+        name = uuid.uuid4().hex
+        thumbnail = os.path.join(self.thumbnail_dir, name[:2], f"{name}.jpg")
+        os.makedirs(os.path.dirname(thumbnail), exist_ok=True)
+        thumb = image.convert("RGB")
+        thumb.thumbnail((self.thumbnail_size, self.thumbnail_size))
+        thumb.save(thumbnail, format="JPEG", quality=80)
+
+        conn = self._connection()
+        with conn:
+            cursor = conn.execute(
+                "INSERT INTO images (created, prompt_alias, team, model_alias, custom_prompt, seed, width, height, num_inference_steps,"
+                " guidance_scale, latency_ms, storage, location, bytes, thumbnail) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (time.time(), params["prompt_alias"], params["team"], params["model_alias"], params["custom_prompt"], params["seed"],
+                 params["width"], params["height"], params["num_inference_steps"], params["guidance_scale"], params.get("latency_ms"),
+                 storage, location, size_bytes, thumbnail)
+            )
+        return cursor.lastrowid
+
+    def _where(self, filters):
+        clauses, values = [], []
+        for name in _FILTERS:
+            value = filters.get(name)
+            if value is not None:
+                clauses.append(f"{name} = ?")
+                values.append(value)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", values
+
+    def query(self, page=0, page_size=24, **filters):
+        """
+        Return one page of entries, newest first, as dicts.
+
+        Filters: prompt_alias, team, model_alias, seed (None = any).
+        """
+        where, values = self._where(filters)
+        rows = self._connection().execute(
+            f"SELECT * FROM images{where} ORDER BY id DESC LIMIT ? OFFSET ?", values + [page_size, page * page_size]
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def count(self, **filters):
+        where, values = self._where(filters)
+        return self._connection().execute(f"SELECT COUNT(*) FROM images{where}", values).fetchone()[0]
+
+    def remove(self, location):
+        """
+        Drop the entries of a deleted image and their thumbnails.
+
+        Returns:
+            int: Number of entries removed.
+        """
+        conn = self._connection()
+        with conn:
+            rows = conn.execute("SELECT thumbnail FROM images WHERE location = ?", (location,)).fetchall()
+            conn.execute("DELETE FROM images WHERE location = ?", (location,))
+        for row in rows:
+            try:
+                os.remove(row["thumbnail"])
+            except OSError:
+                pass
+        return len(rows)
+
+    def get(self, image_id):
+        """
+        Return one entry by id.
+
+        Raises:
+            KeyError: If there is no such entry.
+        """
+        row = self._connection().execute("SELECT * FROM images WHERE id = ?", (image_id,)).fetchone()
+        if row is None:
+            raise KeyError(image_id)
+        return dict(row)
+
+
+# Shared index used by the generation code paths and the gallery tab
+gallery_index = GalleryIndex()
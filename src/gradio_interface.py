@@ -1,29 +1,102 @@
 # gradio_interface.py (HuggingFace Spaces)
+import math
+import os
 import gradio as gr
-from config.config import prompts, models  # Direct import
-from src.img_gen import generate
+from src.gallery_index import gallery_index
+from src.prompt_registry import registry, TEAMS
+from src.img_gen_async import generate_progressive, generate_queued  # Async handlers, no thread held per request
+from src.workers import generate_via_workers, WORKERS
+
+# Show a quick low-step draft before the full image
+PROGRESSIVE_PREVIEW = os.getenv("CTB_PROGRESSIVE_PREVIEW", "1") == "1"
+# Thumbnails per gallery page
+GALLERY_PAGE_SIZE = int(os.getenv("CTB_GALLERY_PAGE_SIZE", "24"))
+
+ALL = "All"
+
+
+async def generate(prompt_alias, team_color, model_alias, custom_prompt, request: gr.Request):
+    # Queue per model and session, streaming position/ETA (and the draft preview) into the outputs
+    session_id = request.session_hash if request else None
+    if WORKERS:
+        handler = generate_via_workers
+    else:
+        handler = generate_progressive if PROGRESSIVE_PREVIEW else generate_queued
+    async for update in handler(prompt_alias, team_color, model_alias, custom_prompt, session_id=session_id):
+        yield update
+
+
+def load_gallery(prompt_alias, team_color, model_alias, page):
+    # Only thumbnails are loaded; full images are never decoded for browsing
+    filters = {
+        "prompt_alias": None if prompt_alias == ALL else prompt_alias,
+        "team": None if team_color == ALL else team_color,
+        "model_alias": None if model_alias == ALL else model_alias,
+    }
+    total = gallery_index.count(**filters)
+    pages = max(1, math.ceil(total / GALLERY_PAGE_SIZE))
+    page = min(max(1, int(page or 1)), pages)
+    rows = gallery_index.query(page - 1, GALLERY_PAGE_SIZE, **filters)
+    items = [(row["thumbnail"], f"{row['prompt_alias']} / {row['team']} / {row['model_alias']} / seed {row['seed']}") for row in rows]
+    return items, page, f"Page {page} of {pages} ({total} images)"
+
+
+def previous_page(prompt_alias, team_color, model_alias, page):
+    return load_gallery(prompt_alias, team_color, model_alias, int(page or 1) - 1)
+
+
+def next_page(prompt_alias, team_color, model_alias, page):
+    return load_gallery(prompt_alias, team_color, model_alias, int(page or 1) + 1)
+
 
 # Gradio Interface
 with gr.Blocks() as demo:
     gr.Markdown("# CtB AI Image Generator")
-    with gr.Row():
-        # Set default values for dropdowns
-        prompt_dropdown = gr.Dropdown(choices=[p["alias"] for p in prompts], label="Select Prompt", value=prompts[0]["alias"])
-        team_dropdown = gr.Dropdown(choices=["Red", "Blue"], label="Select Team", value="Red")
-        model_dropdown = gr.Dropdown(choices=[m["alias"] for m in models], label="Select Model", value=models[0]["alias"])
-    with gr.Row():
-        # Add a text box for custom user input (max 200 characters)
-        custom_prompt_input = gr.Textbox(label="Custom Prompt (Optional)", placeholder="Enter additional details (max 200 chars)...", max_lines=1, max_length=200)
-    with gr.Row():
-        generate_button = gr.Button("Generate Image")
-    with gr.Row():
-        output_image = gr.Image(label="Generated Image")
-    with gr.Row():
-        status_text = gr.Textbox(label="Status", placeholder="Waiting for input...", interactive=False)
-
-    # Connect the button to the function
+    prompt_aliases = registry.prompt_aliases()
+    model_aliases = registry.model_aliases()
+    with gr.Tab("Generate"):
+        with gr.Row():
+            # Set default values for dropdowns
+            prompt_dropdown = gr.Dropdown(choices=prompt_aliases, label="Select Prompt", value=prompt_aliases[0])
+            team_dropdown = gr.Dropdown(choices=TEAMS, label="Select Team", value=TEAMS[0])
+            model_dropdown = gr.Dropdown(choices=model_aliases, label="Select Model", value=model_aliases[0])
+        with gr.Row():
+            # Add a text box for custom user input (max 200 characters)
+            custom_prompt_input = gr.Textbox(label="Custom Prompt (Optional)", placeholder="Enter additional details (max 200 chars)...", max_lines=1, max_length=200)
+        with gr.Row():
+            generate_button = gr.Button("Generate Image")
+        with gr.Row():
+            output_image = gr.Image(label="Generated Image")
+        with gr.Row():
+            status_text = gr.Textbox(label="Status", placeholder="Waiting for input...", interactive=False)
+
+    with gr.Tab("Gallery"):
+        with gr.Row():
+            gallery_prompt = gr.Dropdown(choices=[ALL] + prompt_aliases, label="Prompt", value=ALL)
+            gallery_team = gr.Dropdown(choices=[ALL] + TEAMS, label="Team", value=ALL)
+            gallery_model = gr.Dropdown(choices=[ALL] + model_aliases, label="Model", value=ALL)
+        with gr.Row():
+            previous_button = gr.Button("Previous")
+            page_number = gr.Number(label="Page", value=1, precision=0)
+            next_button = gr.Button("Next")
+            refresh_button = gr.Button("Refresh")
+        gallery_info = gr.Markdown()
+        gallery = gr.Gallery(label="Past Generations", columns=6, object_fit="contain", height="auto")
+
+    # Connect the button to the function (per-model limits are enforced by the scheduler)
     generate_button.click(
         generate,
         inputs=[prompt_dropdown, team_dropdown, model_dropdown, custom_prompt_input],
-        outputs=[output_image, status_text]
-    )
\ No newline at end of file
+        outputs=[output_image, status_text],
+        concurrency_limit=None
+    )
+
+    gallery_inputs = [gallery_prompt, gallery_team, gallery_model, page_number]
+    gallery_outputs = [gallery, page_number, gallery_info]
+    refresh_button.click(load_gallery, inputs=gallery_inputs, outputs=gallery_outputs)
+    page_number.submit(load_gallery, inputs=gallery_inputs, outputs=gallery_outputs)
+    previous_button.click(previous_page, inputs=gallery_inputs, outputs=gallery_outputs)
+    next_button.click(next_page, inputs=gallery_inputs, outputs=gallery_outputs)
+    for dropdown in (gallery_prompt, gallery_team, gallery_model):
+        dropdown.change(load_gallery, inputs=[gallery_prompt, gallery_team, gallery_model, gr.State(1)], outputs=gallery_outputs)
+    demo.load(load_gallery, inputs=gallery_inputs, outputs=gallery_outputs)
@@ -0,0 +1,74 @@
+# image_writer.py
+import atexit
+import os
+import queue
+import threading
+from src.logging_setup import get_logger
+
+# Maximum number of images waiting to be written before callers save inline
+WRITER_QUEUE_SIZE = int(os.getenv("CTB_WRITER_QUEUE_SIZE", "256"))
+
+logger = get_logger("image_writer")
+
+
+class ImageWriter:
+    """
+    Background thread that persists generated images off the request path.
+
+    Args:
+        max_pending (int): Images allowed to wait in memory for the writer.
+    """
+
+    def __init__(self, max_pending=WRITER_QUEUE_SIZE):
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.errors = 0
+
+    def submit(self, save, *args):
+        """
+        Queue `save(*args)` to run on the writer thread.
+
+        Returns:
+            bool: False if the writer is saturated and the caller should save inline.
+        """
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((save, args))
+        except queue.Full:
+            return False
+        return True
+
+    def pending(self):
+        """Number of images waiting to be written."""
+        return self._queue.qsize()
+
+    def flush(self):
+        """Block until every queued image has been written."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="image-writer", daemon=True)
+                self._thread.start()
+                # Don't lose queued images on a normal interpreter shutdown
+                atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            save, args = self._queue.get()
+            try:
+                save(*args)
+            except Exception as e:
+                self.errors += 1
+                logger.warning("Background save failed", extra={"error": str(e)})
+            finally:
+                self._queue.task_done()
+
+
+# Shared writer used by the generation code paths
+image_writer = ImageWriter()
@@ -1,10 +1,37 @@
 # img_gen.py
 import sys
 import os
+import io
+import logging
 import random
-from huggingface_hub import InferenceClient
+import time
+import threading
 from datetime import datetime
-from config.config import models, prompts, api_token  # Direct import
+from src import metrics
+from src.backends import get_backend
+from src.gallery_index import gallery_index, GALLERY_ENABLED
+from src.image_writer import image_writer
+from src.logging_setup import get_logger, request_context, sample_verbose
+from src.pack_store import PackStore
+from src.prompt_registry import registry, TEAMS
+from src.resilience import classify, resilience, MODEL_FALLBACK, RETRYABLE
+from src.result_cache import cache_key, result_cache
+from src.single_flight import single_flight
+from src.upscale import native_size, upscale, UPSCALE_FACTOR
+from src.warmer import warmer
+
+# Return the in-memory image and save it in the background instead of returning a saved file path (always on with "pack" storage)
+RETURN_IMAGES = os.getenv("CTB_RETURN_IMAGES", "1") == "1"
+# Where images are persisted: "files" (one PNG per image in the CWD) or "pack" (src/pack_store.py)
+STORAGE_BACKEND = os.getenv("CTB_STORAGE", "files")
+
+# (height, width, num_inference_steps, guidance_scale) of pre-generated images; the UI's defaults
+WARM_PARAMS = (360, 640, 20, 2.0)
+
+_pack_store = None
+_pack_store_lock = threading.Lock()
+
+logger = get_logger("img_gen")
 
 def generate(prompt_alias, team_color, model_alias, custom_prompt, height=360, width=640, num_inference_steps=20, guidance_scale=2.0, seed=-1):
     try:
@@ -15,69 +42,357 @@ def generate(prompt_alias, team_color, model_alias, custom_prompt, height=360, w
         return None, f"An error occurred: {e}"
 
 
-def generate_image(prompt_alias, team_color, model_alias, custom_prompt, height=360, width=640, num_inference_steps=20, guidance_scale=2.0, seed=-1):
-    # Find the selected prompt and model
+def build_prompt(prompt, custom_prompt):
+    # Full prompt text only at DEBUG; request records identify it by alias
+    logger.debug("Formatted prompt", extra={"prompt": prompt})
+
+    # Append the custom prompt (if provided)
+    if custom_prompt and len(custom_prompt.strip()) > 0:
+        prompt += " " + custom_prompt.strip()
+
+    return prompt
+
+
+def cache_result(key, path=None, data=None):
+    # Cache failures must never fail the request
     try:
-        prompt = next(p for p in prompts if p["alias"] == prompt_alias)["text"]
-        model_name = next(m for m in models if m["alias"] == model_alias)["name"]
-    except StopIteration:
-        return None, "ERROR: Invalid prompt or model selected."
+        if data is not None:
+            result_cache.put_bytes(key, data)
+        else:
+            result_cache.put_file(key, path)
+    except Exception as e:
+        logger.warning("Failed to cache image", extra={"error": str(e)})
 
-    # Determine the enemy color
-    enemy_color = "blue" if team_color.lower() == "red" else "red"
 
-    # if team.lower() == "red":
-    #     winning_team_text = " The winning army is dressed in red armor and banners."
-    # elif team.lower() == "blue":
-    #     winning_team_text = " The winning army is dressed in blue armor and banners."
+def draw_seed():
+    """A seed for a random (seed=-1) request."""
+    return random.randint(0, 1000000)
 
-    # Print the original prompt and dynamic values for debugging
-    print("Original Prompt:")
-    print(prompt)
-    print(f"Enemy Color: {enemy_color}")
-    print(f"Team Color: {team_color.lower()}")
 
-    prompt = prompt.format(team_color=team_color.lower(), enemy_color=enemy_color)
+def metric_labels(prompt_alias, team_color, model_alias):
+    # Unknown aliases share one label value so arbitrary API input can't blow up the series count
+    return {
+        "model": model_alias if model_alias in registry.model_aliases() else "other",
+        "prompt": prompt_alias if prompt_alias in registry.prompt_aliases() else "other",
+        "team": team_color if team_color in TEAMS else "other",
+    }
 
-    # Print the formatted prompt for debugging
-    print("\nFormatted Prompt:")
-    print(prompt)
 
-    # Append the custom prompt (if provided)
-    if custom_prompt and len(custom_prompt.strip()) > 0:
-        prompt += " " + custom_prompt.strip()
+def record_outcome(labels, result, message, elapsed_ms, prompt_alias, team_color, model_alias, custom_prompt, seed):
+    if result is None:
+        outcome = "error"
+    elif message.endswith("(cached)"):
+        outcome = "cached"
+    elif message.endswith("(pre-generated)"):
+        outcome = "pooled"
+    else:
+        outcome = "ok"
+    metrics.requests_total.inc(outcome=outcome, **labels)
 
-    # Randomize the seed if needed
-    if seed == -1:
-        seed = random.randint(0, 1000000)
+    # One record per request; verbose fields only for a sample of them
+    fields = {"outcome": outcome, "model": model_alias, "prompt_alias": prompt_alias, "team": team_color, "seed": seed, "duration_ms": elapsed_ms}
+    if seed is None:
+        # Pre-generated images were rendered with a seed this request never saw
+        del fields["seed"]
+    if outcome == "error":
+        fields["error"] = message
+    if custom_prompt and sample_verbose():
+        fields["custom_prompt"] = custom_prompt
+    logger.log(logging.WARNING if outcome == "error" else logging.INFO, "Generation finished", extra=fields)
 
-    # Initialize the InferenceClient
-    try:
-        client = InferenceClient(model_name, token=api_token)
-    except Exception as e:
-        return None, f"ERROR: Failed to initialize InferenceClient. Details: {e}"
 
-     #Generate the image
-    try:
-        image = client.text_to_image(
-            prompt,
-            guidance_scale=guidance_scale,
-            num_inference_steps=num_inference_steps,
-            width=width,
-            height=height,
-            seed=seed
-        )
-    except Exception as e:
-        return None, f"ERROR: Failed to generate image. Details: {e}"
+def _collect_metrics():
+    cache = result_cache.stats()
+    return (
+        metrics.sample("ctb_result_cache_hits_total", "counter", "Result cache hits.", cache["hits"])
+        + metrics.sample("ctb_result_cache_misses_total", "counter", "Result cache misses.", cache["misses"])
+        + metrics.sample("ctb_writer_pending", "gauge", "Images waiting for the background writer.", image_writer.pending())
+        + metrics.sample("ctb_writer_errors_total", "counter", "Failed background saves.", image_writer.errors)
+    )
+
+
+metrics.registry.register_collector(_collect_metrics)
+
+
+def get_pack_store():
+    global _pack_store
+    with _pack_store_lock:
+        if _pack_store is None:
+            _pack_store = PackStore()
+        return _pack_store
 
-    #return prompt  # For testing purposes, return the formatted prompt
 
-    # Save the image with a timestamped filename
+def build_output_filename(model_alias, prompt_alias, team_color, seed):
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_filename = f"{timestamp}_{model_alias.replace(' ', '_').lower()}_{prompt_alias.replace(' ', '_').lower()}_{team_color.lower()}.png"
+    return f"{timestamp}_{model_alias.replace(' ', '_').lower()}_{seed}_{prompt_alias.replace(' ', '_').lower()}_{team_color.lower()}.png"
+
+
+def build_params(prompt_alias, team_color, model_alias, custom_prompt, height, width, num_inference_steps, guidance_scale, seed):
+    return {
+        "prompt_alias": prompt_alias,
+        "team": team_color,
+        "model_alias": model_alias,
+        "custom_prompt": custom_prompt or "",
+        "height": height,
+        "width": width,
+        "num_inference_steps": num_inference_steps,
+        "guidance_scale": guidance_scale,
+        "seed": seed,
+    }
+
+
+def persist_image(image, output_filename, params, key=None):
+    """
+    Save a generated image to the configured storage backend and, for
+    seeded requests, to the result cache.
+
+    Returns:
+        str: The file path ("files" storage) or pack image id ("pack" storage).
+    """
+    model = params["model_alias"] if params["model_alias"] in registry.model_aliases() else "other"
+    # Encode once so encoding and disk time are measured separately
+    with metrics.stage("encode", model):
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+        data = buffer.getvalue()
+
+    with metrics.stage("write", model):
+        if STORAGE_BACKEND == "pack":
+            location = get_pack_store().put(data, params)
+        else:
+            with open(output_filename, "wb") as f:
+                f.write(data)
+            location = output_filename
+
+    if key:
+        with metrics.stage("cache_write", model):
+            cache_result(key, data=data)
+
+    # Index the image with a thumbnail for the gallery tab
+    if GALLERY_ENABLED:
+        try:
+            with metrics.stage("index", model):
+                gallery_index.add(image, params, STORAGE_BACKEND, location, len(data))
+        except Exception as e:
+            logger.warning("Failed to index image", extra={"error": str(e)})
+    return location
+
+
+def fallback_models(model_alias, exc):
+    """Other configured models worth trying after `model_alias` failed with `exc`."""
+    if not MODEL_FALLBACK or classify(exc) not in RETRYABLE:
+        return []
+    return [alias for alias in registry.model_aliases() if alias != model_alias]
+
+
+def text_to_image_with_fallback(backend, model_label, model_alias, model_name, prompt, width, height, num_inference_steps, guidance_scale, seed):
+    """
+    Call the backend with retries; if the model stays unavailable, try the
+    other configured models.
+
+    Returns:
+        tuple: (image, alias of the model that produced it)
+    """
     try:
-        image.save(output_filename)
+        with metrics.stage("inference", model_label):
+            return resilience.call(model_name, backend.text_to_image, model_name, prompt, width, height, num_inference_steps, guidance_scale, seed), model_alias
     except Exception as e:
-        return None, f"ERROR: Failed to save image. Details: {e}"
+        for fallback_alias in fallback_models(model_alias, e):
+            fallback_name = registry.model_name(fallback_alias)
+            try:
+                with metrics.stage("inference", model_label):
+                    image = resilience.call(fallback_name, backend.text_to_image, fallback_name, prompt, width, height, num_inference_steps, guidance_scale, seed)
+            except Exception:
+                continue
+            logger.warning("Served by fallback model", extra={"model": model_alias, "fallback": fallback_alias, "error": str(e)})
+            return image, fallback_alias
+        raise
+
+
+def coalesce_key(prompt_alias, team_color, model_alias, custom_prompt, height, width, num_inference_steps, guidance_scale, seed, return_image):
+    # Requests that normalize to the same key produce the same image
+    return (prompt_alias, team_color.lower(), model_alias, (custom_prompt or "").strip(), int(height), int(width), int(num_inference_steps), float(guidance_scale), int(seed), return_image)
+
+
+def resolve_return_image(return_image):
+    """Whether a request gets the in-memory image back; None takes the configured default."""
+    if return_image is not None:
+        return return_image
+    # Pack ids can't be displayed, so with pack storage the UI always gets the image itself
+    return RETURN_IMAGES or STORAGE_BACKEND == "pack"
+
+
+def from_warm_pool(labels, prompt_alias, team_color, model_alias, custom_prompt, height, width, num_inference_steps, guidance_scale, seed, return_image):
+    """
+    Count the request's combination for the warmer and, for plain
+    random-seed requests, return a pre-generated (image, message) pair if one is ready.
+    """
+    if "other" in labels.values():
+        return None
+    warmer.record(prompt_alias, team_color, model_alias)
+    # Pooled images are made with the default parameters and returned in memory
+    if seed != -1 or not resolve_return_image(return_image) or (custom_prompt or "").strip() or (height, width, num_inference_steps, guidance_scale) != WARM_PARAMS:
+        return None
+    return warmer.take(prompt_alias, team_color, model_alias, registry.prompt_text(prompt_alias, team_color))
+
+
+def pregenerate(prompt_alias, team_color, model_alias):
+    """Generate a random-seed image with the default parameters for the warmer pool."""
+    prompt_text = registry.prompt_text(prompt_alias, team_color)
+    model_label = metric_labels(prompt_alias, team_color, model_alias)["model"]
+    result, message = _generate_image(model_label, prompt_alias, team_color, model_alias, "", *WARM_PARAMS, -1, True)
+    return prompt_text, result, f"{message} (pre-generated)"
+
+
+def generate_image(prompt_alias, team_color, model_alias, custom_prompt, height=360, width=640, num_inference_steps=20, guidance_scale=2.0, seed=-1, return_image=None, random_seed=None):
+    labels = metric_labels(prompt_alias, team_color, model_alias)
+    metrics.in_flight.inc()
+    with request_context() as request:
+        try:
+            pooled = from_warm_pool(labels, prompt_alias, team_color, model_alias, custom_prompt, height, width, num_inference_steps, guidance_scale, seed, return_image)
+            used_seed = seed
+            if pooled is not None:
+                result, message = pooled
+                used_seed = None
+            elif seed == -1:
+                # Drawn here so the request's log record carries the seed actually rendered
+                used_seed = draw_seed() if random_seed is None else random_seed
+                result, message = _generate_image(labels["model"], prompt_alias, team_color, model_alias, custom_prompt, height, width, num_inference_steps, guidance_scale, seed, return_image, used_seed)
+            else:
+                # Identical seeded requests arriving together share one generation
+                key = coalesce_key(prompt_alias, team_color, model_alias, custom_prompt, height, width, num_inference_steps, guidance_scale, seed, return_image)
+                result, message = single_flight.do(key, _generate_image, labels["model"], prompt_alias, team_color, model_alias, custom_prompt, height, width, num_inference_steps, guidance_scale, seed, return_image)
+        finally:
+            metrics.in_flight.dec()
+        record_outcome(labels, result, message, request.elapsed_ms(), prompt_alias, team_color, model_alias, custom_prompt, used_seed)
+    return result, message
+
+
+class GenerationError(Exception):
+    """A generation step failed; the message is returned to the user."""
+
+
+class Generation:
+    """
+    The steps of one generation shared by the sync path (`_generate_image`)
+    and the async one (src/img_gen_async.py).
+
+    The two paths only differ in how they do I/O: the cache lookup,
+    inference, upscaling and saving. Steps that fail raise GenerationError
+    with the message to show.
+    """
+
+    def __init__(self, model_label, prompt_alias, team_color, model_alias, custom_prompt, height, width, num_inference_steps, guidance_scale, seed, return_image=None, random_seed=None):
+        self.model_label = model_label
+        self.prompt_alias = prompt_alias
+        self.team_color = team_color
+        self.model_alias = model_alias
+        self.custom_prompt = custom_prompt
+        self.height = height
+        self.width = width
+        self.num_inference_steps = num_inference_steps
+        self.guidance_scale = guidance_scale
+        self.seed = seed
+        self.random_seed = random_seed
+        self.return_image = resolve_return_image(return_image)
+        self.prompt = None
+        self.model_name = None
+        self.key = None
+        self.native_width, self.native_height = width, height
+        self.started = None
+
+    def prepare(self):
+        """Resolve the prompt and model, and the cache key of a seeded request."""
+        # Find the selected prompt (already formatted for the team) and model
+        try:
+            with metrics.stage("prompt_lookup", self.model_label):
+                prompt = registry.prompt_text(self.prompt_alias, self.team_color)
+                self.model_name = registry.model_name(self.model_alias)
+        except KeyError:
+            raise GenerationError("ERROR: Invalid prompt or model selected.")
+        self.prompt = build_prompt(prompt, self.custom_prompt)
+
+        # Explicit seeds are deterministic, so repeats can be served from the result cache
+        if self.seed != -1:
+            self.key = cache_key(self.model_name, self.prompt, self.width, self.height, self.num_inference_steps, self.guidance_scale, self.seed, upscale=UPSCALE_FACTOR)
+
+    def start(self):
+        """Draw the seed of a random request and return the backend to render with."""
+        # Randomize the seed if needed
+        if self.seed == -1:
+            self.seed = draw_seed() if self.random_seed is None else self.random_seed
+
+        # Optionally render smaller and upscale locally (CTB_UPSCALE_FACTOR)
+        self.native_width, self.native_height = native_size(self.width, self.height)
+
+        # Select the configured backend (HF Inference API, local diffusers, Modal or fake)
+        try:
+            with metrics.stage("backend_setup", self.model_label):
+                backend = get_backend()
+        except Exception as e:
+            raise GenerationError(f"ERROR: Failed to initialize backend. Details: {e}")
+        self.started = time.perf_counter()
+        return backend
+
+    @property
+    def needs_upscale(self):
+        return (self.native_width, self.native_height) != (self.width, self.height)
+
+    def finish(self, used_alias):
+        """
+        Prepare saving the rendered image.
+
+        Returns:
+            tuple: (output filename, params, success message)
+        """
+        success_message = "Image generated successfully!"
+        if used_alias != self.model_alias:
+            # Another model's image must not be cached under the requested model's key
+            self.model_alias, self.key = used_alias, None
+            success_message = f"Image generated successfully! (fallback: {used_alias})"
+
+        # Save the image with a timestamped filename
+        output_filename = build_output_filename(self.model_alias, self.prompt_alias, self.team_color, self.seed)
+        params = build_params(self.prompt_alias, self.team_color, self.model_alias, self.custom_prompt, self.height, self.width, self.num_inference_steps, self.guidance_scale, self.seed)
+        params["latency_ms"] = round((time.perf_counter() - self.started) * 1000, 1)
+        return output_filename, params, success_message
+
+
+def _generate_image(model_label, prompt_alias, team_color, model_alias, custom_prompt, height, width, num_inference_steps, guidance_scale, seed, return_image, random_seed=None):
+    generation = Generation(model_label, prompt_alias, team_color, model_alias, custom_prompt, height, width, num_inference_steps, guidance_scale, seed, return_image, random_seed)
+    try:
+        generation.prepare()
+        if generation.key:
+            with metrics.stage("cache_lookup", model_label):
+                cached_path = result_cache.get(generation.key)
+            if cached_path:
+                return cached_path, "Image generated successfully! (cached)"
+
+        backend = generation.start()
+        # Generate the image, retrying transient upstream errors
+        try:
+            image, used_alias = text_to_image_with_fallback(backend, model_label, model_alias, generation.model_name, generation.prompt, generation.native_width, generation.native_height, num_inference_steps, guidance_scale, generation.seed)
+        except Exception as e:
+            raise GenerationError(f"ERROR: Failed to generate image. Details: {e}")
+
+        if generation.needs_upscale:
+            try:
+                with metrics.stage("upscale", model_label):
+                    image = upscale(image, (width, height))
+            except Exception as e:
+                raise GenerationError(f"ERROR: Failed to upscale image. Details: {e}")
+
+        output_filename, params, success_message = generation.finish(used_alias)
+
+        # Hand the in-memory image straight back and let the writer persist it
+        if generation.return_image and image_writer.submit(persist_image, image, output_filename, params, generation.key):
+            return image, success_message
+
+        try:
+            location = persist_image(image, output_filename, params, generation.key)
+        except Exception as e:
+            raise GenerationError(f"ERROR: Failed to save image. Details: {e}")
+    except GenerationError as e:
+        return None, str(e)
 
-    return output_filename, "Image generated successfully!"
\ No newline at end of file
+    return (image if generation.return_image else location), success_message
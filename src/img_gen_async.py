@@ -0,0 +1,290 @@
+# img_gen_async.py
+import asyncio
+import math
+import os
+from src import metrics
+from src.backends import get_backend
+from src.image_writer import image_writer
+from src.img_gen import build_prompt, coalesce_key, draw_seed, fallback_models, from_warm_pool, persist_image, metric_labels, record_outcome, Generation, GenerationError
+from src.logging_setup import get_logger, request_context
+from src.prompt_registry import registry
+from src.resilience import resilience
+from src.result_cache import result_cache
+from src.scheduler import scheduler, QueueFullError
+from src.single_flight import async_single_flight
+from src.token_pool import token_pool
+from src.upscale import upscale_async
+
+# Maximum number of concurrent upstream calls per model
+MAX_IN_FLIGHT_PER_MODEL = int(os.getenv("CTB_MAX_IN_FLIGHT_PER_MODEL", "64"))
+
+# Seconds between queue position/ETA updates while a request waits
+QUEUE_STATUS_INTERVAL = float(os.getenv("CTB_QUEUE_STATUS_INTERVAL", "1.0"))
+
+# Preview drafts: inference steps and fraction of the final width/height
+DRAFT_STEPS = int(os.getenv("CTB_DRAFT_STEPS", "4"))
+DRAFT_SCALE = float(os.getenv("CTB_DRAFT_SCALE", "0.5"))
+
+# In-flight limits are created lazily inside the running event loop
+_semaphores = {}
+
+logger = get_logger("img_gen_async")
+
+
+def _get_semaphore(model_name):
+    semaphore = _semaphores.get(model_name)
+    if semaphore is None:
+        semaphore = _semaphores[model_name] = asyncio.Semaphore(MAX_IN_FLIGHT_PER_MODEL)
+    return semaphore
+
+
+async def _text_to_image(backend, model_label, model_name, prompt, width, height, num_inference_steps, guidance_scale, seed):
+    # Wait for a free slot if the model is saturated; backoff sleeps happen inside the slot
+    async with _get_semaphore(model_name):
+        with metrics.stage("inference", model_label):
+            return await resilience.call_async(model_name, backend.text_to_image_async, model_name, prompt, width, height, num_inference_steps, guidance_scale, seed)
+
+
+async def text_to_image_with_fallback(backend, model_label, model_alias, model_name, prompt, width, height, num_inference_steps, guidance_scale, seed):
+    """Async counterpart of `src.img_gen.text_to_image_with_fallback`."""
+    try:
+        return await _text_to_image(backend, model_label, model_name, prompt, width, height, num_inference_steps, guidance_scale, seed), model_alias
+    except Exception as e:
+        for fallback_alias in fallback_models(model_alias, e):
+            fallback_name = registry.model_name(fallback_alias)
+            try:
+                image = await _text_to_image(backend, model_label, fallback_name, prompt, width, height, num_inference_steps, guidance_scale, seed)
+            except Exception:
+                continue
+            logger.warning("Served by fallback model", extra={"model": model_alias, "fallback": fallback_alias, "error": str(e)})
+            return image, fallback_alias
+        raise
+
+
+async def generate(prompt_alias, team_color, model_alias, custom_prompt, height=360, width=640, num_inference_steps=20, guidance_scale=2.0, seed=-1, random_seed=None):
+    try:
+        # Generate the image
+        image_path, message = await generate_image(prompt_alias, team_color, model_alias, custom_prompt, height, width, num_inference_steps, guidance_scale, seed, random_seed=random_seed)
+        return image_path, message
+    except Exception as e:
+        return None, f"An error occurred: {e}"
+
+
+def known_selection(prompt_alias, model_alias):
+    """Whether both aliases exist; checked before queueing, since scheduler queues and their gauges are keyed by model alias."""
+    return prompt_alias in registry.prompt_aliases() and model_alias in registry.model_aliases()
+
+
+async def generate_queued(prompt_alias, team_color, model_alias, custom_prompt, session_id=None, height=360, width=640, num_inference_steps=20, guidance_scale=2.0, seed=-1):
+    """
+    Run `generate` behind the shared scheduler.
+
+    Yields (image, status) pairs: queue position and ETA while waiting for a
+    slot, then the final result. Requests are rejected immediately when the
+    model's queue is full or the session is over its rate limit.
+    """
+    if not known_selection(prompt_alias, model_alias):
+        yield None, "ERROR: Invalid prompt or model selected."
+        return
+    wait = token_pool.admit_session(session_id)
+    if wait:
+        yield None, f"You're generating too fast, please wait ~{math.ceil(wait)}s."
+        return
+    try:
+        ticket = scheduler.enqueue(model_alias, session_id)
+    except QueueFullError:
+        yield None, "Server is busy: too many requests are waiting for this model. Please try again shortly."
+        return
+
+    try:
+        while not ticket.granted.is_set():
+            yield None, f"Queued: position {scheduler.position(ticket)}, estimated wait ~{scheduler.eta(ticket):.0f}s"
+            await ticket.wait(timeout=QUEUE_STATUS_INTERVAL)
+        yield None, "Generating image..."
+        result = await generate(prompt_alias, team_color, model_alias, custom_prompt, height, width, num_inference_steps, guidance_scale, seed)
+    finally:
+        # Also runs when the client disconnects while queued
+        scheduler.release(ticket)
+    yield result
+
+
+def _draft_size(value):
+    # Diffusion models want dimensions in multiples of 16
+    return max(64, int(value * DRAFT_SCALE) // 16 * 16)
+
+
+async def generate_draft(prompt_alias, team_color, model_alias, custom_prompt, height=360, width=640, guidance_scale=2.0, seed=0):
+    """
+    Render a quick low-resolution, low-step preview with the request's seed.
+
+    Drafts are neither retried, cached nor saved, and are skipped while the
+    model's circuit breaker is open.
+
+    Returns:
+        PIL.Image.Image or None: The draft, or None if it could not be made.
+    """
+    try:
+        prompt = build_prompt(registry.prompt_text(prompt_alias, team_color), custom_prompt)
+        model_name = registry.model_name(model_alias)
+    except KeyError:
+        return None
+    if resilience.breaker(model_name).is_open:
+        return None
+    model_label = metric_labels(prompt_alias, team_color, model_alias)["model"]
+    try:
+        backend = get_backend()
+        async with _get_semaphore(model_name):
+            with metrics.stage("draft", model_label):
+                return await backend.text_to_image_async(model_name, prompt, _draft_size(width), _draft_size(height), DRAFT_STEPS, guidance_scale, seed)
+    except Exception as e:
+        logger.info("Draft failed", extra={"model": model_alias, "error": str(e)})
+        return None
+
+
+async def _when_granted(ticket, fn, *args):
+    # Run fn once the scheduler grants the ticket, and always give the slot back
+    try:
+        await ticket.granted.wait()
+        return await fn(*args)
+    finally:
+        scheduler.release(ticket)
+
+
+async def generate_progressive(prompt_alias, team_color, model_alias, custom_prompt, session_id=None, height=360, width=640, num_inference_steps=20, guidance_scale=2.0, seed=-1):
+    """
+    Like `generate_queued`, but shows a draft while the full image renders.
+
+    The full render and a low-step, low-resolution draft with the same
+    seed are queued together: the full render in the model's normal lane,
+    the draft in the scheduler's "draft" lane. Yields (image, status)
+    pairs; the draft is shown as soon as it is ready and replaced by the
+    final result.
+    """
+    if not known_selection(prompt_alias, model_alias):
+        yield None, "ERROR: Invalid prompt or model selected."
+        return
+    wait = token_pool.admit_session(session_id)
+    if wait:
+        yield None, f"You're generating too fast, please wait ~{math.ceil(wait)}s."
+        return
+    try:
+        full_ticket = scheduler.enqueue(model_alias, session_id)
+    except QueueFullError:
+        yield None, "Server is busy: too many requests are waiting for this model. Please try again shortly."
+        return
+    try:
+        draft_ticket = scheduler.enqueue(model_alias, session_id, lane="draft")
+    except QueueFullError:
+        draft_ticket = None
+
+    # Both stages must use the same seed for the draft to resemble the result. A random
+    # request stays random (warm pool, no caching or coalescing); only its seed is drawn here
+    draft_seed = draw_seed() if seed == -1 else seed
+
+    full_task = asyncio.ensure_future(_when_granted(full_ticket, generate, prompt_alias, team_color, model_alias, custom_prompt, height, width, num_inference_steps, guidance_scale, seed, draft_seed))
+    draft_task = None
+    if draft_ticket is not None:
+        draft_task = asyncio.ensure_future(_when_granted(draft_ticket, generate_draft, prompt_alias, team_color, model_alias, custom_prompt, height, width, guidance_scale, draft_seed))
+
+    preview = None
+    try:
+        while not full_task.done():
+            if draft_task is not None and draft_task.done():
+                preview = draft_task.result()
+                draft_task = None
+            if not full_ticket.granted.is_set():
+                status = f"Queued: position {scheduler.position(full_ticket)}, estimated wait ~{scheduler.eta(full_ticket):.0f}s"
+            elif preview is not None:
+                status = "Preview ready, rendering full image..."
+            else:
+                status = "Generating image..."
+            yield preview, status
+            pending = {full_task} if draft_task is None else {full_task, draft_task}
+            await asyncio.wait(pending, timeout=QUEUE_STATUS_INTERVAL, return_when=asyncio.FIRST_COMPLETED)
+        result = full_task.result()
+    finally:
+        # Also runs when the client disconnects
+        for task in (full_task, draft_task):
+            if task is not None and not task.done():
+                task.cancel()
+        # A task cancelled before it started never reaches its own release
+        scheduler.release(full_ticket)
+        if draft_ticket is not None:
+            scheduler.release(draft_ticket)
+    yield result
+
+
+async def generate_image(prompt_alias, team_color, model_alias, custom_prompt, height=360, width=640, num_inference_steps=20, guidance_scale=2.0, seed=-1, return_image=None, random_seed=None):
+    """
+    Async counterpart of `src.img_gen.generate_image`.
+
+    The remote call runs on the event loop and disk I/O runs in worker
+    threads, so a single process can hold many generations in flight.
+    `random_seed` is the seed to render a random (seed=-1) request with
+    instead of drawing one, e.g. to match a preview draft.
+
+    Returns:
+        tuple: (PIL image or image path or None, status message)
+    """
+    labels = metric_labels(prompt_alias, team_color, model_alias)
+    metrics.in_flight.inc()
+    with request_context() as request:
+        try:
+            pooled = from_warm_pool(labels, prompt_alias, team_color, model_alias, custom_prompt, height, width, num_inference_steps, guidance_scale, seed, return_image)
+            used_seed = seed
+            if pooled is not None:
+                result, message = pooled
+                used_seed = None
+            elif seed == -1:
+                # Drawn here so the request's log record carries the seed actually rendered
+                used_seed = draw_seed() if random_seed is None else random_seed
+                result, message = await _generate_image(labels["model"], prompt_alias, team_color, model_alias, custom_prompt, height, width, num_inference_steps, guidance_scale, seed, return_image, used_seed)
+            else:
+                # Identical seeded requests arriving together share one generation
+                key = coalesce_key(prompt_alias, team_color, model_alias, custom_prompt, height, width, num_inference_steps, guidance_scale, seed, return_image)
+                result, message = await async_single_flight.do(key, _generate_image, labels["model"], prompt_alias, team_color, model_alias, custom_prompt, height, width, num_inference_steps, guidance_scale, seed, return_image)
+        finally:
+            metrics.in_flight.dec()
+        record_outcome(labels, result, message, request.elapsed_ms(), prompt_alias, team_color, model_alias, custom_prompt, used_seed)
+    return result, message
+
+
+async def _generate_image(model_label, prompt_alias, team_color, model_alias, custom_prompt, height, width, num_inference_steps, guidance_scale, seed, return_image, random_seed=None):
+    # Same steps as src.img_gen._generate_image; remote calls are awaited and disk I/O runs in threads
+    generation = Generation(model_label, prompt_alias, team_color, model_alias, custom_prompt, height, width, num_inference_steps, guidance_scale, seed, return_image, random_seed)
+    try:
+        generation.prepare()
+        if generation.key:
+            with metrics.stage("cache_lookup", model_label):
+                cached_path = await asyncio.to_thread(result_cache.get, generation.key)
+            if cached_path:
+                return cached_path, "Image generated successfully! (cached)"
+
+        backend = generation.start()
+        # Generate the image, retrying transient upstream errors
+        try:
+            image, used_alias = await text_to_image_with_fallback(backend, model_label, model_alias, generation.model_name, generation.prompt, generation.native_width, generation.native_height, num_inference_steps, guidance_scale, generation.seed)
+        except Exception as e:
+            raise GenerationError(f"ERROR: Failed to generate image. Details: {e}")
+
+        if generation.needs_upscale:
+            try:
+                with metrics.stage("upscale", model_label):
+                    image = await upscale_async(image, (width, height))
+            except Exception as e:
+                raise GenerationError(f"ERROR: Failed to upscale image. Details: {e}")
+
+        output_filename, params, success_message = generation.finish(used_alias)
+
+        # Hand the in-memory image straight back and let the writer persist it
+        if generation.return_image and image_writer.submit(persist_image, image, output_filename, params, generation.key):
+            return image, success_message
+
+        try:
+            location = await asyncio.to_thread(persist_image, image, output_filename, params, generation.key)
+        except Exception as e:
+            raise GenerationError(f"ERROR: Failed to save image. Details: {e}")
+    except GenerationError as e:
+        return None, str(e)
+
+    return (image if generation.return_image else location), success_message
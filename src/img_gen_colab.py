@@ -1,8 +1,10 @@
 # img_gen_logic_colab.py
-from huggingface_hub import InferenceClient
-from PIL import Image
 import random
 from datetime import datetime
+from src.backends import get_backend
+from src.logging_setup import get_logger
+
+logger = get_logger("img_gen_colab")
 
 def generate_image(prompt, team_color, model_name, height, width, num_inference_steps, guidance_scale, seed, custom_prompt, api_token, randomize_seed=True):
     """
@@ -32,17 +34,13 @@ def generate_image(prompt, team_color, model_name, height, width, num_inference_
     # elif team.lower() == "blue":
     #     winning_team_text = " The winning army is dressed in blue armor and banners."
 
-    # Print the original prompt and dynamic values for debugging
-    print("Original Prompt:")
-    print(prompt)
-    print(f"Enemy Color: {enemy_color}")
-    print(f"Team Color: {team_color.lower()}")
+    # Log the original prompt and dynamic values for debugging (CTB_DEBUG=1)
+    logger.debug("Original prompt", extra={"prompt": prompt, "team_color": team_color.lower(), "enemy_color": enemy_color})
 
     prompt = prompt.format(team_color=team_color.lower(), enemy_color=enemy_color)
 
-    # Print the formatted prompt for debugging
-    print("\nFormatted Prompt:")
-    print(prompt)
+    # Log the formatted prompt for debugging
+    logger.debug("Formatted prompt", extra={"prompt": prompt})
 
     # Append the custom prompt if provided
     if custom_prompt.strip():
@@ -53,22 +51,19 @@ def generate_image(prompt, team_color, model_name, height, width, num_inference_
         if randomize_seed:
             seed = random.randint(0, 1000000)
 
-        print(f"Using seed: {seed}")
-
         # Debug: Indicate that the image is being generated
-        print("Generating image... Please wait.")
-
-        # Initialize the InferenceClient with the selected model
-        client = InferenceClient(model_name, token=api_token)
+        logger.debug("Generating image", extra={"model": model_name, "seed": seed})
 
-        # Generate the image using the Inference API with parameters
-        image = client.text_to_image(
+        # Generate the image with the Inference API backend of the shared generation core
+        image = get_backend("hf").text_to_image(
+            model_name,
             prompt,
-            guidance_scale=guidance_scale,  # Guidance scale
-            num_inference_steps=num_inference_steps,  # Number of inference steps
-            width=width,  # Width
-            height=height,  # Height
-            seed=seed  # Random seed
+            width,  # Width
+            height,  # Height
+            num_inference_steps,  # Number of inference steps
+            guidance_scale,  # Guidance scale
+            seed,  # Random seed
+            token=api_token
         )
         return image
     except Exception as e:
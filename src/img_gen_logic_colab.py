@@ -1,8 +1,10 @@
 # img_gen_logic_colab.py
-from huggingface_hub import InferenceClient
-from PIL import Image
 import random
 from datetime import datetime
+from src.backends import get_backend
+from src.logging_setup import get_logger
+
+logger = get_logger("img_gen_logic_colab")
 
 def generate_image(prompt, team, model_name, height, width, num_inference_steps, guidance_scale, seed, custom_prompt, api_token, randomize_seed=True):
     """
@@ -47,22 +49,19 @@ def generate_image(prompt, team, model_name, height, width, num_inference_steps,
         if randomize_seed:
             seed = random.randint(0, 1000000)
 
-        print(f"Using seed: {seed}")
-
         # Debug: Indicate that the image is being generated
-        print("Generating image... Please wait.")
-
-        # Initialize the InferenceClient with the selected model
-        client = InferenceClient(model_name, token=api_token)
+        logger.debug("Generating image", extra={"model": model_name, "seed": seed})
 
-        # Generate the image using the Inference API with parameters
-        image = client.text_to_image(
+        # Generate the image with the Inference API backend of the shared generation core
+        image = get_backend("hf").text_to_image(
+            model_name,
             prompt,
-            guidance_scale=guidance_scale,  # Guidance scale
-            num_inference_steps=num_inference_steps,  # Number of inference steps
-            width=width,  # Width
-            height=height,  # Height
-            seed=seed  # Random seed
+            width,  # Width
+            height,  # Height
+            num_inference_steps,  # Number of inference steps
+            guidance_scale,  # Guidance scale
+            seed,  # Random seed
+            token=api_token
         )
         return image
     except Exception as e:
@@ -1,88 +1,121 @@
 #img_gen_modal.py
-import modal
-import sys
+import io
 import os
 import random
-from datetime import datetime
-import random
-import io
+import time
+import modal
+from src.logging_setup import configure_logging, get_logger
+
+# Volume populated by src/download_flux_modal.py
+MODEL_DIR = "/models"
+MODEL_SUBDIR = "FLUX.1-dev"
+volume = modal.Volume.from_name("flux-model-vol", create_if_missing=True)
 
+# Autoscaling: containers kept warm, upper bound, and idle time before scaling down (seconds)
+MIN_CONTAINERS = int(os.getenv("CTB_MODAL_MIN_CONTAINERS", "1"))
+MAX_CONTAINERS = int(os.getenv("CTB_MODAL_MAX_CONTAINERS", "4"))
+SCALEDOWN_WINDOW = int(os.getenv("CTB_MODAL_SCALEDOWN_WINDOW", "300"))
+GPU = os.getenv("CTB_MODAL_GPU", "A10G")
 
-@app.function(
+app = modal.App("ctb-image-worker")
+
+logger = get_logger("modal")
+
+image = modal.Image.debian_slim().pip_install(
+    "diffusers",
+    "transformers",
+    "torch",
+    "accelerate",
+    "sentencepiece",
+    "protobuf"
+).add_local_python_source("src")  # for src.logging_setup inside the container
+
+
+@app.cls(
     image=image,
-    #gpu="T4",
+    gpu=GPU,
+    volumes={MODEL_DIR: volume},
+    min_containers=MIN_CONTAINERS,
+    max_containers=MAX_CONTAINERS,
+    scaledown_window=SCALEDOWN_WINDOW,
     timeout=600
 )
-def generate_image(prompt_alias, team_color, model_alias, custom_prompt, height=360, width=640, 
-                  num_inference_steps=20, guidance_scale=2.0, seed=-1):
-    import torch
-    from diffusers import StableDiffusionPipeline
-    
-    # Find the selected prompt and model
-    try:
-        prompt = next(p for p in prompts if p["alias"] == prompt_alias)["text"]
-        model_name = next(m for m in models if m["alias"] == model_alias)["name"]
-    except StopIteration:
-        return None, "ERROR: Invalid prompt or model selected."
-
-    # Determine the enemy color
-    enemy_color = "blue" if team_color.lower() == "red" else "red"
-    
-    # Print the original prompt and dynamic values for debugging
-    print("Original Prompt:")
-    print(prompt)
-    print(f"Enemy Color: {enemy_color}")
-    print(f"Team Color: {team_color.lower()}")
-
-    # Format the prompt
-    prompt = prompt.format(team_color=team_color.lower(), enemy_color=enemy_color)
-    
-    # Print the formatted prompt for debugging
-    print("\nFormatted Prompt:")
-    print(prompt)
-
-    # Append custom prompt if provided
-    if custom_prompt and len(custom_prompt.strip()) > 0:
-        prompt += " " + custom_prompt.strip()
-
-    # Randomize seed if needed
-    if seed == -1:
-        seed = random.randint(0, 1000000)
-
-    # Initialize the pipeline
-    pipe = StableDiffusionPipeline.from_pretrained(
-        model_name,
-        torch_dtype=torch.float16,
-        use_safetensors=True,
-        variant="fp16"
-    )
-    pipe.to("cpu")
-
-    # Generate the image
-    try:
-        image = pipe(
+class FluxWorker:
+    """
+    Warm FLUX worker: the pipeline is loaded once per container from the
+    model volume, so each request only pays for inference.
+    """
+
+    @modal.enter()
+    def load_pipeline(self):
+        import torch
+        from diffusers import FluxPipeline
+
+        configure_logging()
+        start = time.perf_counter()
+        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.pipe = FluxPipeline.from_pretrained(
+            f"{MODEL_DIR}/{MODEL_SUBDIR}",
+            torch_dtype=torch.bfloat16 if self.device == "cuda" else torch.float32
+        )
+        self.pipe.to(self.device)
+        self.load_seconds = time.perf_counter() - start
+        self.requests_served = 0
+        logger.info("Pipeline loaded", extra={"device": self.device, "load_seconds": round(self.load_seconds, 1)})
+
+    @modal.method()
+    def generate(self, prompt, height=360, width=640, num_inference_steps=20, guidance_scale=2.0, seed=-1):
+        """
+        Generate one image with the already-loaded pipeline.
+
+        Returns:
+            dict: PNG bytes plus the seed used, this container's one-time
+            load time, the inference time of this call and whether this was
+            the container's first request.
+        """
+        import torch
+
+        # Randomize seed if needed
+        if seed == -1:
+            seed = random.randint(0, 1000000)
+
+        start = time.perf_counter()
+        image = self.pipe(
             prompt,
             guidance_scale=guidance_scale,
             num_inference_steps=num_inference_steps,
             width=width,
             height=height,
-            generator=torch.Generator("cuda").manual_seed(seed)
+            generator=torch.Generator(self.device).manual_seed(seed)
         ).images[0]
-        
+        inference_seconds = time.perf_counter() - start
+
         # Convert PIL image to bytes
         img_byte_arr = io.BytesIO()
-        image.save(img_byte_arr, format='PNG')
-        img_byte_arr = img_byte_arr.getvalue()
-    except Exception as e:
-        return None, f"ERROR: Failed to generate image. Details: {e}"
-
-    # Save the image with a timestamped filename
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_filename = f"{timestamp}_{model_alias.replace(' ', '_').lower()}_{prompt_alias.replace(' ', '_').lower()}_{team_color.lower()}.png"
-    try:
-        image.save(output_filename)
-    except Exception as e:     
-        return img_byte_arr, "Image generated successfully!"
-    except Exception as e:
-        return None, f"ERROR: Failed to generate image. Details: {e}"
-    return output_filename, "Image generated successfully!"
\ No newline at end of file
+        image.save(img_byte_arr, format="PNG")
+
+        self.requests_served += 1
+        cold_start = self.requests_served == 1
+        logger.info("Generated image", extra={"seed": seed, "inference_seconds": round(inference_seconds, 2), "cold_start": cold_start})
+        return {
+            "image": img_byte_arr.getvalue(),
+            "seed": seed,
+            "load_seconds": self.load_seconds,
+            "inference_seconds": inference_seconds,
+            "cold_start": cold_start,
+        }
+
+
+@app.local_entrypoint()
+def main(prompt_alias="Castle Siege", team_color="Red", custom_prompt="", seed=-1):
+    # Resolve the prompt locally, render remotely and save the result next to the caller
+    from src.img_gen import build_prompt, build_output_filename
+    from src.prompt_registry import registry
+
+    configure_logging()
+    prompt = build_prompt(registry.prompt_text(prompt_alias, team_color), custom_prompt)
+    result = FluxWorker().generate.remote(prompt, seed=seed)
+    output_filename = build_output_filename(MODEL_SUBDIR, prompt_alias, team_color, result["seed"])
+    with open(output_filename, "wb") as f:
+        f.write(result["image"])
+    logger.info("Saved image", extra={"output": output_filename, "load_seconds": round(result["load_seconds"], 1), "inference_seconds": round(result["inference_seconds"], 1), "cold_start": result["cold_start"]})
@@ -0,0 +1,190 @@
+# job_queue.py
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# SQLite database shared by the front end and the worker processes
+QUEUE_DB = os.getenv("CTB_QUEUE_DB", "jobs.sqlite3")
+# Seconds a claimed job stays leased without a heartbeat before another worker may take it over
+LEASE_SECONDS = float(os.getenv("CTB_JOB_LEASE_SECONDS", "60"))
+# Claims per job before it is failed instead of handed out again (e.g. a job that crashes its worker)
+MAX_ATTEMPTS = int(os.getenv("CTB_JOB_MAX_ATTEMPTS", "3"))
+
+# Job statuses
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED = {DONE, FAILED, CANCELLED}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    created REAL NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    worker TEXT,
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    message TEXT,
+    finished REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+"""
+
+
+class JobQueue:
+    """
+    Durable multi-process job queue on SQLite.
+
+    The front end submits jobs; worker processes claim them under a lease
+    they renew while working. A job whose worker dies is handed out again
+    once its lease expires (or at once, when the supervisor notices the
+    crash), so queued and running jobs survive a worker crash. Claims run
+    in `BEGIN IMMEDIATE` transactions, so a job is never given to two
+    workers. Each thread uses its own connection in WAL mode.
+
+    Args:
+        path (str): SQLite database file.
+        lease_seconds (float): Lease granted per claim or heartbeat.
+        max_attempts (int): Claims per job before it is failed.
+    """
+
+    def __init__(self, path=QUEUE_DB, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode; transactions are opened explicitly where needed
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            with self._init_lock:
+                if not self._initialized:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.executescript(_SCHEMA)
+                    self._initialized = True
+            conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def submit(self, params):
+        """
+        Queue a job.
+
+        Args:
+            params (dict): JSON-serializable job parameters.
+
+        Returns:
+            int: The job id.
+        """
+        cursor = self._connection().execute(
+            "INSERT INTO jobs (created, params, status) VALUES (?, ?, ?)", (time.time(), json.dumps(params), QUEUED)
+        )
+        return cursor.lastrowid
+
+    def claim(self, worker):
+        """
+        Lease the oldest available job to `worker`.
+
+        Jobs whose lease expired are available again; those already
+        claimed `max_attempts` times are failed instead.
+
+        Returns:
+            tuple: (job id, params dict), or None if there is nothing to do.
+        """
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "UPDATE jobs SET status = ?, message = ?, finished = ? WHERE status = ? AND lease_until < ? AND attempts >= ?",
+                (FAILED, "ERROR: The job failed repeatedly (worker crashed or timed out).", now, RUNNING, now, self.max_attempts)
+            )
+            row = conn.execute(
+                "SELECT id, params FROM jobs WHERE status = ? OR (status = ? AND lease_until < ?) ORDER BY id LIMIT 1",
+                (QUEUED, RUNNING, now)
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, worker = ?, lease_until = ?, attempts = attempts + 1 WHERE id = ?",
+                    (RUNNING, worker, now + self.lease_seconds, row["id"])
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return None if row is None else (row["id"], json.loads(row["params"]))
+
+    def renew(self, job_id, worker):
+        """Extend a job's lease; returns False if `worker` no longer holds it."""
+        cursor = self._connection().execute(
+            "UPDATE jobs SET lease_until = ? WHERE id = ? AND worker = ? AND status = ?",
+            (time.time() + self.lease_seconds, job_id, worker, RUNNING)
+        )
+        return cursor.rowcount == 1
+
+    def finish(self, job_id, worker, result, message, status=DONE):
+        """Record a job's result; ignored if `worker` lost the lease in the meantime."""
+        cursor = self._connection().execute(
+            "UPDATE jobs SET status = ?, result = ?, message = ?, finished = ?, lease_until = NULL WHERE id = ? AND worker = ? AND status = ?",
+            (status, result, message, time.time(), job_id, worker, RUNNING)
+        )
+        return cursor.rowcount == 1
+
+    def cancel(self, job_id):
+        """Drop a job nobody has started yet; returns False if it is already running or finished."""
+        cursor = self._connection().execute(
+            "UPDATE jobs SET status = ?, finished = ? WHERE id = ? AND status = ?", (CANCELLED, time.time(), job_id, QUEUED)
+        )
+        return cursor.rowcount == 1
+
+    def release_worker(self, worker):
+        """Make the running jobs of a worker known to be dead available again right away."""
+        cursor = self._connection().execute(
+            "UPDATE jobs SET lease_until = 0 WHERE worker = ? AND status = ?", (worker, RUNNING)
+        )
+        return cursor.rowcount
+
+    def get(self, job_id):
+        """
+        Return one job as a dict.
+
+        Raises:
+            KeyError: If there is no such job.
+        """
+        row = self._connection().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            raise KeyError(job_id)
+        return dict(row)
+
+    def position(self, job_id):
+        """1-based position of a queued job among the queued jobs."""
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = ? AND id <= ?", (QUEUED, job_id)
+        ).fetchone()[0]
+
+    def counts(self):
+        """Number of jobs per status."""
+        rows = self._connection().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def purge(self, older_than):
+        """Delete jobs that finished more than `older_than` seconds ago; returns how many."""
+        cursor = self._connection().execute(
+            "DELETE FROM jobs WHERE finished IS NOT NULL AND finished < ?", (time.time() - older_than,)
+        )
+        return cursor.rowcount
+
+
+# Shared queue used by the front end and src/workers.py
+job_queue = JobQueue()
@@ -0,0 +1,233 @@
+# job_runner.py
+"""
+Streaming, resumable runner for a JSONL file of generation requests.
+
+Each line is one request:
+    {"prompt_alias": "Castle Siege", "team": "Red", "model_alias": "FLUX.1-dev",
+     "custom_prompt": "at dawn", "seed": 7, "height": 360, "width": 640,
+     "num_inference_steps": 20, "guidance_scale": 2.0}
+Only prompt_alias, team and model_alias are required; optional fields
+that are missing or null take the defaults above. Lines that are not JSON
+objects, miss or have unknown values for the required fields, or have
+optional values of the wrong type, are journaled as "invalid" and skipped.
+
+Usage (from the repository root):
+    python -m src.job_runner requests.jsonl --workers 4
+    python -m src.job_runner requests.jsonl --workers 4 --journal overnight.journal.jsonl
+
+The input is read one line at a time and never held in memory. Every
+finished line is appended (and fsynced) to the journal together with the
+watermark: the byte offset before which every line is finished. After a
+crash or kill, re-running the same command seeks the input to the last
+watermark and skips the lines journaled after it, so each line runs
+exactly once to completion. Only lines that were in flight are run again.
+"""
+import argparse
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, ALL_COMPLETED, FIRST_COMPLETED
+from src.img_gen import generate_image
+from src.logging_setup import configure_logging
+from src.prompt_registry import registry, TEAMS
+
+REQUIRED_FIELDS = ("prompt_alias", "team", "model_alias")
+# Optional fields and their defaults (the UI's)
+DEFAULTS = {"custom_prompt": "", "seed": -1, "height": 360, "width": 640, "num_inference_steps": 20, "guidance_scale": 2.0}
+_TYPE_NAMES = {str: "a string", int: "an integer", float: "a number"}
+
+
+def parse_request(raw):
+    """
+    Turn one input line into a job dict.
+
+    Raises:
+        ValueError: If the line is not a valid generation request.
+    """
+    try:
+        request = json.loads(raw)
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        raise ValueError(f"not JSON: {e}")
+    if not isinstance(request, dict):
+        raise ValueError("not a JSON object")
+    missing = [name for name in REQUIRED_FIELDS if not request.get(name)]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+    if request["prompt_alias"] not in registry.prompt_aliases():
+        raise ValueError(f"unknown prompt alias '{request['prompt_alias']}'")
+    if request["team"] not in TEAMS:
+        raise ValueError(f"unknown team '{request['team']}'")
+    if request["model_alias"] not in registry.model_aliases():
+        raise ValueError(f"unknown model alias '{request['model_alias']}'")
+    job = {name: request[name] for name in REQUIRED_FIELDS}
+    for name, default in DEFAULTS.items():
+        value = request.get(name)
+        expected = (int, float) if isinstance(default, float) else type(default)
+        if value is None:
+            value = default
+        # No coercion: "None" would end up in the prompt and 2.7 steps would silently become 2
+        elif isinstance(value, bool) or not isinstance(value, expected):
+            raise ValueError(f"bad parameter: {name} must be {_TYPE_NAMES[type(default)]}, got {json.dumps(value)}")
+        job[name] = float(value) if isinstance(default, float) else value
+    return job
+
+
+def load_journal(journal_path):
+    """
+    Recover progress from a journal.
+
+    Returns:
+        tuple: (watermark offset, line number at the watermark, set of line
+        numbers finished beyond the watermark).
+    """
+    offset, line_no, finished = 0, 0, set()
+    if not os.path.exists(journal_path):
+        return offset, line_no, finished
+    with open(journal_path, encoding="utf-8") as f:
+        for entry in f:
+            try:
+                record = json.loads(entry)
+            except json.JSONDecodeError:
+                # A record cut short by a crash; its line simply runs again
+                continue
+            if record["watermark"][0] > offset:
+                offset, line_no = record["watermark"]
+                # Lines below the watermark are covered by it; keeps memory bounded by the concurrency
+                finished = {n for n in finished if n >= line_no}
+            if record["line"] >= line_no:
+                finished.add(record["line"])
+    return offset, line_no, finished
+
+
+def read_lines(path, offset, line_no):
+    """Lazily yield (line number, start offset, end offset, raw bytes) from `offset` on."""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        while True:
+            raw = f.readline()
+            if not raw:
+                return
+            yield line_no, offset, offset + len(raw), raw
+            offset += len(raw)
+            line_no += 1
+
+
+def run_job(line_no, job):
+    start = time.perf_counter()
+    try:
+        output, message = generate_image(job["prompt_alias"], job["team"], job["model_alias"], job["custom_prompt"], job["height"], job["width"], job["num_inference_steps"], job["guidance_scale"], job["seed"], return_image=False)
+    except Exception as e:
+        output, message = None, f"An error occurred: {e}"
+    return {"line": line_no, "status": "ok" if output else "error", "output": output, "message": message, "latency": round(time.perf_counter() - start, 3)}
+
+
+class Journal:
+    """
+    Append-only, fsynced record of finished lines with the input watermark.
+
+    Lines are registered in input order and may finish in any order; the
+    watermark only moves past a line once it and every line before it
+    are finished.
+    """
+
+    def __init__(self, path, offset, line_no):
+        torn = False
+        if os.path.exists(path) and os.path.getsize(path):
+            with open(path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                torn = f.read(1) != b"\n"
+        self._file = open(path, "a", encoding="utf-8")
+        # Terminate a record cut short by a crash, so the next one starts on its own line
+        if torn:
+            self._file.write("\n")
+        self._open = deque()
+        self._finished = set()
+        self.watermark = (offset, line_no)
+
+    def start(self, line_no, end):
+        self._open.append((line_no, end))
+
+    def finish(self, record):
+        self._finished.add(record["line"])
+        while self._open and self._open[0][0] in self._finished:
+            line_no, end = self._open.popleft()
+            self._finished.discard(line_no)
+            self.watermark = (end, line_no + 1)
+        record["watermark"] = list(self.watermark)
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+def run_requests(input_path, journal_path, workers=4):
+    """
+    Run every request in `input_path` not yet finished according to
+    `journal_path`, with at most `workers` generations in flight.
+
+    Returns:
+        dict: Counts of "ok", "error", "invalid" and "skipped" lines.
+    """
+    offset, line_no, finished = load_journal(journal_path)
+    if offset:
+        print(f"Resuming at line {line_no + 1} ({len(finished)} later lines already finished)")
+    counts = {"ok": 0, "error": 0, "invalid": 0, "skipped": 0}
+    journal = Journal(journal_path, offset, line_no)
+    pending = set()
+
+    def record_finished(record):
+        journal.finish(record)
+        counts[record["status"]] += 1
+        print(f"[{record['status']}] line {record['line'] + 1}: {record.get('output') or record['message']}")
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            def drain(return_when):
+                nonlocal pending
+                done, pending = wait(pending, return_when=return_when)
+                for future in done:
+                    record_finished(future.result())
+
+            for line_no, start, end, raw in read_lines(input_path, offset, line_no):
+                if line_no in finished:
+                    counts["skipped"] += 1
+                    continue
+                journal.start(line_no, end)
+                if not raw.strip():
+                    record_finished({"line": line_no, "status": "invalid", "message": "empty line"})
+                    continue
+                try:
+                    job = parse_request(raw)
+                except ValueError as e:
+                    record_finished({"line": line_no, "status": "invalid", "message": str(e)})
+                    continue
+                # Never read further ahead than the jobs in flight
+                if len(pending) >= workers:
+                    drain(FIRST_COMPLETED)
+                pending.add(executor.submit(run_job, line_no, job))
+            if pending:
+                drain(ALL_COMPLETED)
+    finally:
+        journal.close()
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the generation requests of a JSONL file, resuming after a crash.")
+    parser.add_argument("input", help="JSONL file with one generation request per line")
+    parser.add_argument("--journal", default=None, help="Journal to append to and resume from (default: INPUT.journal.jsonl)")
+    parser.add_argument("--workers", type=int, default=4, help="Maximum concurrent generations")
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    journal_path = args.journal or f"{args.input}.journal.jsonl"
+    counts = run_requests(args.input, journal_path, workers=args.workers)
+    print(f"Done: {counts['ok']} ok, {counts['error']} failed, {counts['invalid']} invalid, {counts['skipped']} skipped (already finished)")
+    return 0 if counts["error"] == 0 else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
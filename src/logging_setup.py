@@ -0,0 +1,152 @@
+# logging_setup.py
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import uuid
+
+# Verbose mode: DEBUG level, human-readable lines and every prompt logged
+DEBUG = os.getenv("CTB_DEBUG", "0") == "1"
+LOG_LEVEL = os.getenv("CTB_LOG_LEVEL", "DEBUG" if DEBUG else "INFO").upper()
+# "json" (one object per line) or "text"
+LOG_FORMAT = os.getenv("CTB_LOG_FORMAT", "text" if DEBUG else "json")
+# Fraction of request records that include verbose fields such as the prompt text
+PROMPT_SAMPLE_RATE = float(os.getenv("CTB_LOG_PROMPT_SAMPLE_RATE", "1" if DEBUG else "0.01"))
+# Records buffered for the log thread; beyond this they are dropped instead of blocking requests
+LOG_QUEUE_SIZE = int(os.getenv("CTB_LOG_QUEUE_SIZE", "10000"))
+
+# Id of the request being handled in the current thread/task
+request_id = contextvars.ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener = None
+_configure_lock = threading.Lock()
+
+
+def new_request_id():
+    return uuid.uuid4().hex[:12]
+
+
+def sample_verbose():
+    """Whether this request's record should carry verbose fields."""
+    return PROMPT_SAMPLE_RATE >= 1 or random.random() < PROMPT_SAMPLE_RATE
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, including the request id and any `extra` fields."""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        for name, value in vars(record).items():
+            if name not in _RECORD_ATTRS and name != "request_id":
+                entry[name] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _TextFormatter(logging.Formatter):
+    def format(self, record):
+        line = super().format(record)
+        fields = {name: value for name, value in vars(record).items() if name not in _RECORD_ATTRS and name != "request_id"}
+        if getattr(record, "request_id", None):
+            line = f"{line} [{record.request_id}]"
+        if fields:
+            line += " " + " ".join(f"{name}={value}" for name, value in fields.items())
+        return line
+
+
+class _RequestQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to the listener thread without blocking the caller.
+
+    The request id is captured here because context variables are not
+    visible from the listener thread. When the queue is full the record is
+    dropped and counted.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        record.request_id = request_id.get()
+        return super().prepare(record)
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure_logging(level=LOG_LEVEL, fmt=LOG_FORMAT, stream=None):
+    """
+    Route the "ctb" logger hierarchy through a queue to a background writer.
+
+    Called by the entry points (app.py, the CLIs, worker processes); until
+    then records only reach Python's last-resort stderr handler, so
+    importing a module has no logging side effects. Safe to call more than
+    once; only the first call installs handlers.
+    """
+    global _listener
+    with _configure_lock:
+        if _listener is not None:
+            return
+        handler = logging.StreamHandler(stream or sys.stderr)
+        if fmt == "json":
+            handler.setFormatter(JsonFormatter())
+        else:
+            handler.setFormatter(_TextFormatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+        logger = logging.getLogger("ctb")
+        logger.setLevel(level)
+        logger.addHandler(_RequestQueueHandler(log_queue))
+        logger.propagate = False
+
+
+def get_logger(name):
+    """Return the "ctb.<name>" logger."""
+    return logging.getLogger(f"ctb.{name}")
+
+
+class request_context:
+    """
+    Bind a request id for the enclosed block (reusing an outer one if set)
+    and measure its duration in milliseconds.
+    """
+
+    def __enter__(self):
+        self._token = None
+        if request_id.get() is None:
+            self._token = request_id.set(new_request_id())
+        self.start = time.perf_counter()
+        return self
+
+    def elapsed_ms(self):
+        return round((time.perf_counter() - self.start) * 1000, 1)
+
+    def __exit__(self, *exc):
+        if self._token is not None:
+            request_id.reset(self._token)
+        return False
@@ -0,0 +1,224 @@
+# pack_store.py
+import io
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+# Directory holding pack files and their index
+PACK_DIR = os.getenv("CTB_PACK_DIR", "packs")
+# Size at which the active pack file is closed and a new one started
+PACK_MAX_BYTES = int(os.getenv("CTB_PACK_MAX_BYTES", str(256 * 1024 * 1024)))
+# Retention limits applied whenever a pack is rotated (0 disables the limit)
+PACK_RETENTION_SECONDS = float(os.getenv("CTB_PACK_RETENTION_SECONDS", "0"))
+PACK_RETENTION_BYTES = int(os.getenv("CTB_PACK_RETENTION_BYTES", "0"))
+
+# Index record: image id, pack number, offset, length, creation time
+_INDEX_RECORD = struct.Struct(">16sIQId")
+# Pack record header: length of the JSON params that precede the image bytes
+_PACK_HEADER = struct.Struct(">I")
+
+
+class PackStore:
+    """
+    Append-only image storage in rotating pack files.
+
+    Every image is appended to the active pack as a small JSON params header
+    followed by the encoded bytes. A fixed-size index record (id, pack,
+    offset, length, created) is appended to `index.bin`. Ids begin with a
+    nanosecond timestamp and are issued in increasing order, so the index
+    stays sorted. Reads binary-search the memory-mapped index without
+    loading it. A single process should write to a store at a time.
+
+    Args:
+        directory (str): Store directory.
+        max_pack_bytes (int): Pack size that triggers rotation.
+        retention_seconds (float): Drop packs older than this (0 keeps everything).
+        retention_bytes (int): Drop the oldest packs above this total size (0 keeps everything).
+    """
+
+    def __init__(self, directory=PACK_DIR, max_pack_bytes=PACK_MAX_BYTES, retention_seconds=PACK_RETENTION_SECONDS, retention_bytes=PACK_RETENTION_BYTES):
+        self.directory = directory
+        self.max_pack_bytes = max_pack_bytes
+        self.retention_seconds = retention_seconds
+        self.retention_bytes = retention_bytes
+        self._lock = threading.RLock()
+        self._last_id = 0
+        self._map = None
+        self._mapped_size = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._index_path = os.path.join(directory, "index.bin")
+        self._index = open(self._index_path, "a+b")
+        # Drop a trailing partial record left by a crash mid-write
+        size = os.path.getsize(self._index_path)
+        if size % _INDEX_RECORD.size:
+            self._index.truncate(size - size % _INDEX_RECORD.size)
+        if len(self):
+            self._last_id = int.from_bytes(self._record(len(self) - 1)[0], "big")
+
+        packs = self._pack_numbers()
+        self._pack_no = packs[-1] if packs else 1
+        self._pack = open(self._pack_path(self._pack_no), "ab")
+
+    def put(self, data, params=None):
+        """
+        Append encoded image bytes with their generation params.
+
+        Returns:
+            str: The new image id (32 hex characters).
+        """
+        header = json.dumps(params or {}, sort_keys=True).encode("utf-8")
+        record = _PACK_HEADER.pack(len(header)) + header + data
+        with self._lock:
+            if self._pack.tell() and self._pack.tell() + len(record) > self.max_pack_bytes:
+                self._rotate()
+            image_id = self._next_id()
+            offset = self._pack.tell()
+            self._pack.write(record)
+            self._pack.flush()
+            self._index.write(_INDEX_RECORD.pack(image_id, self._pack_no, offset, len(record), time.time()))
+            self._index.flush()
+        return image_id.hex()
+
+    def put_image(self, image, params=None):
+        """Encode a PIL image as PNG and append it."""
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+        return self.put(buffer.getvalue(), params)
+
+    def get(self, image_id):
+        """
+        Read an image back.
+
+        Returns:
+            tuple: (params dict, encoded image bytes), or None if the id is
+            malformed, unknown or its pack was removed by retention.
+        """
+        try:
+            raw_id = bytes.fromhex(image_id)
+        except (TypeError, ValueError):
+            return None
+        with self._lock:
+            position = self._find(raw_id)
+            if position is None:
+                return None
+            _, pack_no, offset, length, _ = self._record(position)
+            self._pack.flush()
+            try:
+                with open(self._pack_path(pack_no), "rb") as f:
+                    f.seek(offset)
+                    record = f.read(length)
+            except FileNotFoundError:
+                return None
+        header_length = _PACK_HEADER.unpack_from(record)[0]
+        header_end = _PACK_HEADER.size + header_length
+        return json.loads(record[_PACK_HEADER.size:header_end]), record[header_end:]
+
+    def open_image(self, image_id):
+        """Return the stored image as a PIL image, or None if it cannot be read back."""
+        from PIL import Image
+        stored = self.get(image_id)
+        return None if stored is None else Image.open(io.BytesIO(stored[1]))
+
+    def ids(self, start=0, stop=None):
+        """Iterate image ids in insertion order."""
+        with self._lock:
+            stop = len(self) if stop is None else min(stop, len(self))
+            records = [self._record(i) for i in range(start, stop)]
+        for image_id, _, _, _, _ in records:
+            yield image_id.hex()
+
+    def __len__(self):
+        return os.path.getsize(self._index_path) // _INDEX_RECORD.size
+
+    def apply_retention(self):
+        """Delete whole packs that exceed the age/size limits and drop their index records."""
+        with self._lock:
+            packs = [p for p in self._pack_numbers() if p != self._pack_no]
+            sizes = {p: os.path.getsize(self._pack_path(p)) for p in packs}
+            total = sum(sizes.values()) + self._pack.tell()
+            now = time.time()
+            removed = []
+            for pack_no in packs:
+                too_old = self.retention_seconds and now - os.path.getmtime(self._pack_path(pack_no)) > self.retention_seconds
+                too_big = self.retention_bytes and total > self.retention_bytes
+                if not (too_old or too_big):
+                    break
+                os.remove(self._pack_path(pack_no))
+                total -= sizes[pack_no]
+                removed.append(pack_no)
+            if removed:
+                self._drop_index_records(max(removed))
+            return removed
+
+    def close(self):
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            self._pack.close()
+            self._index.close()
+
+    def _next_id(self):
+        # Strictly increasing 128-bit ids: nanosecond clock, bumped on collisions
+        self._last_id = max(self._last_id + 1, time.time_ns() << 64 | int.from_bytes(os.urandom(4), "big"))
+        return self._last_id.to_bytes(16, "big")
+
+    def _record(self, position):
+        self._ensure_mapped()
+        return _INDEX_RECORD.unpack_from(self._map, position * _INDEX_RECORD.size)
+
+    def _ensure_mapped(self):
+        size = os.path.getsize(self._index_path)
+        if self._map is not None and size == self._mapped_size:
+            return
+        if self._map is not None:
+            self._map.close()
+        self._map = mmap.mmap(self._index.fileno(), size, access=mmap.ACCESS_READ) if size else None
+        self._mapped_size = size
+
+    def _find(self, image_id):
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            current = self._record(middle)[0]
+            if current == image_id:
+                return middle
+            if current < image_id:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def _rotate(self):
+        self._pack.close()
+        self._pack_no += 1
+        self._pack = open(self._pack_path(self._pack_no), "ab")
+        if self.retention_seconds or self.retention_bytes:
+            self.apply_retention()
+
+    def _drop_index_records(self, last_removed_pack):
+        # Packs are removed oldest first, so their records form a prefix of the index
+        keep_from = 0
+        while keep_from < len(self) and self._record(keep_from)[1] <= last_removed_pack:
+            keep_from += 1
+        self._ensure_mapped()
+        remaining = self._map[keep_from * _INDEX_RECORD.size:] if self._map is not None else b""
+        tmp_path = self._index_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(remaining)
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._index.close()
+        os.replace(tmp_path, self._index_path)
+        self._index = open(self._index_path, "a+b")
+
+    def _pack_path(self, pack_no):
+        return os.path.join(self.directory, f"pack-{pack_no:06d}.dat")
+
+    def _pack_numbers(self):
+        return sorted(int(name[5:11]) for name in os.listdir(self.directory) if name.startswith("pack-") and name.endswith(".dat"))
@@ -0,0 +1,175 @@
+# phash.py
+"""
+Perceptual hashing and near-duplicate lookup for generated images.
+
+A 64-bit DCT hash is computed per image: grayscale, 32x32, 2-D DCT, then
+one bit per low-frequency coefficient above the median. Images that look
+alike have hashes a few bits apart, and a BK-tree finds every stored hash
+within a Hamming distance without comparing against all of them.
+
+Bulk deduplication of a directory of PNGs (from the repository root):
+    python -m src.phash path/to/images --distance 6
+    python -m src.phash path/to/images --distance 6 --delete
+"""
+import argparse
+import os
+import numpy as np
+
+# Hashes at most this many bits apart are considered near-duplicates
+DEDUPE_DISTANCE = int(os.getenv("CTB_DEDUPE_DISTANCE", "6"))
+
+HASH_SIZE = 8
+_SAMPLE_SIZE = HASH_SIZE * 4
+
+
+def _dct_matrix(n):
+    # Orthonormal DCT-II basis, so a 2-D DCT is two matrix products
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.sqrt(2.0 / n) * np.cos(np.pi * (2 * i + 1) * k / (2 * n))
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+
+_DCT = _dct_matrix(_SAMPLE_SIZE)
+_DCT_LOW = _DCT[:HASH_SIZE]
+
+
+def _pixels(image):
+    from PIL import Image
+
+    return np.asarray(image.convert("L").resize((_SAMPLE_SIZE, _SAMPLE_SIZE), Image.LANCZOS), dtype=np.float64)
+
+
+def phash_batch(images):
+    """
+    Perceptual hashes of several PIL images at once.
+
+    Returns:
+        list[int]: One 64-bit hash per image.
+    """
+    if not images:
+        return []
+    stack = np.stack([_pixels(image) for image in images])
+    # Only the low-frequency corner of each DCT is needed
+    low = np.einsum("ij,bjk,lk->bil", _DCT_LOW, stack, _DCT_LOW).reshape(len(images), -1)
+    bits = low > np.median(low, axis=1, keepdims=True)
+    packed = np.packbits(bits, axis=1)
+    return [int.from_bytes(row.tobytes(), "big") for row in packed]
+
+
+def phash(image):
+    """Perceptual hash of a PIL image as a 64-bit int."""
+    return phash_batch([image])[0]
+
+
+def hamming(a, b):
+    # bin().count rather than int.bit_count, which needs Python 3.10
+    return bin(a ^ b).count("1")
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over Hamming distance.
+
+    Each child edge is labelled with its distance to the parent, so a
+    search for hashes within `d` of a query only descends into edges in
+    [dist - d, dist + d] (triangle inequality).
+    """
+
+    def __init__(self):
+        self._root = None
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def add(self, value, item=None):
+        node = [value, item, {}]
+        self._size += 1
+        if self._root is None:
+            self._root = node
+            return
+        current = self._root
+        while True:
+            distance = hamming(value, current[0])
+            child = current[2].get(distance)
+            if child is None:
+                current[2][distance] = node
+                return
+            current = child
+
+    def search(self, value, max_distance):
+        """
+        Return [(distance, hash, item)] for every stored hash within `max_distance`, nearest first.
+        """
+        if self._root is None:
+            return []
+        matches = []
+        stack = [self._root]
+        while stack:
+            node_value, item, children = stack.pop()
+            distance = hamming(value, node_value)
+            if distance <= max_distance:
+                matches.append((distance, node_value, item))
+            for edge, child in children.items():
+                if distance - max_distance <= edge <= distance + max_distance:
+                    stack.append(child)
+        matches.sort(key=lambda match: match[0])
+        return matches
+
+    def nearest(self, value, max_distance):
+        """Return the closest (distance, hash, item) within `max_distance`, or None."""
+        matches = self.search(value, max_distance)
+        return matches[0] if matches else None
+
+
+def find_duplicates(paths, max_distance=DEDUPE_DISTANCE, batch_size=64):
+    """
+    Group a list of image files into near-duplicates, keeping the first occurrence.
+
+    Returns:
+        list[tuple]: (duplicate path, kept path, distance) for every duplicate.
+    """
+    from PIL import Image
+
+    tree = BKTree()
+    duplicates = []
+    for start in range(0, len(paths), batch_size):
+        chunk = paths[start:start + batch_size]
+        images = []
+        for path in chunk:
+            with Image.open(path) as image:
+                images.append(image.convert("RGB"))
+        for path, value in zip(chunk, phash_batch(images)):
+            match = tree.nearest(value, max_distance)
+            if match is None:
+                tree.add(value, path)
+            else:
+                duplicates.append((path, match[2], match[0]))
+    return duplicates
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find (and optionally delete) near-duplicate PNGs in a directory.")
+    parser.add_argument("directory")
+    parser.add_argument("--distance", type=int, default=DEDUPE_DISTANCE, help="Maximum Hamming distance between near-duplicates")
+    parser.add_argument("--delete", action="store_true", help="Delete duplicates instead of only listing them")
+    args = parser.parse_args(argv)
+
+    # Oldest first, so the earliest image of each group is the one kept
+    paths = sorted(
+        (os.path.join(root, name) for root, _, names in os.walk(args.directory) for name in names if name.lower().endswith(".png")),
+        key=os.path.getmtime
+    )
+    duplicates = find_duplicates(paths, args.distance)
+    for path, kept, distance in duplicates:
+        print(f"{path} ~ {kept} (distance {distance})")
+        if args.delete:
+            os.remove(path)
+    print(f"{len(duplicates)} near-duplicates among {len(paths)} images{' deleted' if args.delete else ''}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,179 @@
+# prompt_registry.py
+import os
+import runpy
+import string
+import threading
+import time
+from src.logging_setup import get_logger
+
+TEAMS = ["Red", "Blue"]
+
+# Placeholders a prompt template may use
+ALLOWED_PLACEHOLDERS = {"team_color", "enemy_color"}
+
+_CONFIG_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config")
+PROMPTS_FILE = os.getenv("CTB_PROMPTS_FILE", os.path.join(_CONFIG_DIR, "prompts.py"))
+MODELS_FILE = os.getenv("CTB_MODELS_FILE", os.path.join(_CONFIG_DIR, "models.py"))
+# Minimum number of seconds between two mtime checks of the config files
+RELOAD_CHECK_INTERVAL = float(os.getenv("CTB_RELOAD_CHECK_INTERVAL", "1.0"))
+
+logger = get_logger("prompt_registry")
+
+
+def format_prompt(template, team_color):
+    """Fill the team placeholders of a prompt template."""
+    team_color = team_color.lower()
+    enemy_color = "blue" if team_color == "red" else "red"
+    return template.format(team_color=team_color, enemy_color=enemy_color)
+
+
+def validate_prompts(prompts):
+    """
+    Check that every prompt has a unique alias and only known placeholders.
+
+    Raises:
+        ValueError: If a prompt is malformed.
+    """
+    seen = set()
+    for prompt in prompts:
+        alias = prompt.get("alias")
+        if not alias or "text" not in prompt:
+            raise ValueError(f"Prompt entry {prompt!r} needs both 'alias' and 'text'.")
+        if alias in seen:
+            raise ValueError(f"Duplicate prompt alias: {alias}")
+        seen.add(alias)
+        try:
+            fields = {name for _, name, _, _ in string.Formatter().parse(prompt["text"]) if name is not None}
+        except ValueError as e:
+            raise ValueError(f"Prompt '{alias}' has a malformed template: {e}")
+        unknown = fields - ALLOWED_PLACEHOLDERS
+        if unknown:
+            raise ValueError(f"Prompt '{alias}' uses unknown placeholders: {', '.join(sorted(unknown))}")
+
+
+class _Snapshot:
+    """
+    One loaded version of the prompts and models with its lookup indexes.
+
+    Never modified after it is built: a reload swaps in a new snapshot with
+    a single assignment, so a reader holding one sees a consistent version.
+    """
+
+    __slots__ = ("prompts", "models", "texts", "formatted", "model_names")
+
+    def __init__(self, prompts, models):
+        self.prompts = prompts
+        self.models = models
+        self.texts = {p["alias"]: p["text"] for p in prompts}
+        self.formatted = {
+            (alias, team.lower()): format_prompt(text, team)
+            for alias, text in self.texts.items()
+            for team in TEAMS
+        }
+        self.model_names = {m["alias"]: m["name"] for m in models}
+
+
+class PromptRegistry:
+    """
+    Alias-indexed prompts and models with every prompt x team text precomputed.
+
+    The prompt and model files are reloaded when their modification time
+    changes, so new prompts go live without restarting the server. A file
+    that fails validation is reported and the previous version stays active.
+
+    Args:
+        prompts_file (str): Python file defining a `prompts` list.
+        models_file (str): Python file defining a `models` list.
+        check_interval (float): Minimum seconds between mtime checks.
+    """
+
+    def __init__(self, prompts_file=PROMPTS_FILE, models_file=MODELS_FILE, check_interval=RELOAD_CHECK_INTERVAL):
+        self.prompts_file = prompts_file
+        self.models_file = models_file
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._mtimes = None
+        self._next_check = 0.0
+        self._snapshot = None
+        self.reload()
+
+    @property
+    def prompts(self):
+        self._maybe_reload()
+        return self._snapshot.prompts
+
+    @property
+    def models(self):
+        self._maybe_reload()
+        return self._snapshot.models
+
+    def prompt_aliases(self):
+        return [p["alias"] for p in self.prompts]
+
+    def model_aliases(self):
+        return [m["alias"] for m in self.models]
+
+    def prompt_text(self, prompt_alias, team_color):
+        """
+        Return the formatted prompt text for a prompt alias and team.
+
+        Raises:
+            KeyError: If the prompt alias is unknown.
+        """
+        self._maybe_reload()
+        snapshot = self._snapshot
+        text = snapshot.formatted.get((prompt_alias, team_color.lower()))
+        if text is None:
+            # Teams outside TEAMS are formatted on demand
+            text = format_prompt(snapshot.texts[prompt_alias], team_color)
+        return text
+
+    def model_name(self, model_alias):
+        """
+        Return the model repository name for a model alias.
+
+        Raises:
+            KeyError: If the model alias is unknown.
+        """
+        self._maybe_reload()
+        return self._snapshot.model_names[model_alias]
+
+    def reload(self):
+        """Load both files, validate them and swap in the new indexes."""
+        mtimes = self._current_mtimes()
+        prompts = runpy.run_path(self.prompts_file)["prompts"]
+        models = runpy.run_path(self.models_file)["models"]
+        validate_prompts(prompts)
+        snapshot = _Snapshot(prompts, models)
+        # Everything is built before this point, so a failed load leaves the old version intact
+        self._snapshot = snapshot
+        self._mtimes = mtimes
+
+    def _current_mtimes(self):
+        return (os.path.getmtime(self.prompts_file), os.path.getmtime(self.models_file))
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        with self._lock:
+            if now < self._next_check:
+                return
+            self._next_check = now + self.check_interval
+            try:
+                mtimes = self._current_mtimes()
+            except OSError as e:
+                logger.warning("Cannot stat prompts/models files", extra={"error": str(e)})
+                return
+            if mtimes == self._mtimes:
+                return
+            try:
+                self.reload()
+                logger.info("Reloaded prompts and models", extra={"prompts": len(self._snapshot.prompts), "models": len(self._snapshot.models)})
+            except Exception as e:
+                # Don't retry the same broken file until it changes again
+                self._mtimes = mtimes
+                logger.warning("Failed to reload prompts/models, keeping the previous version", extra={"error": str(e)})
+
+# Shared registry used by the generation code paths
+registry = PromptRegistry()
@@ -0,0 +1,272 @@
+# resilience.py
+import asyncio
+import email.utils
+import os
+import random
+import threading
+import time
+from src import metrics
+from src.logging_setup import get_logger
+
+# Attempts per upstream call, including the first one
+RETRY_ATTEMPTS = int(os.getenv("CTB_RETRY_ATTEMPTS", "3"))
+# Exponential backoff: base delay and cap (seconds); the actual delay is drawn uniformly below it
+RETRY_BASE_DELAY = float(os.getenv("CTB_RETRY_BASE_DELAY", "0.5"))
+RETRY_MAX_DELAY = float(os.getenv("CTB_RETRY_MAX_DELAY", "20"))
+# Total seconds a request may spend waiting between attempts
+RETRY_BUDGET = float(os.getenv("CTB_RETRY_BUDGET", "30"))
+# Consecutive upstream failures that open a model's circuit, and seconds before a probe is let through
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("CTB_BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("CTB_BREAKER_RESET_TIMEOUT", "30"))
+# Retry on another configured model when the requested one is unavailable
+MODEL_FALLBACK = os.getenv("CTB_MODEL_FALLBACK", "1") == "1"
+
+# Error classes
+RATE_LIMITED = "rate_limited"  # 429: retry after the advertised delay
+UNAVAILABLE = "unavailable"    # 5xx, model loading, connection errors and timeouts: retry with backoff
+CLIENT_ERROR = "client_error"  # other 4xx: the request itself is wrong, never retried
+UNKNOWN = "unknown"            # anything else (e.g. an undecodable image), never retried
+
+RETRYABLE = {RATE_LIMITED, UNAVAILABLE}
+
+logger = get_logger("resilience")
+
+retries_total = metrics.registry.register(metrics.Counter("ctb_upstream_retries_total", "Upstream calls retried, by error class.", ("model", "reason")))
+circuit_open = metrics.registry.register(metrics.Gauge("ctb_circuit_open", "1 while a model's circuit breaker is open.", ("model",)))
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling upstream while a model's circuit breaker is open."""
+
+
+class RateLimitExceeded(Exception):
+    """
+    A local rate limit (e.g. the token pool) has no budget left.
+
+    Retried like a 429 after `retry_after` seconds, but never counted
+    against the model's circuit breaker.
+    """
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _status_and_headers(exc):
+    # requests/huggingface_hub errors carry a response; aiohttp errors carry status/headers directly
+    response = getattr(exc, "response", None)
+    if response is not None and getattr(response, "status_code", None) is not None:
+        return response.status_code, response.headers or {}
+    status = getattr(exc, "status", None)
+    if isinstance(status, int):
+        return status, getattr(exc, "headers", None) or {}
+    return None, {}
+
+
+def classify(exc):
+    """Map an exception from a backend call to one of the error classes above."""
+    if isinstance(exc, CircuitOpenError):
+        return UNAVAILABLE
+    if isinstance(exc, RateLimitExceeded):
+        return RATE_LIMITED
+    status, _ = _status_and_headers(exc)
+    if status is not None:
+        if status == 429:
+            return RATE_LIMITED
+        if status >= 500 or status == 408:
+            return UNAVAILABLE
+        return CLIENT_ERROR
+    if isinstance(exc, (ConnectionError, TimeoutError, asyncio.TimeoutError)):
+        return UNAVAILABLE
+    # Transport errors of requests/aiohttp without importing either
+    names = {cls.__name__ for cls in type(exc).__mro__}
+    if names & {"ConnectionError", "Timeout", "ClientConnectionError", "ServerDisconnectedError", "ServerTimeoutError"}:
+        return UNAVAILABLE
+    return UNKNOWN
+
+
+def retry_after(exc):
+    """Seconds the upstream asked us to wait (Retry-After header or HF's estimated_time), or None."""
+    if isinstance(exc, RateLimitExceeded):
+        return exc.retry_after
+    _, headers = _status_and_headers(exc)
+    value = headers.get("Retry-After") if hasattr(headers, "get") else None
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            parsed = email.utils.parsedate_to_datetime(value)
+            if parsed is not None:
+                return max(0.0, parsed.timestamp() - time.time())
+    # 503 "model is loading" answers include an estimate in the JSON body
+    response = getattr(exc, "response", None)
+    try:
+        estimate = response.json().get("estimated_time")
+    except Exception:
+        return None
+    return float(estimate) if estimate else None
+
+
+class RetryPolicy:
+    """
+    Jittered exponential backoff with a per-request wait budget.
+
+    Args:
+        attempts (int): Maximum attempts, including the first.
+        base_delay (float): Backoff for the first retry (seconds).
+        max_delay (float): Cap on a single backoff (seconds).
+        budget (float): Total seconds that may be spent waiting.
+    """
+
+    def __init__(self, attempts=RETRY_ATTEMPTS, base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY, budget=RETRY_BUDGET):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+
+    def next_delay(self, attempt, exc, waited):
+        """
+        Return the seconds to wait before retry number `attempt` (1-based), or None to give up.
+        """
+        if attempt >= self.attempts or classify(exc) not in RETRYABLE:
+            return None
+        # Full jitter keeps many clients that failed together from retrying together
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        advertised = retry_after(exc)
+        if advertised is not None:
+            delay = max(delay, advertised)
+        if delay > self.max_delay or waited + delay > self.budget:
+            return None
+        return delay
+
+
+class CircuitBreaker:
+    """
+    Fast-fails calls to a model after repeated upstream failures.
+
+    After `failure_threshold` consecutive retryable failures the circuit
+    opens; once `reset_timeout` seconds have passed a single probe call is
+    let through, and its result closes or re-opens the circuit.
+    """
+
+    def __init__(self, name, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if not self._probing and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info("Circuit closed", extra={"model": self.name})
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+            circuit_open.set(0, model=self.name)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or (self._opened_at is None and self._failures >= self.failure_threshold):
+                self._opened_at = time.monotonic()
+                self._probing = False
+                circuit_open.set(1, model=self.name)
+                logger.warning("Circuit opened", extra={"model": self.name, "failures": self._failures})
+
+    def record_ignored(self):
+        """The call failed for a reason that says nothing about upstream health."""
+        with self._lock:
+            self._probing = False
+
+
+class Resilience:
+    """Retries plus one circuit breaker per model, shared by the sync and async generation paths."""
+
+    def __init__(self, policy=None):
+        self.policy = policy or RetryPolicy()
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, model_name):
+        with self._lock:
+            breaker = self._breakers.get(model_name)
+            if breaker is None:
+                breaker = self._breakers[model_name] = CircuitBreaker(model_name)
+            return breaker
+
+    def call(self, model_name, fn, *args, **kwargs):
+        """Run `fn(*args, **kwargs)` with retries, honoring the model's circuit breaker."""
+        breaker = self.breaker(model_name)
+        attempt, waited = 1, 0.0
+        while True:
+            if not breaker.allow():
+                raise CircuitOpenError(f"{model_name} is temporarily unavailable (circuit open).")
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                delay = self._failed(breaker, model_name, attempt, e, waited)
+                time.sleep(delay)
+                attempt, waited = attempt + 1, waited + delay
+                continue
+            except BaseException:
+                # Cancelled or interrupted: a probe must not keep the circuit open for good
+                breaker.record_ignored()
+                raise
+            breaker.record_success()
+            return result
+
+    async def call_async(self, model_name, fn, *args, **kwargs):
+        """Async counterpart of `call` for coroutine functions."""
+        breaker = self.breaker(model_name)
+        attempt, waited = 1, 0.0
+        while True:
+            if not breaker.allow():
+                raise CircuitOpenError(f"{model_name} is temporarily unavailable (circuit open).")
+            try:
+                result = await fn(*args, **kwargs)
+            except Exception as e:
+                delay = self._failed(breaker, model_name, attempt, e, waited)
+                await asyncio.sleep(delay)
+                attempt, waited = attempt + 1, waited + delay
+                continue
+            except BaseException:
+                # Cancelled or interrupted: a probe must not keep the circuit open for good
+                breaker.record_ignored()
+                raise
+            breaker.record_success()
+            return result
+
+    def _failed(self, breaker, model_name, attempt, exc, waited):
+        # Record the failure and return the backoff, or re-raise when giving up
+        kind = classify(exc)
+        # Throttling is about the token or this process, not the model's health; it never opens the circuit
+        if kind in RETRYABLE and kind != RATE_LIMITED:
+            breaker.record_failure()
+        else:
+            breaker.record_ignored()
+        delay = self.policy.next_delay(attempt, exc, waited)
+        if delay is None or breaker.is_open:
+            raise exc
+        retries_total.inc(model=model_name, reason=kind)
+        logger.info("Retrying upstream call", extra={"model": model_name, "reason": kind, "attempt": attempt, "delay": round(delay, 2)})
+        return delay
+
+
+# Shared by the generation code paths
+resilience = Resilience()
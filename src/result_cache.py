@@ -0,0 +1,154 @@
+# result_cache.py
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+# Directory that holds cached PNGs (shared by every process on the machine)
+CACHE_DIR = os.getenv("CTB_CACHE_DIR", ".ctb_cache")
+# Upper bound on the total size of cached images, in bytes
+CACHE_MAX_BYTES = int(os.getenv("CTB_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+
+def cache_key(model_name, prompt, width, height, num_inference_steps, guidance_scale, seed, upscale=1):
+    """
+    Build a content address for a deterministic generation.
+
+    `upscale` is the local upscaling factor (src/upscale.py); images
+    rendered natively and upscaled ones get different keys.
+
+    Returns:
+        str: SHA-256 hex digest of the normalized generation parameters.
+    """
+    params = {
+        "model": model_name,
+        "prompt": prompt,
+        "width": int(width),
+        "height": int(height),
+        "steps": int(num_inference_steps),
+        "guidance": float(guidance_scale),
+        "seed": int(seed),
+    }
+    # Only added when set, so keys of natively rendered images stay unchanged
+    if upscale != 1:
+        params["upscale"] = float(upscale)
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    Content-addressed on-disk cache of generated PNGs with LRU eviction.
+
+    The files on disk are the source of truth, so several processes can share
+    one cache directory. Recency is tracked with the file modification time,
+    which is refreshed on every hit.
+
+    Args:
+        directory (str): Cache directory.
+        max_bytes (int): Total size above which the least recently used entries are evicted.
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._size = None
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.png")
+
+    def get(self, key):
+        """Return the cached file path for `key`, or None on a miss."""
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return path
+
+    def put_file(self, key, src_path):
+        """Copy an already-encoded PNG into the cache and return its cached path."""
+        def write(f):
+            with open(src_path, "rb") as src:
+                shutil.copyfileobj(src, f)
+        return self._store(key, write)
+
+    def put_bytes(self, key, data):
+        """Store encoded PNG bytes in the cache and return the cached path."""
+        return self._store(key, lambda f: f.write(data))
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "bytes": self._size,
+            }
+
+    def _store(self, key, write):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file and rename so readers never see partial PNGs
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            # An entry rewritten under the same key replaces the old file's bytes rather than adding to them
+            try:
+                replaced = os.path.getsize(path)
+            except OSError:
+                replaced = 0
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._scan())
+            else:
+                self._size += os.path.getsize(path) - replaced
+            if self._size > self.max_bytes:
+                self._evict()
+        return path
+
+    def _scan(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".png"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                yield st.st_mtime, st.st_size, path
+
+    def _evict(self):
+        # Rescan so entries written by other processes are accounted for
+        entries = sorted(self._scan())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+        self._size = total
+
+
+# Shared cache used by the generation code path
+result_cache = ResultCache()
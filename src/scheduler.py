@@ -0,0 +1,188 @@
+# scheduler.py
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from src import metrics
+
+# Maximum number of generations running at once for a single model
+MODEL_CONCURRENCY = int(os.getenv("CTB_MODEL_CONCURRENCY", "8"))
+# Maximum number of requests waiting for a single model before new ones are rejected
+MAX_QUEUE_DEPTH = int(os.getenv("CTB_MAX_QUEUE_DEPTH", "100"))
+# Assumed duration of one generation (seconds) until real timings are observed
+INITIAL_SERVICE_TIME = float(os.getenv("CTB_INITIAL_SERVICE_TIME", "20"))
+# Concurrent preview drafts per model; drafts have their own lane so they never take full-render slots
+DRAFT_CONCURRENCY = int(os.getenv("CTB_DRAFT_CONCURRENCY", "2"))
+
+
+class QueueFullError(Exception):
+    """Raised when a model's wait queue is already at `max_queue_depth`."""
+
+
+class Ticket:
+    """A request's place in a model queue; granted once a slot is free."""
+
+    def __init__(self, model, session):
+        self.model = model
+        self.session = session
+        self.granted = asyncio.Event()
+        self.started_at = None
+        self.released = False
+
+    async def wait(self, timeout=None):
+        """Wait until the ticket is granted; return False if `timeout` expires first."""
+        try:
+            await asyncio.wait_for(self.granted.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+
+class _ModelQueue:
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+        self.waiting = 0
+        self.sessions = {}  # session -> deque of waiting tickets
+        self.rotation = deque()  # sessions with waiters, in round-robin order
+        self.service_time = INITIAL_SERVICE_TIME
+
+
+class RequestScheduler:
+    """
+    Admission control in front of the generation core.
+
+    Each model runs at most `concurrency` generations at once. Waiting
+    requests are served round-robin across user sessions, so one user
+    clicking repeatedly cannot starve everyone else. When a model already
+    has `max_queue_depth` waiters, new requests fail fast with QueueFullError.
+    Requests in a named lane (e.g. preview drafts) queue separately with
+    their own concurrency, so the lanes cannot starve each other.
+    Must be used from a single event loop.
+
+    Args:
+        concurrency (int): Concurrent generations per model.
+        max_queue_depth (int): Waiting requests allowed per model.
+        lane_concurrency (dict): Concurrency per model for each named lane.
+    """
+
+    def __init__(self, concurrency=MODEL_CONCURRENCY, max_queue_depth=MAX_QUEUE_DEPTH, lane_concurrency=None):
+        self.concurrency = concurrency
+        self.max_queue_depth = max_queue_depth
+        self.lane_concurrency = {"draft": DRAFT_CONCURRENCY} if lane_concurrency is None else lane_concurrency
+        self._queues = {}
+
+    def _queue(self, model, lane=None):
+        queue = self._queues.get(model)
+        if queue is None:
+            queue = self._queues[model] = _ModelQueue(self.lane_concurrency.get(lane, self.concurrency))
+        return queue
+
+    def enqueue(self, model, session, lane=None):
+        """
+        Register a request and return its Ticket, granted immediately if a slot is free.
+
+        Raises:
+            QueueFullError: If the model's queue is full.
+        """
+        # Lanes are separate queues keyed "<model>/<lane>"
+        if lane is not None:
+            model = f"{model}/{lane}"
+        queue = self._queue(model, lane)
+        ticket = Ticket(model, session)
+        if queue.active < queue.limit and queue.waiting == 0:
+            self._grant(queue, ticket)
+            self._publish(model, queue)
+            return ticket
+        if queue.waiting >= self.max_queue_depth:
+            raise QueueFullError(f"Too many requests are waiting for {model}.")
+
+        waiters = queue.sessions.get(session)
+        if waiters is None:
+            waiters = queue.sessions[session] = deque()
+            queue.rotation.append(session)
+        waiters.append(ticket)
+        queue.waiting += 1
+        self._publish(model, queue)
+        return ticket
+
+    def release(self, ticket):
+        """Give back a ticket's slot (or leave the queue if it was never granted)."""
+        if ticket.released:
+            return
+        ticket.released = True
+        queue = self._queue(ticket.model)
+        if not ticket.granted.is_set():
+            self._remove_waiter(queue, ticket)
+            self._publish(ticket.model, queue)
+            return
+
+        queue.active -= 1
+        # Exponentially weighted moving average of observed generation time
+        elapsed = time.monotonic() - ticket.started_at
+        queue.service_time = 0.8 * queue.service_time + 0.2 * elapsed
+        self._dispatch(queue)
+        self._publish(ticket.model, queue)
+
+    def position(self, ticket):
+        """Return the ticket's 1-based position in its model queue (0 once granted or released)."""
+        if ticket.granted.is_set() or ticket.released:
+            return 0
+        queue = self._queue(ticket.model)
+        waiters = queue.sessions[ticket.session]
+        index = waiters.index(ticket)
+        # Replay the round-robin order: every session contributes one ticket per round
+        rotation = list(queue.rotation)
+        mine = rotation.index(ticket.session)
+        ahead = 0
+        for i, session in enumerate(rotation):
+            # Sessions served before ours also get a turn in our ticket's round
+            ahead += min(len(queue.sessions[session]), index + 1 if i < mine else index)
+        return ahead + 1
+
+    def eta(self, ticket):
+        """Estimated seconds until the ticket is granted."""
+        position = self.position(ticket)
+        if position == 0:
+            return 0.0
+        queue = self._queue(ticket.model)
+        return math.ceil(position / queue.limit) * queue.service_time
+
+    def stats(self):
+        return {model: {"active": q.active, "waiting": q.waiting, "service_time": q.service_time} for model, q in self._queues.items()}
+
+    def _publish(self, model, queue):
+        metrics.queue_waiting.set(queue.waiting, model=model)
+        metrics.queue_active.set(queue.active, model=model)
+
+    def _grant(self, queue, ticket):
+        queue.active += 1
+        ticket.started_at = time.monotonic()
+        ticket.granted.set()
+
+    def _remove_waiter(self, queue, ticket):
+        waiters = queue.sessions.get(ticket.session)
+        if waiters is None or ticket not in waiters:
+            return
+        waiters.remove(ticket)
+        queue.waiting -= 1
+        if not waiters:
+            del queue.sessions[ticket.session]
+            queue.rotation.remove(ticket.session)
+
+    def _dispatch(self, queue):
+        while queue.active < queue.limit and queue.rotation:
+            session = queue.rotation.popleft()
+            waiters = queue.sessions[session]
+            ticket = waiters.popleft()
+            queue.waiting -= 1
+            if waiters:
+                queue.rotation.append(session)
+            else:
+                del queue.sessions[session]
+            self._grant(queue, ticket)
+
+
+# Shared scheduler for the Gradio handlers
+scheduler = RequestScheduler()
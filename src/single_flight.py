@@ -0,0 +1,84 @@
+# single_flight.py
+import asyncio
+import threading
+from src import metrics
+
+coalesced_total = metrics.registry.register(metrics.Counter("ctb_coalesced_requests_total", "Requests that shared another request's in-flight generation."))
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time across threads.
+
+    Callers arriving while a call with the same key is running wait for it
+    and receive its result (or its exception) instead of starting another.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            coalesced_total.inc()
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+class AsyncSingleFlight:
+    """
+    Event-loop counterpart of SingleFlight for coroutine functions.
+
+    The shared call runs as its own task, so a caller that is cancelled
+    (e.g. a client that disconnects) doesn't cancel it for the others.
+    Must be used from a single event loop.
+    """
+
+    def __init__(self):
+        self._tasks = {}
+
+    async def do(self, key, fn, *args, **kwargs):
+        task = self._tasks.get(key)
+        if task is None:
+            task = self._tasks[key] = asyncio.ensure_future(fn(*args, **kwargs))
+            task.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            coalesced_total.inc()
+        return await asyncio.shield(task)
+
+    def _finished(self, key, task):
+        self._tasks.pop(key, None)
+        # Mark the exception as retrieved in case every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
+
+
+# Shared by the generation code paths
+single_flight = SingleFlight()
+async_single_flight = AsyncSingleFlight()
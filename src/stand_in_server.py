@@ -0,0 +1,225 @@
+# stand_in_server.py
+"""
+Local stand-in for the Hugging Face text-to-image Inference API.
+
+It accepts the same request as `InferenceClient.text_to_image`: a POST of
+{"inputs": prompt, "parameters": {...}} to /models/<repo>. It answers
+with a PNG derived from (model, prompt, seed), so identical requests
+return identical images. Latency, 503 "model loading" responses and
+429 rate limits can be injected to reproduce upstream behaviour offline.
+
+Usage (from the repository root):
+    python -m src.stand_in_server --port 8008 --latency lognormal:2.0,0.4 --loading-rate 0.02 --rate-limit 5
+    CTB_INFERENCE_URL=http://127.0.0.1:8008 python app.py
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import struct
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def parse_latency(spec):
+    """
+    Build a latency sampler from a spec string.
+
+    Supported: "fixed:S", "uniform:LOW,HIGH", "lognormal:MEDIAN,SIGMA", "exp:MEAN" (seconds).
+    """
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",")] if args else []
+    if kind == "fixed":
+        return lambda rng: values[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "lognormal":
+        return lambda rng: values[0] * math.exp(rng.gauss(0.0, values[1]))
+    if kind == "exp":
+        return lambda rng: rng.expovariate(1.0 / values[0])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+def gradient_row(model, prompt, seed, width):
+    """
+    One RGB scanline of the placeholder image for (model, prompt, seed):
+    a horizontal gradient between two colors taken from a digest. Shared
+    with the fake backend (src/backends.py), so both draw the same image.
+    """
+    digest = hashlib.sha256(f"{model}|{prompt}|{seed}".encode("utf-8")).digest()
+    start, end = digest[:3], digest[3:6]
+    return bytes(
+        start[c] + (end[c] - start[c]) * x // max(width - 1, 1)
+        for x in range(width)
+        for c in range(3)
+    )
+
+
+def render_png(model, prompt, seed, width, height):
+    """Encode the placeholder image as a PNG without any imaging library."""
+    # Each scanline starts with filter type 0
+    raw = (b"\x00" + gradient_row(model, prompt, seed, width)) * height
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw, 1)) + chunk(b"IEND", b"")
+
+
+class _TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self):
+        """Return 0 if a request may proceed, else the seconds until one may."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class StandInConfig:
+    """
+    Behaviour of the stand-in server.
+
+    Args:
+        latency (str): Latency distribution spec (see parse_latency).
+        loading_rate (float): Probability of answering 503 "model is currently loading".
+        error_rate (float): Probability of injecting a random 429 rate-limit error.
+        rate_limit (float): Requests per second allowed per token (0 disables limiting).
+        burst (int): Token bucket size for `rate_limit`.
+        seed (int): Seed for the fault/latency random generator.
+    """
+
+    def __init__(self, latency="fixed:0", loading_rate=0.0, error_rate=0.0, rate_limit=0.0, burst=1, seed=None):
+        self.sample_latency = parse_latency(latency)
+        self.loading_rate = loading_rate
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.burst = burst
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.buckets = {}
+        self.counts = {"ok": 0, "loading": 0, "rate_limited": 0, "bad_request": 0}
+
+    def count(self, outcome):
+        with self.lock:
+            self.counts[outcome] += 1
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "CtBStandIn/1.0"
+
+    def do_GET(self):
+        config = self.server.config
+        with config.lock:
+            body = json.dumps({"status": "ok", "counts": config.counts}).encode("utf-8")
+        self._reply(200, body, "application/json")
+
+    def do_POST(self):
+        config = self.server.config
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            prompt = payload["inputs"]
+            parameters = payload.get("parameters") or {}
+        except (ValueError, KeyError) as e:
+            config.count("bad_request")
+            return self._error(400, f"Invalid request: {e}")
+
+        model = self.path.split("/models/", 1)[-1].strip("/") or "unknown"
+        with config.lock:
+            latency = config.sample_latency(config.rng)
+            loading = config.rng.random() < config.loading_rate
+            injected_429 = config.rng.random() < config.error_rate
+            retry_after = 0.0
+            if config.rate_limit:
+                token = self.headers.get("Authorization", "anonymous")
+                bucket = config.buckets.setdefault(token, _TokenBucket(config.rate_limit, config.burst))
+                retry_after = bucket.take()
+
+        if retry_after or injected_429:
+            config.count("rate_limited")
+            return self._error(429, "Rate limit reached. Please retry later.", {"Retry-After": str(max(1, math.ceil(retry_after)))})
+        if loading:
+            config.count("loading")
+            return self._error(503, f"Model {model} is currently loading", extra_body={"estimated_time": round(latency * 10, 1)})
+
+        time.sleep(max(latency, 0.0))
+        width = int(parameters.get("width") or 512)
+        height = int(parameters.get("height") or 512)
+        seed = parameters.get("seed")
+        config.count("ok")
+        self._reply(200, render_png(model, prompt, seed, width, height), "image/png")
+
+    def _error(self, status, message, headers=None, extra_body=None):
+        body = dict(extra_body or {}, error=message)
+        self._reply(status, json.dumps(body).encode("utf-8"), "application/json", headers)
+
+    def _reply(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Keep load tests quiet; outcomes are available from GET /
+        pass
+
+
+def _make_server(host, port, config):
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.config = config
+    return server
+
+
+def start_server(host="127.0.0.1", port=0, config=None):
+    """
+    Start the stand-in server on a background thread.
+
+    Returns:
+        tuple: (server, base URL). Call `server.shutdown()` to stop it.
+    """
+    server = _make_server(host, port, config or StandInConfig())
+    threading.Thread(target=server.serve_forever, name="stand-in-server", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a local stand-in for the HF text-to-image API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8008)
+    parser.add_argument("--latency", default="fixed:0", help="fixed:S | uniform:LOW,HIGH | lognormal:MEDIAN,SIGMA | exp:MEAN")
+    parser.add_argument("--loading-rate", type=float, default=0.0, help="Probability of a 503 'model loading' response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability of a random 429 response")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Requests per second per token (0 = unlimited)")
+    parser.add_argument("--burst", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    config = StandInConfig(args.latency, args.loading_rate, args.error_rate, args.rate_limit, args.burst, args.seed)
+    server = _make_server(args.host, args.port, config)
+    print(f"Stand-in inference server listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
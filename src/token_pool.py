@@ -0,0 +1,170 @@
+# token_pool.py
+import os
+import threading
+import time
+from config.config import api_tokens
+from src import metrics
+from src.logging_setup import get_logger
+from src.resilience import RateLimitExceeded
+
+# Sustained requests per second allowed per token, and how many may be sent in a burst (rate 0: unlimited)
+TOKEN_RATE = float(os.getenv("CTB_TOKEN_RATE", "0"))
+TOKEN_BURST = float(os.getenv("CTB_TOKEN_BURST", "5"))
+# Generations per second allowed per user session, and the session burst (rate 0: unlimited)
+SESSION_RATE = float(os.getenv("CTB_SESSION_RATE", "0"))
+SESSION_BURST = float(os.getenv("CTB_SESSION_BURST", "3"))
+# Seconds a token is left out of rotation after a 429 without a Retry-After
+SIDELINE_SECONDS = float(os.getenv("CTB_TOKEN_SIDELINE_SECONDS", "60"))
+# Idle sessions kept in memory before the full (unused) buckets are dropped
+MAX_SESSIONS = int(os.getenv("CTB_MAX_TRACKED_SESSIONS", "10000"))
+
+logger = get_logger("token_pool")
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, holding at most `burst`."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return self.tokens
+
+    def take(self, now):
+        """Take one token; return 0 on success, else the seconds until one is available."""
+        if self.refill(now) >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate else float("inf")
+
+
+class _Credential:
+    def __init__(self, index, token, rate, burst):
+        self.index = index
+        self.token = token
+        self.bucket = TokenBucket(rate, burst)
+        self.sidelined_until = 0.0
+        self.rate_limited = 0
+        self.requests = 0
+
+
+class TokenPool:
+    """
+    Spreads upstream calls over several Hugging Face tokens.
+
+    Each token has its own token bucket; a call goes to the token with the
+    most budget left (or, with `rate` 0, the least used token). When several
+    tokens are configured, a token that gets a 429 is sidelined for the
+    advertised Retry-After (or `sideline_seconds`); a single token leaves
+    429s to the retry policy. Sessions have their own buckets so one user
+    cannot use up the whole pool. With no tokens configured the pool holds a
+    single anonymous entry (token None).
+
+    Args:
+        tokens (list): Hugging Face tokens.
+        rate (float): Requests per second per token (0: unlimited).
+        burst (float): Bucket size per token.
+        session_rate (float): Generations per second per session (0: unlimited).
+        session_burst (float): Bucket size per session.
+        sideline_seconds (float): Default time out after a 429.
+    """
+
+    def __init__(self, tokens=None, rate=TOKEN_RATE, burst=TOKEN_BURST, session_rate=SESSION_RATE, session_burst=SESSION_BURST, sideline_seconds=SIDELINE_SECONDS):
+        tokens = list(api_tokens if tokens is None else tokens) or [None]
+        self._credentials = [_Credential(i, token, rate, burst) for i, token in enumerate(tokens)]
+        self._by_token = {c.token: c for c in self._credentials}
+        self.rate = rate
+        self.session_rate = session_rate
+        self.session_burst = session_burst
+        self.sideline_seconds = sideline_seconds
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._credentials)
+
+    def acquire(self):
+        """
+        Take one request's budget from the token with the most budget left.
+
+        Raises:
+            RateLimitExceeded: If every token is sidelined or out of budget.
+        """
+        now = time.monotonic()
+        with self._lock:
+            usable = [c for c in self._credentials if c.sidelined_until <= now]
+            if usable and not self.rate:
+                best = min(usable, key=lambda c: c.requests)
+                best.requests += 1
+                return best.token
+            if usable:
+                best = max(usable, key=lambda c: c.bucket.refill(now))
+                wait = best.bucket.take(now)
+                if wait == 0:
+                    best.requests += 1
+                    return best.token
+            else:
+                wait = min(c.sidelined_until for c in self._credentials) - now
+        raise RateLimitExceeded("All Hugging Face tokens are rate limited.", retry_after=wait)
+
+    def sideline(self, token, retry_after=None):
+        """Take a token that got a 429 out of rotation."""
+        credential = self._by_token.get(token)
+        if credential is None or len(self._credentials) == 1:
+            return
+        seconds = retry_after if retry_after else self.sideline_seconds
+        with self._lock:
+            credential.sidelined_until = max(credential.sidelined_until, time.monotonic() + seconds)
+            credential.rate_limited += 1
+        logger.warning("Token sidelined after 429", extra={"token_index": credential.index, "seconds": round(seconds, 1)})
+
+    def admit_session(self, session):
+        """
+        Charge one generation to a user session.
+
+        Returns:
+            float: 0 if admitted, else the seconds until the session may generate again.
+        """
+        if session is None or not self.session_rate:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._sessions.get(session)
+            if bucket is None:
+                if len(self._sessions) >= MAX_SESSIONS:
+                    self._prune_sessions(now)
+                bucket = self._sessions[session] = TokenBucket(self.session_rate, self.session_burst)
+            return bucket.take(now)
+
+    def _prune_sessions(self, now):
+        # A full bucket carries no state worth keeping
+        for session, bucket in list(self._sessions.items()):
+            if bucket.refill(now) >= bucket.burst:
+                del self._sessions[session]
+
+    def collect_metrics(self):
+        # Tokens are identified by their position in HF_TOKENS, never by value
+        now = time.monotonic()
+        lines = [
+            "# HELP ctb_token_budget Requests a token may send right now.",
+            "# TYPE ctb_token_budget gauge",
+        ]
+        with self._lock:
+            for c in self._credentials:
+                budget = f"{c.bucket.refill(now):.2f}" if self.rate else "+Inf"
+                lines.append(f'ctb_token_budget{{token="{c.index}"}} {budget}')
+            lines += ["# HELP ctb_token_sidelined 1 while a token is out of rotation after a 429.", "# TYPE ctb_token_sidelined gauge"]
+            lines += [f'ctb_token_sidelined{{token="{c.index}"}} {int(c.sidelined_until > now)}' for c in self._credentials]
+            lines += ["# HELP ctb_token_rate_limited_total 429 responses per token.", "# TYPE ctb_token_rate_limited_total counter"]
+            lines += [f'ctb_token_rate_limited_total{{token="{c.index}"}} {c.rate_limited}' for c in self._credentials]
+        return lines
+
+
+# Shared pool used by the HF Inference API backend
+token_pool = TokenPool()
+metrics.registry.register_collector(token_pool.collect_metrics)
@@ -0,0 +1,74 @@
+# upscale.py
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# Render at 1/UPSCALE_FACTOR of the requested size and upscale locally (1 = disabled)
+UPSCALE_FACTOR = float(os.getenv("CTB_UPSCALE_FACTOR", "1"))
+# Unsharp mask strength applied after resizing, in percent (0 = no sharpening)
+UPSCALE_SHARPEN = int(os.getenv("CTB_UPSCALE_SHARPEN", "80"))
+# Worker processes for resizing; they keep the CPU work off the serving process' GIL
+UPSCALE_WORKERS = int(os.getenv("CTB_UPSCALE_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def native_size(width, height, factor=None):
+    """
+    Size to request from the backend for a `width` x `height` result.
+
+    Returns:
+        tuple: (width, height), rounded to multiples of 16 and at least 64.
+    """
+    factor = UPSCALE_FACTOR if factor is None else factor
+    if factor <= 1:
+        return width, height
+    return max(64, int(width / factor) // 16 * 16), max(64, int(height / factor) // 16 * 16)
+
+
+def _resize(mode, size, data, target, sharpen):
+    # Runs in a worker process; raw pixels cross the process boundary to avoid PNG encoding
+    from PIL import Image, ImageFilter
+
+    image = Image.frombytes(mode, size, data).resize(target, Image.LANCZOS)
+    if sharpen:
+        image = image.filter(ImageFilter.UnsharpMask(radius=2, percent=sharpen, threshold=2))
+    return image.tobytes()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Spawned, not forked: forking a process that runs threads (logging, writer, metrics, event loop) can deadlock
+            _executor = ProcessPoolExecutor(max_workers=UPSCALE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+
+def _submit(image, target, sharpen):
+    if image.mode not in ("RGB", "RGBA", "L"):
+        image = image.convert("RGB")
+    return image, _get_executor().submit(_resize, image.mode, image.size, image.tobytes(), tuple(target), sharpen)
+
+
+def upscale(image, target, sharpen=UPSCALE_SHARPEN):
+    """
+    Resize a PIL image to `target` (width, height) with Lanczos resampling
+    and an unsharp mask, in the worker process pool.
+    """
+    from PIL import Image
+
+    image, future = _submit(image, target, sharpen)
+    return Image.frombytes(image.mode, tuple(target), future.result())
+
+
+async def upscale_async(image, target, sharpen=UPSCALE_SHARPEN):
+    """Async counterpart of `upscale`; the event loop stays free while a worker resizes."""
+    from PIL import Image
+
+    image, future = _submit(image, target, sharpen)
+    data = await asyncio.wrap_future(future)
+    return Image.frombytes(image.mode, tuple(target), data)
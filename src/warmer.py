@@ -0,0 +1,154 @@
+# warmer.py
+import os
+import threading
+import time
+from collections import deque
+from src import metrics
+from src.logging_setup import get_logger
+
+# Run the background warmer in the app process (spends upstream capacity on speculative images)
+WARMER_ENABLED = os.getenv("CTB_WARMER", "0") == "1"
+# Ready images kept per (prompt, team, model) combination
+WARM_POOL_SIZE = int(os.getenv("CTB_WARM_POOL_SIZE", "3"))
+# Number of most popular combinations that get a pool
+WARM_TOP_N = int(os.getenv("CTB_WARM_TOP_N", "6"))
+# Seconds between warmer iterations; each iteration generates at most one image
+WARM_INTERVAL = float(os.getenv("CTB_WARM_INTERVAL", "2"))
+# The warmer only generates while fewer user requests than this are in flight
+WARM_IDLE_THRESHOLD = int(os.getenv("CTB_WARM_IDLE_THRESHOLD", "1"))
+# Half-life of popularity counts (seconds), so the pool follows current traffic
+POPULARITY_HALF_LIFE = float(os.getenv("CTB_POPULARITY_HALF_LIFE", "1800"))
+# Pre-generated images older than this are discarded instead of served (seconds)
+WARM_MAX_AGE = float(os.getenv("CTB_WARM_MAX_AGE", "3600"))
+
+logger = get_logger("warmer")
+
+pool_served_total = metrics.registry.register(metrics.Counter("ctb_warm_pool_served_total", "Random-seed requests served from the pre-generated pool.", ("model",)))
+pool_generated_total = metrics.registry.register(metrics.Counter("ctb_warm_pool_generated_total", "Images pre-generated by the warmer.", ("model",)))
+
+
+class Warmer:
+    """
+    Keeps small pools of ready images for the most requested combinations.
+
+    Requests are counted per (prompt alias, team, model) with exponential
+    decay. A background thread tops up the pools of the `top_n` hottest
+    combinations, one image per iteration and only while the process is
+    idle. Random-seed requests for a warm combination take an image from
+    its pool instead of waiting for a generation.
+
+    Args:
+        pool_size (int): Images kept per combination.
+        top_n (int): Combinations that get a pool.
+        interval (float): Seconds between iterations of the warmer thread.
+        idle_threshold (int): In-flight requests below which the warmer may generate.
+        half_life (float): Popularity half-life in seconds.
+        max_age (float): Seconds after which a pooled image is discarded.
+    """
+
+    def __init__(self, pool_size=WARM_POOL_SIZE, top_n=WARM_TOP_N, interval=WARM_INTERVAL, idle_threshold=WARM_IDLE_THRESHOLD,
+                 half_life=POPULARITY_HALF_LIFE, max_age=WARM_MAX_AGE):
+        self.pool_size = pool_size
+        self.top_n = top_n
+        self.interval = interval
+        self.idle_threshold = idle_threshold
+        self.half_life = half_life
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._popularity = {}
+        self._decayed_at = time.monotonic()
+        self._pools = {}  # combo -> deque of (created, prompt text, result, message)
+        self._thread = None
+        self._stop = threading.Event()
+        self._generate = None
+
+    def record(self, prompt_alias, team_color, model_alias):
+        """Count one request for a combination."""
+        combo = (prompt_alias, team_color.lower(), model_alias)
+        with self._lock:
+            self._popularity[combo] = self._popularity.get(combo, 0.0) + 1.0
+
+    def take(self, prompt_alias, team_color, model_alias, prompt_text):
+        """
+        Pop a ready (result, message) pair for the combination, or None.
+
+        `prompt_text` is the current prompt of the combination; images made
+        from an older version of the prompt are dropped.
+        """
+        combo = (prompt_alias, team_color.lower(), model_alias)
+        now = time.monotonic()
+        with self._lock:
+            pool = self._pools.get(combo)
+            while pool:
+                created, text, result, message = pool.popleft()
+                if text == prompt_text and now - created <= self.max_age:
+                    pool_served_total.inc(model=model_alias)
+                    return result, message
+        return None
+
+    def start(self, generate):
+        """
+        Start the warmer thread.
+
+        Args:
+            generate (callable): generate(prompt_alias, team_color, model_alias) ->
+                (prompt text, result, message) for a new random-seed image; result is None on failure.
+        """
+        if self._thread is not None:
+            return
+        self._generate = generate
+        self._thread = threading.Thread(target=self._run, name="warmer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def hottest(self):
+        """The `top_n` combinations by decayed popularity, hottest first."""
+        with self._lock:
+            self._decay()
+            ranked = sorted(self._popularity.items(), key=lambda item: item[1], reverse=True)
+        return [combo for combo, _ in ranked[:self.top_n]]
+
+    def _decay(self):
+        now = time.monotonic()
+        factor = 0.5 ** ((now - self._decayed_at) / self.half_life)
+        self._decayed_at = now
+        for combo in list(self._popularity):
+            self._popularity[combo] *= factor
+            # Forget combinations nobody asks for anymore
+            if self._popularity[combo] < 0.01:
+                del self._popularity[combo]
+
+    def _next_combo(self):
+        # The hottest combination whose pool is not full yet
+        for combo in self.hottest():
+            with self._lock:
+                if len(self._pools.get(combo, ())) < self.pool_size:
+                    return combo
+        return None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            if metrics.in_flight.value() >= self.idle_threshold:
+                continue
+            combo = self._next_combo()
+            if combo is None:
+                continue
+            prompt_alias, team_color, model_alias = combo
+            try:
+                prompt_text, result, message = self._generate(prompt_alias, team_color.capitalize(), model_alias)
+            except Exception as e:
+                logger.warning("Pre-generation failed", extra={"combo": combo, "error": str(e)})
+                continue
+            if result is None:
+                logger.info("Pre-generation failed", extra={"combo": combo, "error": message})
+                continue
+            with self._lock:
+                pool = self._pools.setdefault(combo, deque(maxlen=self.pool_size))
+                pool.append((time.monotonic(), prompt_text, result, message))
+            pool_generated_total.inc(model=model_alias)
+
+
+# Shared warmer; started by app.py when CTB_WARMER=1
+warmer = Warmer()
@@ -0,0 +1,318 @@
+# workers.py
+"""
+Multi-process serving: the Gradio front end queues generations in a shared
+SQLite job queue (src/job_queue.py) and N worker processes run them.
+
+Started by app.py when CTB_WORKERS is set (e.g. CTB_WORKERS=4). A worker
+can also be run by hand from the repository root:
+    python -m src.workers --index 0
+
+Workers share the on-disk result cache and gallery index. Each one writes
+its own pack store directory, because a pack store has a single writer.
+A crashed worker is restarted, and the jobs it was running are handed to
+the other workers.
+"""
+import argparse
+import asyncio
+import atexit
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from src import metrics
+from src.img_gen import generate_image, get_pack_store
+from src.img_gen_async import known_selection, QUEUE_STATUS_INTERVAL
+from src.job_queue import job_queue, CANCELLED, DONE, FAILED, FINISHED, QUEUED, RUNNING
+from src.logging_setup import configure_logging, get_logger
+from src.pack_store import PACK_DIR
+from src.scheduler import scheduler, QueueFullError
+from src.token_pool import token_pool, TOKEN_RATE, TOKEN_BURST
+
+# Worker processes started by app.py (0 generates in the front end process)
+WORKERS = int(os.getenv("CTB_WORKERS", "0"))
+# Jobs each worker process runs at once
+WORKER_THREADS = int(os.getenv("CTB_WORKER_THREADS", "4"))
+# Seconds between queue polls of idle workers and waiting requests
+POLL_INTERVAL = float(os.getenv("CTB_WORKER_POLL_INTERVAL", "0.25"))
+# Queued jobs above which new requests are rejected
+MAX_QUEUED_JOBS = int(os.getenv("CTB_MAX_QUEUED_JOBS", "500"))
+# Where workers put images the front end cannot read from their storage (pack ids), and how long finished jobs are kept
+RESULTS_DIR = os.getenv("CTB_RESULTS_DIR", ".ctb_results")
+RESULT_RETENTION = float(os.getenv("CTB_RESULT_RETENTION_SECONDS", "3600"))
+# Seconds before a worker that crashed is started again
+RESTART_DELAY = float(os.getenv("CTB_WORKER_RESTART_DELAY", "1"))
+
+logger = get_logger("workers")
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _collect_metrics():
+    counts = job_queue.counts()
+    lines = ["# HELP ctb_jobs Jobs in the worker queue, by status.", "# TYPE ctb_jobs gauge"]
+    lines += [f'ctb_jobs{{status="{status}"}} {counts.get(status, 0)}' for status in (QUEUED, RUNNING, DONE, FAILED, CANCELLED)]
+    return lines
+
+
+def spool(data):
+    """Write PNG bytes under RESULTS_DIR for the front end and return the path."""
+    name = uuid.uuid4().hex
+    path = os.path.join(RESULTS_DIR, name[:2], f"{name}.png")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return path
+
+
+def run_job(params):
+    """
+    Generate one queued image.
+
+    Returns:
+        tuple: (file path or None, status message).
+    """
+    result, message = generate_image(
+        params["prompt_alias"], params["team"], params["model_alias"], params["custom_prompt"],
+        params["height"], params["width"], params["num_inference_steps"], params["guidance_scale"], params["seed"],
+        return_image=False
+    )
+    if result and not os.path.isfile(result):
+        # Pack ids only resolve in the process that owns the pack directory
+        stored = get_pack_store().get(result)
+        if stored is None:
+            return None, "ERROR: Failed to read back the generated image."
+        result = spool(stored[1])
+    return result, message
+
+
+class Worker:
+    """
+    Claims jobs from the shared queue and runs them on `threads` threads.
+
+    Leases of running jobs are renewed from the main thread. The worker
+    stops when its parent process (the supervisor) goes away.
+    """
+
+    def __init__(self, name, threads=WORKER_THREADS, parent=None):
+        self.name = name
+        self.threads = threads
+        self.parent = parent
+        self._active = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def run(self):
+        for i in range(self.threads):
+            threading.Thread(target=self._loop, name=f"{self.name}-{i}", daemon=True).start()
+        logger.info("Worker started", extra={"worker": self.name, "threads": self.threads})
+        while not self._stop.wait(job_queue.lease_seconds / 3):
+            if self.parent is not None and os.getppid() != self.parent:
+                logger.warning("Supervisor gone, stopping worker", extra={"worker": self.name})
+                self._stop.set()
+                break
+            with self._lock:
+                active = list(self._active)
+            for job_id in active:
+                job_queue.renew(job_id, self.name)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                claimed = job_queue.claim(self.name)
+            except Exception as e:
+                logger.warning("Failed to claim a job", extra={"worker": self.name, "error": str(e)})
+                claimed = None
+            if claimed is None:
+                self._stop.wait(POLL_INTERVAL)
+                continue
+            job_id, params = claimed
+            with self._lock:
+                self._active.add(job_id)
+            try:
+                try:
+                    result, message = run_job(params)
+                except Exception as e:
+                    result, message = None, f"An error occurred: {e}"
+                job_queue.finish(job_id, self.name, result, message, DONE if result else FAILED)
+            except Exception as e:
+                # The job stays leased and is handed out again once the lease expires
+                logger.warning("Failed to record a job result", extra={"worker": self.name, "job": job_id, "error": str(e)})
+            finally:
+                with self._lock:
+                    self._active.discard(job_id)
+
+
+class Supervisor:
+    """
+    Starts `count` worker processes and restarts any that exit.
+
+    When a worker dies its running jobs are released at once instead of
+    waiting for their leases to expire. The per-token rate limits of the
+    token pool are divided among the workers, since each process keeps
+    its own buckets. Old finished jobs and spooled results are purged.
+    """
+
+    def __init__(self, count=WORKERS):
+        self.count = count
+        self._processes = {}
+        self._stop = threading.Event()
+
+    def start(self):
+        for index in range(self.count):
+            self._spawn(index)
+        atexit.register(self.stop)
+        threading.Thread(target=self._monitor, name="worker-supervisor", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+        for process in self._processes.values():
+            process.terminate()
+        for process in self._processes.values():
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    def _spawn(self, index):
+        env = dict(
+            os.environ,
+            PYTHONPATH=os.pathsep.join(filter(None, [_ROOT, os.environ.get("PYTHONPATH")])),
+            CTB_PACK_DIR=os.path.join(PACK_DIR, f"worker-{index}"),
+        )
+        if TOKEN_RATE:
+            env.update(CTB_TOKEN_RATE=str(TOKEN_RATE / self.count), CTB_TOKEN_BURST=str(max(1.0, TOKEN_BURST / self.count)))
+        self._processes[index] = subprocess.Popen(
+            [sys.executable, "-m", "src.workers", "--index", str(index), "--parent", str(os.getpid())], env=env
+        )
+
+    def _monitor(self):
+        last_purge = 0.0
+        while not self._stop.wait(1.0):
+            for index, process in list(self._processes.items()):
+                if process.poll() is None:
+                    continue
+                logger.warning("Worker exited, restarting", extra={"worker": index, "returncode": process.returncode})
+                job_queue.release_worker(worker_name(index, process.pid))
+                if self._stop.wait(RESTART_DELAY):
+                    return
+                self._spawn(index)
+            if time.monotonic() - last_purge > 60:
+                last_purge = time.monotonic()
+                self._purge()
+
+    def _purge(self):
+        try:
+            job_queue.purge(RESULT_RETENTION)
+            cutoff = time.time() - RESULT_RETENTION
+            for root, _, names in os.walk(RESULTS_DIR):
+                for name in names:
+                    path = os.path.join(root, name)
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+        except Exception as e:
+            logger.warning("Failed to purge old jobs", extra={"error": str(e)})
+
+
+def worker_name(index, pid):
+    return f"worker-{index}-{pid}"
+
+
+async def generate_via_workers(prompt_alias, team_color, model_alias, custom_prompt, session_id=None, height=360, width=640, num_inference_steps=20, guidance_scale=2.0, seed=-1):
+    """
+    Counterpart of `generate_queued` (src/img_gen_async.py) that hands the
+    generation to the worker processes.
+
+    Requests first wait in the front end's scheduler, like in-process
+    generations, so sessions are served round-robin and every model's queue
+    is bounded; only then is the job written to the shared queue.
+
+    Yields (image, status) pairs: queue position while waiting, then the
+    final (file path, message). A job still queued when the client goes
+    away is cancelled.
+    """
+    if not known_selection(prompt_alias, model_alias):
+        yield None, "ERROR: Invalid prompt or model selected."
+        return
+    wait = token_pool.admit_session(session_id)
+    if wait:
+        yield None, f"You're generating too fast, please wait ~{math.ceil(wait)}s."
+        return
+    counts = await asyncio.to_thread(job_queue.counts)
+    if counts.get(QUEUED, 0) >= MAX_QUEUED_JOBS:
+        yield None, "Server is busy: too many requests are waiting. Please try again shortly."
+        return
+    try:
+        ticket = scheduler.enqueue(model_alias, session_id)
+    except QueueFullError:
+        yield None, "Server is busy: too many requests are waiting for this model. Please try again shortly."
+        return
+
+    params = {
+        "prompt_alias": prompt_alias,
+        "team": team_color,
+        "model_alias": model_alias,
+        "custom_prompt": custom_prompt or "",
+        "height": height,
+        "width": width,
+        "num_inference_steps": num_inference_steps,
+        "guidance_scale": guidance_scale,
+        "seed": seed,
+    }
+    job_id, job, shown = None, None, None
+    try:
+        while not ticket.granted.is_set():
+            yield None, f"Queued: position {scheduler.position(ticket)}, estimated wait ~{scheduler.eta(ticket):.0f}s"
+            await ticket.wait(timeout=QUEUE_STATUS_INTERVAL)
+        job_id = await asyncio.to_thread(job_queue.submit, params)
+        while True:
+            job = await asyncio.to_thread(job_queue.get, job_id)
+            if job["status"] in FINISHED:
+                break
+            if job["status"] == QUEUED:
+                status = f"Queued: position {await asyncio.to_thread(job_queue.position, job_id)}"
+            else:
+                status = "Generating image..."
+            if status != shown:
+                shown = status
+                yield None, status
+            await asyncio.sleep(POLL_INTERVAL)
+    finally:
+        # Kept synchronous: also runs when the generator is closed outside the event loop
+        if job_id is not None and (job is None or job["status"] not in FINISHED):
+            job_queue.cancel(job_id)
+        scheduler.release(ticket)
+
+    if job["status"] == DONE:
+        yield job["result"], job["message"]
+    else:
+        yield None, job["message"] or "ERROR: The request was cancelled."
+
+
+# Shared supervisor started by app.py
+supervisor = Supervisor()
+metrics.registry.register_collector(_collect_metrics)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a generation worker on the shared job queue.")
+    parser.add_argument("--index", type=int, default=0, help="Worker number (names the worker and its metrics port)")
+    parser.add_argument("--threads", type=int, default=WORKER_THREADS, help="Jobs run at once")
+    parser.add_argument("--parent", type=int, default=None, help="Exit when this process is no longer the parent")
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    # Each worker serves its own metrics next to the front end's port
+    if metrics.METRICS_PORT:
+        metrics.start_metrics_server(int(metrics.METRICS_PORT) + 1 + args.index)
+    Worker(worker_name(args.index, os.getpid()), args.threads, args.parent).run()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,59 @@
+# test_batch.py
+import json
+import src.batch as batch
+
+
+def fake_generate(calls):
+    def generate_image(prompt_alias, team, model_alias, custom_prompt, height, width, num_inference_steps, guidance_scale, seed, return_image=None):
+        calls.append((height, width, seed))
+        return f"{prompt_alias}-{team}-{seed}-{width}x{height}.png", "Image generated successfully!"
+    return generate_image
+
+
+def grid(size, seeds=2):
+    return batch.expand_grid(["Castle Siege"], ["Red"], ["FLUX.1-dev"], range(seeds), size, size, 4, 2.0)
+
+
+def test_rerun_skips_completed_jobs(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(batch, "generate_image", fake_generate(calls))
+    manifest = str(tmp_path / "manifest.jsonl")
+    assert batch.run_batch(grid(64), manifest, workers=2)["ok"] == 2
+    counts = batch.run_batch(grid(64), manifest, workers=2)
+    assert (counts["ok"], counts["skipped"]) == (0, 2)
+    assert len(calls) == 2
+
+
+def test_rerun_with_other_render_parameters_is_not_skipped(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(batch, "generate_image", fake_generate(calls))
+    manifest = str(tmp_path / "manifest.jsonl")
+    batch.run_batch(grid(64), manifest, workers=2)
+    counts = batch.run_batch(grid(256), manifest, workers=2)
+    assert (counts["ok"], counts["skipped"]) == (2, 0)
+
+
+def test_errors_and_truncated_records_run_again(tmp_path):
+    manifest = tmp_path / "manifest.jsonl"
+    ok, failed = list(grid(64))
+    with open(manifest, "w", encoding="utf-8") as f:
+        f.write(json.dumps(dict(ok, status="ok")) + "\n")
+        f.write(json.dumps(dict(failed, status="error")) + "\n")
+        f.write('{"prompt_alias": "Castle')
+    assert batch.load_completed(str(manifest)) == {batch.job_key(ok)}
+
+
+def test_dropped_duplicate_is_removed_from_the_gallery(tmp_path, monkeypatch):
+    removed = []
+    monkeypatch.setattr(batch, "GALLERY_ENABLED", True)
+    monkeypatch.setattr(batch.gallery_index, "remove", removed.append)
+    kept, duplicate = tmp_path / "kept.png", tmp_path / "duplicate.png"
+    kept.write_bytes(b"png")
+    duplicate.write_bytes(b"png")
+    tree = batch.BKTree()
+    batch.check_duplicate({"phash": "00ff", "output": str(kept), "message": "ok"}, tree, "drop", 4)
+    record = {"phash": "00fe", "output": str(duplicate), "message": "Image generated successfully!", "status": "ok"}
+    batch.check_duplicate(record, tree, "drop", 4)
+    assert record["status"] == "duplicate" and record["duplicate_of"] == str(kept)
+    assert not duplicate.exists() and kept.exists()
+    assert removed == [str(duplicate)]
@@ -0,0 +1,119 @@
+# test_client_pool.py
+import asyncio
+import sys
+import threading
+import types
+import pytest
+from src.client_pool import ClientPool
+
+
+class FakeInferenceClient:
+    def __init__(self, model, token=None):
+        self.model = model
+        self.token = token
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.fixture(autouse=True)
+def fake_hub(monkeypatch):
+    # The pool only needs the clients' constructors (and close() of the async one)
+    monkeypatch.setitem(sys.modules, "huggingface_hub", types.SimpleNamespace(InferenceClient=FakeInferenceClient, AsyncInferenceClient=FakeInferenceClient))
+
+
+def test_clients_are_reused_per_model_and_token():
+    pool = ClientPool()
+    with pool.acquire("m", "a") as first:
+        pass
+    with pool.acquire("m", "a") as again, pool.acquire("m", "b") as other:
+        assert again is first
+        assert other is not first
+
+
+def test_failing_client_is_evicted():
+    pool = ClientPool(max_failures=2)
+    with pool.acquire("m") as first:
+        pass
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            with pool.acquire("m"):
+                raise RuntimeError("upstream error")
+    with pool.acquire("m") as fresh:
+        assert fresh is not first
+
+
+def test_concurrency_limit_survives_eviction():
+    pool = ClientPool(max_connections=1, max_failures=1)
+    holding, release = threading.Event(), threading.Event()
+
+    def hold():
+        with pool.acquire("m", "a"):
+            holding.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    holding.wait(5)
+    # Evicting the client, or using another token, must not open a second slot for the model
+    pool.evict("m", "a")
+    acquired = []
+    waiter = threading.Thread(target=lambda: acquired.append(pool.acquire("m", "b").__enter__()))
+    waiter.start()
+    waiter.join(0.2)
+    assert not acquired
+    release.set()
+    thread.join(5)
+    waiter.join(5)
+    assert acquired
+
+
+def test_async_clients_are_reused_and_closed_after_eviction():
+    pool = ClientPool(max_failures=1)
+
+    async def scenario():
+        async with pool.acquire_async("m", "a") as first:
+            pass
+        async with pool.acquire_async("m", "a") as again:
+            assert again is first
+            # Evicted while in use: closed only once the call is over
+            pool.evict("m", "a")
+            assert not first.closed
+        assert first.closed
+        with pytest.raises(RuntimeError):
+            async with pool.acquire_async("m", "a") as failing:
+                raise RuntimeError("upstream error")
+        assert failing.closed and failing is not first
+
+    asyncio.run(scenario())
+
+
+def test_idle_async_clients_are_closed():
+    pool = ClientPool(idle_ttl=0)
+
+    async def scenario():
+        async with pool.acquire_async("m") as old:
+            pass
+        async with pool.acquire_async("m") as new:
+            assert new is not old
+        return old
+
+    assert asyncio.run(scenario()).closed
+
+
+def test_async_calls_share_the_model_slots():
+    pool = ClientPool(max_connections=1)
+
+    async def scenario():
+        with pool.acquire("m", "a"):
+            waiting = asyncio.ensure_future(pool.acquire_async("m", "b").__aenter__())
+            await asyncio.sleep(0.1)
+            assert not waiting.done()
+            # A cancelled waiter gives nothing back it did not take
+            waiting.cancel()
+        async with pool.acquire_async("m", "b"):
+            assert not pool._slots["m"].acquire(blocking=False)
+        assert pool._slots["m"].acquire(blocking=False)
+
+    asyncio.run(scenario())
@@ -0,0 +1,49 @@
+# test_gallery_index.py
+import os
+import pytest
+from src.gallery_index import GalleryIndex
+
+pytest.importorskip("PIL")
+
+
+def params(**overrides):
+    values = {
+        "prompt_alias": "Castle Siege", "team": "Red", "model_alias": "FLUX.1-dev", "custom_prompt": "", "seed": 1,
+        "width": 64, "height": 64, "num_inference_steps": 4, "guidance_scale": 2.0, "latency_ms": 12.5,
+    }
+    values.update(overrides)
+    return values
+
+
+def make_index(tmp_path):
+    return GalleryIndex(str(tmp_path / "gallery.sqlite3"), str(tmp_path / "thumbnails"), thumbnail_size=32)
+
+
+def test_add_query_and_filter(tmp_path):
+    from PIL import Image
+
+    index = make_index(tmp_path)
+    image = Image.new("RGB", (128, 64), "red")
+    first = index.add(image, params(seed=1), "files", "a.png", 100)
+    index.add(image, params(seed=2, team="Blue"), "files", "b.png", 100)
+    assert index.count() == 2
+    assert index.count(team="Blue") == 1
+    rows = index.query(0, 10)
+    assert [row["seed"] for row in rows] == [2, 1]
+    entry = index.get(first)
+    with Image.open(entry["thumbnail"]) as thumbnail:
+        assert thumbnail.size == (32, 16)
+    with pytest.raises(KeyError):
+        index.get(999)
+
+
+def test_remove_drops_rows_and_thumbnails(tmp_path):
+    from PIL import Image
+
+    index = make_index(tmp_path)
+    image_id = index.add(Image.new("RGB", (64, 64)), params(), "files", "a.png", 100)
+    thumbnail = index.get(image_id)["thumbnail"]
+    assert index.remove("a.png") == 1
+    assert index.count() == 0
+    assert not os.path.exists(thumbnail)
+    assert index.remove("a.png") == 0
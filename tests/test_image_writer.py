@@ -0,0 +1,63 @@
+# test_image_writer.py
+import os
+import subprocess
+import sys
+import threading
+from src.image_writer import ImageWriter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_saves_run_in_the_background_and_flush_waits():
+    writer = ImageWriter()
+    saved = []
+    for n in range(5):
+        assert writer.submit(saved.append, n)
+    writer.flush()
+    assert saved == [0, 1, 2, 3, 4]
+    assert writer.pending() == 0
+
+
+def test_failed_save_is_counted_and_the_writer_keeps_going():
+    writer = ImageWriter()
+    saved = []
+
+    def fail(_):
+        raise OSError("disk full")
+
+    writer.submit(fail, 1)
+    writer.submit(saved.append, 2)
+    writer.flush()
+    assert writer.errors == 1
+    assert saved == [2]
+
+
+def test_full_queue_tells_the_caller_to_save_inline():
+    writer = ImageWriter(max_pending=1)
+    started, release = threading.Event(), threading.Event()
+
+    def block(_):
+        started.set()
+        release.wait(5)
+
+    assert writer.submit(block, 1)
+    started.wait(5)
+    assert writer.submit(block, 2)
+    # The writer is busy and one image is already waiting
+    assert not writer.submit(block, 3)
+    release.set()
+    writer.flush()
+
+
+def test_queued_images_are_written_at_interpreter_exit(tmp_path):
+    target = tmp_path / "image.png"
+    code = (
+        "import time\n"
+        "from src.image_writer import ImageWriter\n"
+        "def save(path):\n"
+        "    time.sleep(0.2)\n"
+        "    open(path, 'wb').write(b'png')\n"
+        f"ImageWriter().submit(save, {str(target)!r})\n"
+    )
+    subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True, timeout=30)
+    assert target.read_bytes() == b"png"
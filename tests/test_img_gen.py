@@ -0,0 +1,87 @@
+# test_img_gen.py
+import asyncio
+import logging
+import os
+import pytest
+import src.img_gen as img_gen
+import src.img_gen_async as img_gen_async
+from src.backends import FakeBackend, ModalBackend
+from src.pack_store import PackStore
+
+pytest.importorskip("PIL")
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # Outputs and the result cache use paths relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(img_gen, "GALLERY_ENABLED", False)
+    monkeypatch.setattr(img_gen, "STORAGE_BACKEND", "files")
+    monkeypatch.setattr(img_gen, "get_backend", lambda: FakeBackend())
+    return tmp_path
+
+
+def generate_sync(seed, prompt_alias="Castle Siege", return_image=False, **kwargs):
+    return img_gen._generate_image("FLUX.1-dev", prompt_alias, "Red", "FLUX.1-dev", "", 64, 64, 4, 2.0, seed, return_image, **kwargs)
+
+
+def generate_async(seed, prompt_alias="Castle Siege", return_image=False, **kwargs):
+    return asyncio.run(img_gen_async._generate_image("FLUX.1-dev", prompt_alias, "Red", "FLUX.1-dev", "", 64, 64, 4, 2.0, seed, return_image, **kwargs))
+
+
+@pytest.mark.parametrize("generate", [generate_sync, generate_async])
+def test_seeded_generation_is_cached(workdir, generate):
+    path, message = generate(7)
+    assert message == "Image generated successfully!"
+    assert os.path.isfile(path) and "_7_" in path
+    cached_path, message = generate(7)
+    assert message == "Image generated successfully! (cached)"
+    with open(path, "rb") as saved, open(cached_path, "rb") as cached:
+        assert saved.read() == cached.read()
+
+
+@pytest.mark.parametrize("generate", [generate_sync, generate_async])
+def test_random_generation_uses_the_given_seed_and_is_not_cached(workdir, generate):
+    path, message = generate(-1, random_seed=1234)
+    assert message == "Image generated successfully!"
+    assert "_1234_" in path
+    assert not os.path.exists(".ctb_cache")
+
+
+@pytest.mark.parametrize("generate", [generate_sync, generate_async])
+def test_invalid_selection(workdir, generate):
+    assert generate(1, prompt_alias="No Such Prompt") == (None, "ERROR: Invalid prompt or model selected.")
+
+
+@pytest.mark.parametrize("generate", [generate_sync, generate_async])
+def test_pack_storage_returns_displayable_images(workdir, generate, monkeypatch):
+    store = PackStore(str(workdir / "packs"))
+    monkeypatch.setattr(img_gen, "STORAGE_BACKEND", "pack")
+    monkeypatch.setattr(img_gen, "RETURN_IMAGES", False)
+    monkeypatch.setattr(img_gen, "_pack_store", store)
+    # The UI default gets the image itself rather than a pack id
+    image, _ = generate(-1, return_image=None)
+    assert image.size == (64, 64)
+    # Callers that ask for locations get a pack id they can read back
+    image_id, _ = generate(-1)
+    assert not os.path.exists(image_id)
+    assert store.get(image_id)[0]["model_alias"] == "FLUX.1-dev"
+    img_gen.image_writer.flush()
+    store.close()
+
+
+@pytest.mark.parametrize("generate_image", [img_gen.generate_image, lambda *args, **kwargs: asyncio.run(img_gen_async.generate_image(*args, **kwargs))])
+def test_random_requests_log_the_drawn_seed(workdir, generate_image, caplog):
+    with caplog.at_level(logging.INFO, logger="ctb"):
+        path, _ = generate_image("Castle Siege", "Red", "FLUX.1-dev", "", 64, 64, 4, 2.0, -1, return_image=False)
+    seeds = [record.seed for record in caplog.records if record.getMessage() == "Generation finished"]
+    assert len(seeds) == 1 and seeds[0] != -1
+    assert f"_{seeds[0]}_" in path
+
+
+def test_modal_backend_refuses_models_it_does_not_serve():
+    backend = ModalBackend(model="black-forest-labs/FLUX.1-dev")
+    with pytest.raises(ValueError, match="only serves"):
+        backend.text_to_image("strangerzonehf/Flux-Midjourney-Mix2-LoRA", "prompt", 64, 64, 4, 2.0, 1)
+    with pytest.raises(ValueError, match="only serves"):
+        asyncio.run(backend.text_to_image_async("strangerzonehf/Flux-Midjourney-Mix2-LoRA", "prompt", 64, 64, 4, 2.0, 1))
@@ -0,0 +1,70 @@
+# test_img_gen_async.py
+import asyncio
+import src.img_gen_async as img_gen_async
+
+
+def test_progressive_keeps_random_requests_random(monkeypatch):
+    calls = {}
+
+    async def fake_generate(*args):
+        calls["full"] = args
+        return "image", "Image generated successfully!"
+
+    async def fake_draft(*args):
+        calls["draft"] = args
+        return None
+
+    monkeypatch.setattr(img_gen_async, "generate", fake_generate)
+    monkeypatch.setattr(img_gen_async, "generate_draft", fake_draft)
+
+    async def run():
+        return [update async for update in img_gen_async.generate_progressive("Castle Siege", "Red", "FLUX.1-dev", "", seed=-1)]
+
+    updates = asyncio.run(run())
+    assert updates[-1] == ("image", "Image generated successfully!")
+    # The full render is still a random request (warm pool, no cache), rendered with the draft's seed
+    *_, seed, random_seed = calls["full"]
+    assert seed == -1
+    assert random_seed == calls["draft"][-1]
+
+
+def test_progressive_passes_explicit_seed_through(monkeypatch):
+    calls = {}
+
+    async def fake_generate(*args):
+        calls["full"] = args
+        return "image", "ok"
+
+    async def fake_draft(*args):
+        calls["draft"] = args
+        return None
+
+    monkeypatch.setattr(img_gen_async, "generate", fake_generate)
+    monkeypatch.setattr(img_gen_async, "generate_draft", fake_draft)
+
+    async def run():
+        return [update async for update in img_gen_async.generate_progressive("Castle Siege", "Red", "FLUX.1-dev", "", seed=42)]
+
+    asyncio.run(run())
+    assert calls["full"][-2] == 42
+    assert calls["draft"][-1] == 42
+
+
+def test_unknown_model_is_rejected_before_queueing(monkeypatch):
+    # Collectors (e.g. the worker queue's) would touch the shared databases
+    monkeypatch.setattr(img_gen_async.metrics.registry, "_collectors", [])
+
+    async def run():
+        return [update async for update in img_gen_async.generate_queued("Castle Siege", "Red", "no-such-model", "")]
+
+    assert asyncio.run(run()) == [(None, "ERROR: Invalid prompt or model selected.")]
+    assert not any(model.startswith("no-such-model") for model in img_gen_async.scheduler.stats())
+    assert "no-such-model" not in img_gen_async.metrics.registry.render()
+
+
+def test_unknown_model_is_rejected_before_progressive_queueing():
+    async def run():
+        return [update async for update in img_gen_async.generate_progressive("Castle Siege", "Red", "no-such-model", "")]
+
+    assert asyncio.run(run()) == [(None, "ERROR: Invalid prompt or model selected.")]
+    assert not any(model.startswith("no-such-model") for model in img_gen_async.scheduler.stats())
@@ -0,0 +1,102 @@
+# test_job_queue.py
+import threading
+import time
+from src.job_queue import JobQueue, CANCELLED, DONE, FAILED, QUEUED, RUNNING
+
+
+def make_queue(tmp_path, **kwargs):
+    return JobQueue(str(tmp_path / "jobs.sqlite3"), **kwargs)
+
+
+def test_claims_in_submission_order(tmp_path):
+    queue = make_queue(tmp_path)
+    first, second = queue.submit({"n": 1}), queue.submit({"n": 2})
+    assert queue.position(second) == 2
+    assert queue.claim("w1") == (first, {"n": 1})
+    assert queue.claim("w2") == (second, {"n": 2})
+    assert queue.claim("w3") is None
+    assert queue.get(first)["status"] == RUNNING
+
+
+def test_concurrent_claims_never_share_a_job(tmp_path):
+    queue = make_queue(tmp_path)
+    for n in range(100):
+        queue.submit({"n": n})
+    claimed, lock = [], threading.Lock()
+
+    def work(name):
+        while True:
+            job = queue.claim(name)
+            if job is None:
+                return
+            with lock:
+                claimed.append(job[0])
+
+    threads = [threading.Thread(target=work, args=(f"w{n}",)) for n in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(claimed) == sorted(set(claimed)) and len(claimed) == 100
+
+
+def test_expired_lease_is_handed_out_again(tmp_path):
+    queue = make_queue(tmp_path, lease_seconds=0.05)
+    job_id = queue.submit({})
+    queue.claim("w1")
+    assert queue.claim("w2") is None
+    time.sleep(0.1)
+    assert queue.claim("w2") == (job_id, {})
+    # The first worker lost the lease and can no longer renew or finish the job
+    assert not queue.renew(job_id, "w1")
+    assert not queue.finish(job_id, "w1", "a.png", "ok")
+    assert queue.finish(job_id, "w2", "b.png", "ok")
+    assert queue.get(job_id)["result"] == "b.png"
+
+
+def test_renewed_lease_is_kept(tmp_path):
+    queue = make_queue(tmp_path, lease_seconds=0.2)
+    queue.submit({})
+    job_id, _ = queue.claim("w1")
+    time.sleep(0.12)
+    assert queue.renew(job_id, "w1")
+    time.sleep(0.12)
+    assert queue.claim("w2") is None
+
+
+def test_job_fails_after_max_attempts(tmp_path):
+    queue = make_queue(tmp_path, lease_seconds=0.05, max_attempts=2)
+    job_id = queue.submit({})
+    for worker in ("w1", "w2"):
+        assert queue.claim(worker)[0] == job_id
+        time.sleep(0.1)
+    assert queue.claim("w3") is None
+    assert queue.get(job_id)["status"] == FAILED
+
+
+def test_release_worker_makes_jobs_available_at_once(tmp_path):
+    queue = make_queue(tmp_path, lease_seconds=60)
+    job_id = queue.submit({})
+    queue.claim("dead")
+    assert queue.release_worker("dead") == 1
+    assert queue.claim("w2")[0] == job_id
+
+
+def test_cancel_only_queued_jobs(tmp_path):
+    queue = make_queue(tmp_path)
+    running, queued = queue.submit({}), queue.submit({})
+    queue.claim("w1")
+    assert not queue.cancel(running)
+    assert queue.cancel(queued)
+    assert queue.counts() == {RUNNING: 1, CANCELLED: 1}
+    assert queue.claim("w2") is None
+
+
+def test_purge_keeps_unfinished_jobs(tmp_path):
+    queue = make_queue(tmp_path)
+    done, waiting = queue.submit({}), queue.submit({})
+    queue.claim("w1")
+    queue.finish(done, "w1", "a.png", "ok", DONE)
+    assert queue.purge(-1) == 1
+    assert queue.counts() == {QUEUED: 1}
+    assert queue.get(waiting)["status"] == QUEUED
@@ -0,0 +1,74 @@
+# test_job_runner.py
+import json
+import pytest
+import src.job_runner as job_runner
+
+
+def line(**fields):
+    request = {"prompt_alias": "Castle Siege", "team": "Red", "model_alias": "FLUX.1-dev"}
+    request.update(fields)
+    return json.dumps(request)
+
+
+def test_parse_applies_defaults_for_missing_and_null_fields():
+    job = job_runner.parse_request(line(custom_prompt=None, seed=None, guidance_scale=3))
+    assert job["custom_prompt"] == ""
+    assert job["seed"] == -1
+    assert job["guidance_scale"] == 3.0
+    assert job["height"] == 360
+
+
+@pytest.mark.parametrize("fields", [
+    {"num_inference_steps": 2.7},
+    {"seed": "7"},
+    {"width": True},
+    {"custom_prompt": 5},
+    {"guidance_scale": "high"},
+])
+def test_parse_rejects_wrong_types(fields):
+    with pytest.raises(ValueError, match="bad parameter"):
+        job_runner.parse_request(line(**fields))
+
+
+@pytest.mark.parametrize("raw", [
+    "not json",
+    "[1, 2]",
+    json.dumps({"request_id": "user-001", "title": "t", "body": "b"}),
+    line(team="Green"),
+    line(model_alias="Unknown"),
+])
+def test_parse_rejects_invalid_lines(raw):
+    with pytest.raises(ValueError):
+        job_runner.parse_request(raw)
+
+
+def test_resumes_after_the_watermark(tmp_path, monkeypatch):
+    calls = []
+
+    def run_job(line_no, job):
+        calls.append(line_no)
+        return {"line": line_no, "status": "ok", "output": f"{line_no}.png", "message": "ok", "latency": 0}
+
+    monkeypatch.setattr(job_runner, "run_job", run_job)
+    source = tmp_path / "requests.jsonl"
+    journal = str(tmp_path / "journal.jsonl")
+    source.write_text("\n".join([line(seed=i) for i in range(5)] + ["bad"]) + "\n")
+
+    counts = job_runner.run_requests(str(source), journal, workers=2)
+    assert (counts["ok"], counts["invalid"]) == (5, 1)
+
+    # A crash after line 3 finished out of order: lines 0-1 are below the watermark, 3 is journaled after it
+    with open(journal, "w", encoding="utf-8") as f:
+        offsets = [0]
+        for raw in source.read_bytes().splitlines(keepends=True):
+            offsets.append(offsets[-1] + len(raw))
+        f.write(json.dumps({"line": 1, "status": "ok", "watermark": [offsets[2], 2]}) + "\n")
+        f.write(json.dumps({"line": 3, "status": "ok", "watermark": [offsets[2], 2]}) + "\n")
+        f.write('{"line": 2, "sta')
+    calls.clear()
+    counts = job_runner.run_requests(str(source), journal, workers=2)
+    assert sorted(calls) == [2, 4]
+    assert (counts["ok"], counts["skipped"], counts["invalid"]) == (2, 1, 1)
+    assert job_runner.load_journal(journal)[:2] == (offsets[-1], 6)
+    # New records start on their own line after the torn one
+    assert len([entry for entry in open(journal, encoding="utf-8") if entry.startswith('{"line"')]) == 6
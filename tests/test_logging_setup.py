@@ -0,0 +1,74 @@
+# test_logging_setup.py
+import atexit
+import io
+import json
+import logging
+import os
+import queue
+import subprocess
+import sys
+import pytest
+import src.logging_setup as logging_setup
+from src.logging_setup import JsonFormatter, configure_logging, get_logger, request_context, _RequestQueueHandler
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def fresh_logging(monkeypatch):
+    # configure_logging only installs handlers once per process
+    monkeypatch.setattr(logging_setup, "_listener", None)
+    logger = logging.getLogger("ctb")
+    handlers, level, propagate = list(logger.handlers), logger.level, logger.propagate
+    yield
+    listener = logging_setup._listener
+    if listener is not None:
+        listener.stop()
+        atexit.unregister(listener.stop)
+    logger.handlers[:] = handlers
+    logger.setLevel(level)
+    logger.propagate = propagate
+
+
+def test_json_formatter_includes_request_id_and_extra_fields():
+    record = logging.LogRecord("ctb.test", logging.WARNING, __file__, 1, "Generation %s", ("finished",), None)
+    record.request_id = "abc123"
+    record.seed = 7
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record.exc_info = sys.exc_info()
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["level"] == "WARNING" and entry["logger"] == "ctb.test"
+    assert entry["msg"] == "Generation finished"
+    assert entry["request_id"] == "abc123" and entry["seed"] == 7
+    assert "ValueError: boom" in entry["exc"]
+
+
+def test_configure_logging_writes_json_lines_through_the_listener(fresh_logging):
+    stream = io.StringIO()
+    configure_logging(level="INFO", fmt="json", stream=stream)
+    configure_logging(level="INFO", fmt="json", stream=io.StringIO())
+    assert len(logging.getLogger("ctb").handlers) == 1
+    with request_context():
+        request = logging_setup.request_id.get()
+        get_logger("test").info("Generation finished", extra={"seed": 42})
+    # Stopping the listener drains its queue
+    logging_setup._listener.stop()
+    atexit.unregister(logging_setup._listener.stop)
+    logging_setup._listener = None
+    entry = json.loads(stream.getvalue())
+    assert (entry["msg"], entry["seed"], entry["request_id"]) == ("Generation finished", 42, request)
+
+
+def test_full_queue_drops_records_instead_of_blocking():
+    handler = _RequestQueueHandler(queue.Queue(maxsize=1))
+    for _ in range(3):
+        handler.handle(logging.LogRecord("ctb.test", logging.INFO, __file__, 1, "msg", (), None))
+    assert handler.dropped == 2
+
+
+def test_importing_modules_does_not_configure_logging():
+    code = "import logging, src.img_gen, src.logging_setup as l; print(l._listener is None, logging.getLogger('ctb').handlers)"
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    assert output.strip() == "True []"
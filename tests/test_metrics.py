@@ -0,0 +1,38 @@
+# test_metrics.py
+from src.metrics import Counter, Gauge, Histogram, MetricsRegistry, sample
+
+
+def test_render_counter_gauge_and_histogram():
+    registry = MetricsRegistry()
+    counter = registry.register(Counter("c_total", "A counter.", ("model",)))
+    gauge = registry.register(Gauge("g", "A gauge."))
+    histogram = registry.register(Histogram("h_seconds", "A histogram.", buckets=(1.0, 5.0)))
+    counter.inc(model='a"b')
+    counter.inc(2, model='a"b')
+    gauge.inc()
+    gauge.inc()
+    gauge.dec()
+    histogram.observe(0.5)
+    histogram.observe(3.0)
+    histogram.observe(10.0)
+
+    lines = registry.render().splitlines()
+    assert lines[:3] == ["# HELP c_total A counter.", "# TYPE c_total counter", 'c_total{model="a\\"b"} 3']
+    assert "g 1" in lines
+    assert 'h_seconds_bucket{le="1.0"} 1' in lines
+    assert 'h_seconds_bucket{le="5.0"} 2' in lines
+    assert 'h_seconds_bucket{le="+Inf"} 3' in lines
+    assert "h_seconds_sum 13.5" in lines
+    assert "h_seconds_count 3" in lines
+    assert gauge.value() == 1
+
+
+def test_failing_collector_does_not_break_the_scrape():
+    registry = MetricsRegistry()
+    registry.register_collector(lambda: sample("up", "gauge", "Up.", 1))
+
+    def broken():
+        raise RuntimeError("db locked")
+
+    registry.register_collector(broken)
+    assert registry.render() == "# HELP up Up.\n# TYPE up gauge\nup 1\n# collector failed: db locked\n"
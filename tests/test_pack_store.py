@@ -0,0 +1,46 @@
+# test_pack_store.py
+import os
+from src.pack_store import PackStore
+
+
+def test_put_get_round_trip_and_reopen(tmp_path):
+    store = PackStore(str(tmp_path))
+    first = store.put(b"one", {"seed": 1})
+    second = store.put(b"two")
+    assert store.get(first) == ({"seed": 1}, b"one")
+    assert store.get(second) == ({}, b"two")
+    assert list(store.ids()) == [first, second]
+    store.close()
+
+    store = PackStore(str(tmp_path))
+    assert len(store) == 2
+    # Ids keep increasing after a restart
+    third = store.put(b"three")
+    assert list(store.ids()) == [first, second, third]
+    assert store.get(first)[1] == b"one"
+    assert store.get("00" * 16) is None
+    assert store.get("not an id") is None
+    store.close()
+
+
+def test_torn_index_record_is_dropped(tmp_path):
+    store = PackStore(str(tmp_path))
+    image_id = store.put(b"one")
+    store.close()
+    with open(os.path.join(tmp_path, "index.bin"), "ab") as f:
+        f.write(b"\x01\x02\x03")
+
+    store = PackStore(str(tmp_path))
+    assert len(store) == 1
+    assert store.get(image_id)[1] == b"one"
+    store.close()
+
+
+def test_rotation_and_retention(tmp_path):
+    store = PackStore(str(tmp_path), max_pack_bytes=64, retention_bytes=200)
+    ids = [store.put(bytes(50)) for _ in range(6)]
+    # Every record fills a pack of its own; the oldest packs went over the size limit
+    assert store.get(ids[-1])[1] == bytes(50)
+    assert store.get(ids[0]) is None
+    assert list(store.ids()) == ids[-len(store):]
+    store.close()
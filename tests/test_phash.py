@@ -0,0 +1,66 @@
+# test_phash.py
+import random
+import pytest
+from src.phash import BKTree, hamming, phash, phash_batch, find_duplicates
+
+
+def test_hamming():
+    assert hamming(0, 0) == 0
+    assert hamming(0b1011, 0b0001) == 2
+    assert hamming(0, (1 << 64) - 1) == 64
+
+
+def test_bk_tree_matches_brute_force():
+    rng = random.Random(0)
+    values = [rng.getrandbits(64) for _ in range(500)]
+    # Near copies, so that small distances actually occur
+    values += [v ^ (1 << rng.randrange(64)) for v in values[:100]]
+    tree = BKTree()
+    for i, value in enumerate(values):
+        tree.add(value, i)
+    assert len(tree) == len(values)
+    for query in values[:50] + [rng.getrandbits(64) for _ in range(50)]:
+        for distance in (0, 3, 20):
+            expected = sorted((hamming(query, v), i) for i, v in enumerate(values) if hamming(query, v) <= distance)
+            found = sorted((d, item) for d, _, item in tree.search(query, distance))
+            assert found == expected
+
+
+def test_nearest():
+    tree = BKTree()
+    assert tree.nearest(0, 5) is None
+    tree.add(0b1111, "far")
+    tree.add(0b0001, "near")
+    assert tree.nearest(0, 5)[2] == "near"
+    assert tree.nearest(0, 0) is None
+
+
+def blocks(width, height, seed=0):
+    # Coarse random blocks: plenty of low-frequency structure, like a real picture
+    from PIL import Image
+
+    rng = random.Random(seed)
+    small = Image.new("L", (8, 8))
+    small.putdata([rng.randrange(256) for _ in range(64)])
+    return small.resize((width, height), Image.BILINEAR).convert("RGB")
+
+
+def test_similar_images_hash_close():
+    pytest.importorskip("PIL")
+    base = blocks(96, 64)
+    resized = blocks(192, 128)
+    different = blocks(96, 64, seed=1)
+    assert hamming(phash(base), phash(resized)) <= 6
+    assert hamming(phash(base), phash(different)) > 6
+    assert phash_batch([base, resized]) == [phash(base), phash(resized)]
+    assert phash_batch([]) == []
+
+
+def test_find_duplicates(tmp_path):
+    pytest.importorskip("PIL")
+    paths = []
+    for name, image in (("a.png", blocks(96, 64)), ("b.png", blocks(192, 128)), ("c.png", blocks(96, 64, seed=1))):
+        image.save(tmp_path / name)
+        paths.append(str(tmp_path / name))
+    duplicates = find_duplicates(paths, max_distance=6)
+    assert [(path, kept) for path, kept, _ in duplicates] == [(paths[1], paths[0])]
@@ -0,0 +1,71 @@
+# test_prompt_registry.py
+import os
+import threading
+import pytest
+from src.prompt_registry import PromptRegistry, format_prompt, validate_prompts
+
+
+def write_config(tmp_path, prompts, models=None):
+    (tmp_path / "prompts.py").write_text(f"prompts = {prompts!r}\n")
+    (tmp_path / "models.py").write_text(f"models = {models or [{'alias': 'flux', 'name': 'org/flux'}]!r}\n")
+    return str(tmp_path / "prompts.py"), str(tmp_path / "models.py")
+
+
+def test_format_prompt():
+    assert format_prompt("{team_color} vs {enemy_color}", "Red") == "red vs blue"
+    assert format_prompt("{team_color} vs {enemy_color}", "Blue") == "blue vs red"
+
+
+@pytest.mark.parametrize("prompts", [
+    [{"alias": "a"}],
+    [{"alias": "a", "text": "x"}, {"alias": "a", "text": "y"}],
+    [{"alias": "a", "text": "{team}"}],
+    [{"alias": "a", "text": "{team_color"}],
+])
+def test_validate_prompts_rejects(prompts):
+    with pytest.raises(ValueError):
+        validate_prompts(prompts)
+
+
+def test_registry_reloads_and_keeps_the_last_good_version(tmp_path):
+    prompts_file, models_file = write_config(tmp_path, [{"alias": "Siege", "text": "{team_color} castle"}])
+    registry = PromptRegistry(prompts_file, models_file, check_interval=0)
+    assert registry.prompt_text("Siege", "Red") == "red castle"
+    assert registry.model_name("flux") == "org/flux"
+
+    write_config(tmp_path, [{"alias": "Duel", "text": "{enemy_color} knight"}])
+    os.utime(prompts_file, (1, 1))
+    assert registry.prompt_aliases() == ["Duel"]
+    assert registry.prompt_text("Duel", "Red") == "blue knight"
+
+    write_config(tmp_path, [{"alias": "Bad", "text": "{unknown}"}])
+    os.utime(prompts_file, (2, 2))
+    assert registry.prompt_aliases() == ["Duel"]
+
+
+def test_reload_swaps_in_a_consistent_snapshot(tmp_path):
+    prompts_file, models_file = write_config(tmp_path, [{"alias": "P0", "text": "{team_color} 0"}])
+    registry = PromptRegistry(prompts_file, models_file, check_interval=3600)
+    old = registry._snapshot
+    errors, done = [], threading.Event()
+
+    def read():
+        while not done.is_set():
+            # An alias that is listed must resolve, even while a reload is swapping versions
+            alias = registry.prompt_aliases()[-1]
+            try:
+                assert registry.prompt_text(alias, "Red") == f"red {alias[1:]}"
+            except Exception as e:
+                errors.append(e)
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    for n in range(1, 100):
+        write_config(tmp_path, [{"alias": f"P{i}", "text": f"{{team_color}} {i}"} for i in range(n + 1)])
+        registry.reload()
+    done.set()
+    reader.join(5)
+    assert not errors
+    # The old version was left untouched
+    assert list(old.texts) == ["P0"]
+    assert registry.prompt_aliases()[-1] == "P99"
@@ -0,0 +1,121 @@
+# test_resilience.py
+import asyncio
+import time
+import pytest
+from src.resilience import CircuitBreaker, CircuitOpenError, RateLimitExceeded, Resilience, RetryPolicy, classify, RATE_LIMITED, UNAVAILABLE, CLIENT_ERROR
+
+
+class UpstreamError(Exception):
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+        self.headers = {}
+
+
+def no_retries():
+    return Resilience(RetryPolicy(attempts=1))
+
+
+def fail(status):
+    raise UpstreamError(status)
+
+
+def test_classify():
+    assert classify(UpstreamError(429)) == RATE_LIMITED
+    assert classify(UpstreamError(503)) == UNAVAILABLE
+    assert classify(UpstreamError(400)) == CLIENT_ERROR
+    assert classify(RateLimitExceeded("busy", retry_after=1)) == RATE_LIMITED
+    assert classify(TimeoutError()) == UNAVAILABLE
+
+
+def test_breaker_opens_after_threshold_and_probes():
+    breaker = CircuitBreaker("m", failure_threshold=2, reset_timeout=0)
+    breaker.record_failure()
+    assert not breaker.is_open
+    breaker.record_failure()
+    assert breaker.is_open
+    # One probe at a time once the reset timeout has passed
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.is_open
+    assert breaker.allow()
+    breaker.record_success()
+    assert not breaker.is_open
+    assert breaker.allow() and breaker.allow()
+
+
+def test_breaker_blocks_until_reset_timeout():
+    breaker = CircuitBreaker("m", failure_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+    assert not breaker.allow()
+
+
+def test_client_errors_do_not_open_the_circuit():
+    resilience = no_retries()
+    for _ in range(10):
+        with pytest.raises(UpstreamError):
+            resilience.call("m", fail, 400)
+    assert not resilience.breaker("m").is_open
+
+
+def test_local_rate_limit_does_not_open_the_circuit():
+    resilience = no_retries()
+
+    def limited():
+        raise RateLimitExceeded("busy", retry_after=0)
+
+    for _ in range(10):
+        with pytest.raises(RateLimitExceeded):
+            resilience.call("m", limited)
+    assert not resilience.breaker("m").is_open
+
+
+def test_upstream_throttling_does_not_open_the_circuit():
+    resilience = no_retries()
+    for _ in range(10):
+        with pytest.raises(UpstreamError):
+            resilience.call("m", fail, 429)
+    assert not resilience.breaker("m").is_open
+    for _ in range(10):
+        with pytest.raises((UpstreamError, CircuitOpenError)):
+            resilience.call("m", fail, 503)
+    assert resilience.breaker("m").is_open
+
+
+def test_throttled_probe_releases_the_breaker():
+    resilience = no_retries()
+    breaker = resilience.breaker("m")
+    breaker.failure_threshold, breaker.reset_timeout = 1, 0.05
+    breaker.record_failure()
+    time.sleep(0.06)
+    with pytest.raises(UpstreamError):
+        resilience.call("m", fail, 429)
+    # The probe slot is free again and the circuit was not re-opened for another reset timeout
+    assert resilience.call("m", lambda: "image") == "image"
+    assert not breaker.is_open
+
+
+def test_cancelled_probe_releases_the_breaker():
+    resilience = no_retries()
+    breaker = resilience.breaker("m")
+    breaker.failure_threshold, breaker.reset_timeout = 1, 0
+    breaker.record_failure()
+
+    async def hang():
+        await asyncio.sleep(10)
+
+    async def run():
+        task = asyncio.ensure_future(resilience.call_async("m", hang))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        async def ok():
+            return "image"
+
+        return await resilience.call_async("m", ok)
+
+    assert asyncio.run(run()) == "image"
+    assert not breaker.is_open
@@ -0,0 +1,41 @@
+# test_result_cache.py
+import os
+from src.result_cache import ResultCache, cache_key
+
+
+def test_cache_key_normalizes_parameters():
+    assert cache_key("m", "p", 64, 64, 4, 2, 1) == cache_key("m", "p", "64", 64.0, 4, 2.0, 1)
+    assert cache_key("m", "p", 64, 64, 4, 2.0, 1) != cache_key("m", "p", 64, 64, 4, 2.0, 2)
+    # Upscaled renders get their own keys; native ones keep the key they always had
+    assert cache_key("m", "p", 64, 64, 4, 2.0, 1, upscale=1) == cache_key("m", "p", 64, 64, 4, 2.0, 1)
+    assert cache_key("m", "p", 64, 64, 4, 2.0, 1, upscale=2) != cache_key("m", "p", 64, 64, 4, 2.0, 1)
+
+
+def test_get_and_put(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=1000)
+    key = cache_key("m", "p", 64, 64, 4, 2.0, 1)
+    assert cache.get(key) is None
+    path = cache.put_bytes(key, b"x" * 10)
+    assert cache.get(key) == path
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_overwriting_a_key_does_not_grow_the_tracked_size(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=1000)
+    key = cache_key("m", "p", 64, 64, 4, 2.0, 1)
+    for _ in range(5):
+        cache.put_bytes(key, b"x" * 100)
+    assert cache.stats()["bytes"] == 100
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=250)
+    keys = [cache_key("m", "p", 64, 64, 4, 2.0, seed) for seed in range(3)]
+    paths = [cache.put_bytes(key, b"x" * 100) for key in keys[:2]]
+    # Make the first entry the most recently used one
+    os.utime(paths[1], (1, 1))
+    cache.get(keys[0])
+    cache.put_bytes(keys[2], b"x" * 100)
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) and cache.get(keys[2])
+    assert cache.stats()["bytes"] == 200
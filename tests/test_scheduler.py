@@ -0,0 +1,83 @@
+# test_scheduler.py
+import asyncio
+import pytest
+from src.scheduler import RequestScheduler, QueueFullError
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_concurrency_limit_and_release():
+    async def scenario():
+        scheduler = RequestScheduler(concurrency=1, max_queue_depth=10)
+        first = scheduler.enqueue("m", "a")
+        second = scheduler.enqueue("m", "b")
+        assert first.granted.is_set() and not second.granted.is_set()
+        assert scheduler.position(second) == 1
+        scheduler.release(first)
+        assert second.granted.is_set()
+        assert scheduler.stats()["m"]["active"] == 1
+    run(scenario())
+
+
+def test_sessions_are_served_round_robin():
+    async def scenario():
+        scheduler = RequestScheduler(concurrency=1, max_queue_depth=10)
+        running = scheduler.enqueue("m", "a")
+        a1, a2, a3 = (scheduler.enqueue("m", "a") for _ in range(3))
+        b1 = scheduler.enqueue("m", "b")
+        # b's only request goes ahead of a's second one
+        assert [scheduler.position(t) for t in (a1, b1, a2, a3)] == [1, 2, 3, 4]
+        order = []
+        for ticket in (running, a1, b1, a2):
+            scheduler.release(ticket)
+            order.append(next(t for t in (a1, b1, a2, a3) if t.granted.is_set() and t not in order))
+        assert order == [a1, b1, a2, a3]
+    run(scenario())
+
+
+def test_full_queue_rejects():
+    async def scenario():
+        scheduler = RequestScheduler(concurrency=1, max_queue_depth=1)
+        scheduler.enqueue("m", "a")
+        scheduler.enqueue("m", "a")
+        with pytest.raises(QueueFullError):
+            scheduler.enqueue("m", "b")
+        # Other models are unaffected
+        assert scheduler.enqueue("other", "b").granted.is_set()
+    run(scenario())
+
+
+def test_lanes_have_their_own_slots():
+    async def scenario():
+        scheduler = RequestScheduler(concurrency=1, max_queue_depth=10, lane_concurrency={"draft": 2})
+        assert scheduler.enqueue("m", "a").granted.is_set()
+        drafts = [scheduler.enqueue("m", "a", lane="draft") for _ in range(3)]
+        assert [t.granted.is_set() for t in drafts] == [True, True, False]
+        stats = scheduler.stats()["m/draft"]
+        assert (stats["active"], stats["waiting"]) == (2, 1)
+    run(scenario())
+
+
+def test_releasing_a_waiting_ticket_leaves_the_queue():
+    async def scenario():
+        scheduler = RequestScheduler(concurrency=1, max_queue_depth=10)
+        running = scheduler.enqueue("m", "a")
+        gone = scheduler.enqueue("m", "a")
+        staying = scheduler.enqueue("m", "b")
+        scheduler.release(gone)
+        scheduler.release(gone)
+        assert scheduler.position(staying) == 1
+        scheduler.release(running)
+        assert staying.granted.is_set() and not gone.granted.is_set()
+        assert scheduler.stats()["m"]["waiting"] == 0
+    run(scenario())
+
+
+def test_wait_times_out():
+    async def scenario():
+        scheduler = RequestScheduler(concurrency=1, max_queue_depth=10)
+        scheduler.enqueue("m", "a")
+        return await scheduler.enqueue("m", "b").wait(timeout=0.01)
+    assert run(scenario()) is False
@@ -0,0 +1,94 @@
+# test_single_flight.py
+import asyncio
+import threading
+import time
+import pytest
+from src.single_flight import SingleFlight, AsyncSingleFlight, coalesced_total
+
+
+def coalesced():
+    return coalesced_total._values.get((), 0)
+
+
+def test_concurrent_calls_share_one_run():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls, results = [], []
+
+    def work():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "image"
+
+    def caller():
+        results.append(flight.do("key", work))
+
+    before = coalesced()
+    leader = threading.Thread(target=caller)
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=caller) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    # Let the followers join the call before the leader finishes
+    deadline = time.monotonic() + 5
+    while coalesced() - before < 3 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+    assert calls == [1]
+    assert results == ["image"] * 4
+    # The key is free again afterwards
+    assert flight.do("key", lambda: "next") == "next"
+
+
+def test_errors_reach_the_leader():
+    flight = SingleFlight()
+
+    def fail():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        flight.do("key", fail)
+    assert flight.do("key", lambda: 1) == 1
+
+
+def test_async_calls_share_one_run_and_error():
+    flight = AsyncSingleFlight()
+    calls = []
+
+    async def work(value):
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        if value == "bad":
+            raise RuntimeError("boom")
+        return value
+
+    async def scenario():
+        results = await asyncio.gather(*(flight.do("key", work, "image") for _ in range(3)))
+        errors = await asyncio.gather(*(flight.do("other", work, "bad") for _ in range(2)), return_exceptions=True)
+        return results, errors
+
+    results, errors = asyncio.run(scenario())
+    assert results == ["image"] * 3
+    assert all(isinstance(e, RuntimeError) for e in errors)
+    assert calls == ["image", "bad"]
+
+
+def test_async_cancelled_caller_does_not_cancel_the_others():
+    flight = AsyncSingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.02)
+        return "image"
+
+    async def scenario():
+        first = asyncio.ensure_future(flight.do("key", work))
+        second = asyncio.ensure_future(flight.do("key", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(scenario()) == "image"
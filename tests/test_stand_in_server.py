@@ -0,0 +1,65 @@
+# test_stand_in_server.py
+import io
+import json
+import urllib.error
+import urllib.request
+import pytest
+from src.backends import FakeBackend
+from src.stand_in_server import StandInConfig, parse_latency, start_server
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(**config):
+        server, url = start_server(port=0, config=StandInConfig(**config))
+        servers.append(server)
+        return url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def post(url, payload, token="a"):
+    request = urllib.request.Request(
+        f"{url}/models/org/model", data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json", "Authorization": f"Bearer {token}"}, method="POST"
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status, dict(response.headers), response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, dict(e.headers), e.read()
+
+
+def test_returns_the_fake_backend_image(serve):
+    Image = pytest.importorskip("PIL.Image")
+    url = serve()
+    status, headers, body = post(url, {"inputs": "a castle", "parameters": {"width": 32, "height": 16, "seed": 7}})
+    assert status == 200 and headers["Content-Type"] == "image/png"
+    with Image.open(io.BytesIO(body)) as image:
+        expected = FakeBackend()._draw("org/model", "a castle", 32, 16, 7)
+        assert image.size == (32, 16)
+        assert image.tobytes() == expected.tobytes()
+    with urllib.request.urlopen(url, timeout=5) as response:
+        assert json.load(response)["counts"]["ok"] == 1
+
+
+def test_injected_faults(serve):
+    assert post(serve(loading_rate=1.0), {"inputs": "x"})[0] == 503
+    url = serve(rate_limit=0.01, burst=1)
+    assert post(url, {"inputs": "x", "parameters": {"width": 8, "height": 8}})[0] == 200
+    status, headers, _ = post(url, {"inputs": "x"})
+    assert status == 429 and int(headers["Retry-After"]) >= 1
+    # Buckets are per token
+    assert post(url, {"inputs": "x", "parameters": {"width": 8, "height": 8}}, token="b")[0] == 200
+    assert post(url, {"no": "inputs"})[0] == 400
+
+
+def test_parse_latency():
+    assert parse_latency("fixed:1.5")(None) == 1.5
+    with pytest.raises(ValueError):
+        parse_latency("gamma:1")
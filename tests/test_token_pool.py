@@ -0,0 +1,61 @@
+# test_token_pool.py
+import pytest
+from src.resilience import RateLimitExceeded
+from src.token_pool import TokenBucket, TokenPool
+
+
+def test_bucket_allows_burst_then_refills():
+    bucket = TokenBucket(rate=2, burst=3)
+    now = bucket.updated
+    assert [bucket.take(now) for _ in range(3)] == [0, 0, 0]
+    assert bucket.take(now) == pytest.approx(0.5)
+    assert bucket.take(now + 0.5) == 0
+    # Never refills beyond the burst
+    assert bucket.refill(now + 100) == 3
+
+
+def test_unlimited_pool_spreads_requests():
+    pool = TokenPool(["a", "b"], rate=0)
+    assert sorted(pool.acquire() for _ in range(100)).count("a") == 50
+
+
+def test_default_pool_is_unlimited():
+    pool = TokenPool([None])
+    for _ in range(1000):
+        assert pool.acquire() is None
+
+
+def test_routes_to_token_with_most_budget():
+    pool = TokenPool(["a", "b"], rate=0.001, burst=3)
+    assert pool.acquire() == "a"
+    assert pool.acquire() == "b"
+    assert {pool.acquire() for _ in range(4)} == {"a", "b"}
+    with pytest.raises(RateLimitExceeded) as raised:
+        pool.acquire()
+    assert raised.value.retry_after > 0
+
+
+def test_sidelined_token_is_skipped():
+    pool = TokenPool(["a", "b"], rate=0)
+    pool.sideline("a", retry_after=60)
+    assert {pool.acquire() for _ in range(10)} == {"b"}
+    pool.sideline("b", retry_after=30)
+    with pytest.raises(RateLimitExceeded) as raised:
+        pool.acquire()
+    assert 0 < raised.value.retry_after <= 30
+
+
+def test_single_token_is_never_sidelined():
+    pool = TokenPool(["a"], rate=0)
+    pool.sideline("a", retry_after=60)
+    assert pool.acquire() == "a"
+
+
+def test_session_admission():
+    pool = TokenPool(["a"], session_rate=0.001, session_burst=2)
+    assert pool.admit_session("s1") == 0
+    assert pool.admit_session("s1") == 0
+    assert pool.admit_session("s1") > 0
+    assert pool.admit_session("s2") == 0
+    assert pool.admit_session(None) == 0
+    assert TokenPool(["a"], session_rate=0).admit_session("s1") == 0
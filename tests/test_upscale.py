@@ -0,0 +1,22 @@
+# test_upscale.py
+import asyncio
+import pytest
+from src.upscale import native_size, upscale, upscale_async
+
+
+def test_native_size():
+    assert native_size(640, 360, factor=1) == (640, 360)
+    assert native_size(640, 360, factor=2) == (320, 176)
+    assert native_size(1024, 1024, factor=1.5) == (672, 672)
+    # Never below the smallest size the backends accept
+    assert native_size(100, 80, factor=4) == (64, 64)
+
+
+def test_upscale_in_worker_processes():
+    Image = pytest.importorskip("PIL.Image")
+    image = Image.new("P", (32, 16))
+    result = upscale(image, (64, 32))
+    assert (result.size, result.mode) == ((64, 32), "RGB")
+    result = asyncio.run(upscale_async(Image.new("RGBA", (32, 16), (255, 0, 0, 128)), (96, 48), sharpen=0))
+    assert (result.size, result.mode) == ((96, 48), "RGBA")
+    assert result.getpixel((10, 10)) == (255, 0, 0, 128)
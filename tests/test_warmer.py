@@ -0,0 +1,26 @@
+# test_warmer.py
+import time
+from collections import deque
+from src.warmer import Warmer
+
+
+def test_hottest_follows_request_counts():
+    warmer = Warmer(top_n=2)
+    for combo, count in ((("Siege", "Red", "flux"), 3), (("Siege", "Blue", "flux"), 1), (("Duel", "Red", "sd"), 2)):
+        for _ in range(count):
+            warmer.record(*combo)
+    assert warmer.hottest() == [("Siege", "red", "flux"), ("Duel", "red", "sd")]
+
+
+def test_take_skips_stale_and_outdated_images():
+    warmer = Warmer(max_age=60)
+    now = time.monotonic()
+    warmer._pools[("Siege", "red", "flux")] = deque([
+        (now - 120, "red castle", "old.png", "old"),
+        (now, "previous prompt", "edited.png", "edited"),
+        (now, "red castle", "fresh.png", "fresh"),
+    ])
+    assert warmer.take("Siege", "Red", "flux", "red castle") == ("fresh.png", "fresh")
+    assert warmer.take("Siege", "Red", "flux", "red castle") is None
+    assert warmer.take("Duel", "Red", "flux", "red castle") is None
+
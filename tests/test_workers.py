@@ -0,0 +1,85 @@
+# test_workers.py
+import asyncio
+import sqlite3
+import threading
+import time
+import src.workers as workers
+from src.job_queue import JobQueue, DONE
+from src.scheduler import RequestScheduler
+
+
+def test_worker_survives_a_failed_finish(tmp_path, monkeypatch):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setattr(workers, "job_queue", queue)
+    monkeypatch.setattr(workers, "POLL_INTERVAL", 0.01)
+    monkeypatch.setattr(workers, "run_job", lambda params: (f"{params['n']}.png", "ok"))
+    finish, failures = queue.finish, []
+
+    def flaky_finish(*args, **kwargs):
+        if not failures:
+            failures.append(args)
+            raise sqlite3.OperationalError("database is locked")
+        return finish(*args, **kwargs)
+
+    monkeypatch.setattr(queue, "finish", flaky_finish)
+    first, second = queue.submit({"n": 1}), queue.submit({"n": 2})
+    worker = workers.Worker("w1", threads=1)
+    thread = threading.Thread(target=worker._loop, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 5
+    while queue.get(second)["status"] != DONE and time.monotonic() < deadline:
+        time.sleep(0.01)
+    worker._stop.set()
+    thread.join(timeout=5)
+    # The thread kept going after the failed finish; the first job stays leased for another worker
+    assert queue.get(second)["status"] == DONE
+    assert queue.get(first)["status"] == "running"
+    assert not worker._active
+
+
+def collect(agen, limit):
+    # Drive an async generator until it stops or has yielded `limit` updates
+    async def run():
+        updates = []
+        async for update in agen:
+            updates.append(update)
+            if len(updates) == limit:
+                break
+        return updates
+    return run()
+
+
+def test_unknown_aliases_never_reach_the_queue(tmp_path, monkeypatch):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setattr(workers, "job_queue", queue)
+    updates = asyncio.run(collect(workers.generate_via_workers("Castle Siege", "Red", "no-such-model", ""), 5))
+    assert updates == [(None, "ERROR: Invalid prompt or model selected.")]
+    assert queue.counts() == {}
+
+
+def test_requests_wait_in_the_scheduler_before_queueing(tmp_path, monkeypatch):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setattr(workers, "job_queue", queue)
+    monkeypatch.setattr(workers, "scheduler", RequestScheduler(concurrency=1, max_queue_depth=1))
+    monkeypatch.setattr(workers, "POLL_INTERVAL", 0.01)
+
+    async def scenario():
+        first = workers.generate_via_workers("Castle Siege", "Red", "FLUX.1-dev", "", session_id="a")
+        second = workers.generate_via_workers("Castle Siege", "Red", "FLUX.1-dev", "", session_id="b")
+        third = workers.generate_via_workers("Castle Siege", "Red", "FLUX.1-dev", "", session_id="c")
+        assert (await first.__anext__())[1].startswith("Queued")
+        assert (await second.__anext__())[1] == "Queued: position 1, estimated wait ~20s"
+        # The model's scheduler queue is full
+        assert await collect(third, 5) == [(None, "Server is busy: too many requests are waiting for this model. Please try again shortly.")]
+        # Only the granted request reached the shared queue
+        assert queue.counts() == {"queued": 1}
+        job_id, _ = queue.claim("w1")
+        queue.finish(job_id, "w1", "a.png", "ok")
+        assert await collect(first, 5) == [("a.png", "ok")]
+        # The second request got the slot and is queued for the workers now
+        await asyncio.wait_for(second.__anext__(), 5)
+        assert queue.counts() == {"done": 1, "queued": 1}
+        await second.aclose()
+        assert queue.counts() == {"done": 1, "cancelled": 1}
+
+    asyncio.run(scenario())